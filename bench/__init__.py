@@ -0,0 +1 @@
+"""Benchmarks of the drivers in lib/ against the host-side simulation (see sim/)."""
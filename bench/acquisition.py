@@ -0,0 +1,84 @@
+"""Measurement cycle time of the four Pysense sensors: one after the other
+(each driver waiting for its own conversion) versus concurrently with
+acquire.measure_all(), where the conversion waits overlap.
+
+    python -m bench.acquisition
+"""
+
+import sys
+
+import sim
+from sim.devices import LIS2HH12Model, LTR329ALS01Model, MPL3115A2Model, SI7006A20Model
+
+CYCLES = 5
+
+
+def _setup(profile):
+    world = sim.install()
+    world.bus.attach(LTR329ALS01Model(world.clock, 250.0))
+    world.bus.attach(MPL3115A2Model(world.clock, world.random))
+    world.bus.attach(SI7006A20Model(world.clock))
+    world.bus.attach(LIS2HH12Model(world.clock, world.random))
+    drivers = {}
+    for name in ('LTR329ALS01', 'MPL3115A2', 'SI7006A20', 'LIS2HH12'):
+        drivers[name] = getattr(sim.load(name), name)
+    registry = sim.load('sensors').SensorRegistry()
+    registry.register('LTR329ALS01', lambda: drivers['LTR329ALS01'](auto_range=True))
+    registry.register('MPL3115A2', lambda: drivers['MPL3115A2'](one_shot=True, profile=profile))
+    registry.register('SI7006A20', lambda: drivers['SI7006A20']())
+    registry.register('LIS2HH12', lambda: drivers['LIS2HH12']())
+    for name in drivers:
+        # drivers are kept between cycles, leave their initialization out
+        registry.get(name)
+    # and the first auto-range of the light sensor
+    registry.get('LTR329ALS01').read()
+    world.bus.reset_stats()
+    return world, registry
+
+
+def sequential(profile):
+    world, sensors = _setup(profile)
+    start = world.clock.now_us
+    for _ in range(CYCLES):
+        sensors.get('LTR329ALS01').read()
+        sensors.get('MPL3115A2').measure()
+        sensors.get('SI7006A20').measure(24.4)
+        sensors.get('LIS2HH12').orientation()
+    return world, (world.clock.now_us - start) / CYCLES / 1000
+
+
+def concurrent(profile):
+    world, sensors = _setup(profile)
+    acquire = sim.load('acquire')
+    start = world.clock.now_us
+    for _ in range(CYCLES):
+        results = acquire.run(acquire.measure_all(sensors, 24.4))
+        for name, result in results.items():
+            if isinstance(result, Exception):
+                raise result
+    return world, (world.clock.now_us - start) / CYCLES / 1000
+
+
+def run():
+    results = []
+    for profile in ('fast', 'balanced', 'precise'):
+        row = {'profile': profile}
+        for label, fn in (('sequential', sequential), ('concurrent', concurrent)):
+            world, cycle_ms = fn(profile)
+            totals = world.bus.totals()
+            row[label] = {'cycle_ms': cycle_ms, 'transactions': totals.transactions / CYCLES,
+                          'nacks': totals.nacks / CYCLES}
+        results.append(row)
+    return results
+
+
+def main(argv):
+    print('{:>9} {:>15} {:>15} {:>8} {:>10}'.format('profile', 'sequential (ms)', 'concurrent (ms)', 'speedup', 'txn/cycle'))
+    for r in run():
+        s, c = r['sequential'], r['concurrent']
+        print('{:>9} {:>15.1f} {:>15.1f} {:>7.2f}x {:>10.0f}'.format(
+            r['profile'], s['cycle_ms'], c['cycle_ms'], s['cycle_ms'] / c['cycle_ms'], c['transactions']))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
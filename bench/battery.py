@@ -0,0 +1,101 @@
+"""Battery voltage on a simulated Pysense whose ADC readings are noisy
+(NOISE_V standard deviation around BATTERY_V).
+
+Cost of one conversion: read_battery_voltage as it was (GO/nDONE set and
+read back, then polled, then ADRESH and ADRESL) versus read_battery_adc.
+Then, over one day of measurements every PERIOD_S seconds, the error of
+what the node would report: one conversion per measurement versus the
+BatteryMonitor (mean of SAMPLES conversions every INTERVAL_S seconds and an
+exponentially weighted estimate), with the conversions and the I2C time it
+took for the whole day.
+
+    python -m bench.battery
+"""
+
+import math
+import sys
+
+import sim
+from bench import suite
+
+BATTERY_V = 4.1
+NOISE_V = 0.05
+PERIOD_S = 300
+DAY_S = 86400
+SAMPLES = 8
+INTERVAL_S = 3600
+
+
+def _read_before(p, time):
+    # Pycoproc.read_battery_voltage before read_battery_adc
+    p.set_bits_in_memory(0x9D, 0x02)
+    time.sleep_us(50)
+    while p.peek_memory(0x9D) & 0x02:
+        time.sleep_us(100)
+    adc_val = (p.peek_memory(0x9C) << 2) + (p.peek_memory(0x9B) >> 6)
+    return (((adc_val * 3.3 * 280) / 1023) / 180) + 0.01
+
+
+def _world():
+    world = sim.install()
+    world.attach_board('pysense')
+    world.pic.battery = BATTERY_V
+    world.pic.battery_noise = NOISE_V
+    return world
+
+
+def conversion_cost():
+    results = []
+    for name in ('before', 'read_battery_adc'):
+        world = _world()
+        p = sim.load('pycoproc').Pycoproc()
+        call = (lambda: _read_before(p, world.time)) if name == 'before' else p.read_battery_adc
+        results.append(dict(suite.measure(world, call, repeat=20), call=name))
+    return results
+
+
+def _rms(errors):
+    return math.sqrt(sum(e * e for e in errors) / len(errors))
+
+
+def day(monitor):
+    world = _world()
+    p = sim.load('pycoproc').Pycoproc()
+    clock = world.clock
+    battery = sim.load('battery').BatteryMonitor(p, samples=SAMPLES, interval_s=INTERVAL_S,
+                                                 clock=lambda: clock.now_us / 1000000)
+    world.bus.reset_stats()
+    errors = []
+    conversions = 0
+    for _ in range(DAY_S // PERIOD_S):
+        if monitor:
+            volts = battery.update()
+        else:
+            volts = p.read_battery_voltage()
+            conversions += 1
+        errors.append(volts - BATTERY_V)
+        clock.advance_us(PERIOD_S * 1000000)
+    totals = world.bus.totals()
+    return {'rms_mv': _rms(errors) * 1000, 'max_mv': max(abs(e) for e in errors) * 1000,
+            'conversions': battery.conversions if monitor else conversions,
+            'transactions': totals.transactions, 'bus_ms': totals.time_us / 1000}
+
+
+def main(argv):
+    print('one conversion')
+    print('{:<18} {:>7} {:>10} {:>11}'.format('call', 'trans', 'bus (ms)', 'total (ms)'))
+    for r in conversion_cost():
+        print('{:<18} {:>7.1f} {:>10.2f} {:>11.2f}'.format(
+            r['call'], r['transactions'], r['bus_time_us'] / 1000, r['elapsed_us'] / 1000))
+    print()
+    print('one day, a measurement every {} s, noise {:.0f} mV'.format(PERIOD_S, NOISE_V * 1000))
+    print('{:<18} {:>10} {:>10} {:>12} {:>7} {:>10}'.format(
+        'case', 'rms (mV)', 'max (mV)', 'conversions', 'trans', 'bus (ms)'))
+    for name, monitor in (('one conversion', False), ('BatteryMonitor', True)):
+        r = day(monitor)
+        print('{:<18} {:>10.1f} {:>10.1f} {:>12d} {:>7d} {:>10.1f}'.format(
+            name, r['rms_mv'], r['max_mv'], r['conversions'], r['transactions'], r['bus_ms']))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
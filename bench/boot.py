@@ -0,0 +1,95 @@
+"""Boot to first uplink of main.py with deepSleep, with and without the boot
+cache (bootCache, see lib/bootcache.py), on the simulated node.
+
+The first boot is a cold one: board detection, device lookup and the OTAA
+join. Every later boot wakes up from the deep sleep with the LoRaWAN session
+restored; with the cache it also skips the board detection and the lookup.
+Times count from the reset, including the BOOT_US of firmware start-up the
+simulation accounts, and the I2C columns only count what happens before the
+first uplink of the boot (the Pycoproc at 0x08 and all the devices).
+
+The period is shorter than the sleep the duty cycle imposes, so every boot
+measures and sends as soon as it can: the uplink is not held back for the
+next deadline, which would hide the time saved (the PIC sleeps in whole
+seconds).
+
+    python -m bench.boot
+"""
+
+import contextlib
+import io
+import sys
+
+import sim
+
+DURATION_S = 600
+PERIOD_S = 1.0
+PIC_ADDRESS = 0x08
+
+CASES = (
+    ('pysense', 'pysense', {'bootCache': False}),
+    ('pysense, cache', 'pysense', {'bootCache': True}),
+    ('universal', None, {'bootCache': False}),
+    ('universal, cache', None, {'bootCache': True}),
+)
+
+
+def simulate(board, params):
+    world = sim.install()
+    world.attach_board(board)
+    world.clock.deadline_us = DURATION_S * 1000000
+    world.bus.trace = []
+    boots = [0]
+    wake = world.wake
+
+    def wake_and_record(reason):
+        boots.append(world.clock.now_us)
+        wake(reason)
+    world.wake = wake_and_record
+    base = {'bTakeMeasurements': True, 'bOTAA': True, 'deepSleep': True, 'fixedTime': PERIOD_S,
+            'randomTime': 0.0, 'logLevel': 'NONE'}
+    base.update(params)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim.run_main(params=base)
+    return world, boots
+
+
+def boot_stats(world, start, end):
+    """ (ms to the first uplink, PIC transactions, I2C transactions, I2C bus time in ms)
+        of the boot at start, None without an uplink before end """
+    sent = [t for t, _, _, _ in world.lora_socket.uplinks if start <= t < end]
+    if not sent:
+        return None
+    trace = [e for e in world.bus.trace if start <= e[0] < sent[0]]
+    return ((sent[0] - start) / 1000, sum(1 for e in trace if e[1] == PIC_ADDRESS), len(trace),
+            sum(e[4] for e in trace) / 1000)
+
+
+def run():
+    results = []
+    for name, board, params in CASES:
+        world, boots = simulate(board, params)
+        ends = boots[1:] + [world.clock.now_us + 1]
+        stats = [boot_stats(world, start, end) for start, end in zip(boots, ends)]
+        cold = stats[0]
+        warm = [s for s in stats[1:] if s is not None]
+        results.append({'case': name, 'boots': len(boots), 'cold_ms': cold[0], 'cold_pic': cold[1],
+                        'warm_ms': sum(s[0] for s in warm) / len(warm),
+                        'warm_pic': sum(s[1] for s in warm) / len(warm),
+                        'warm_i2c': sum(s[2] for s in warm) / len(warm),
+                        'warm_bus_ms': sum(s[3] for s in warm) / len(warm)})
+    return results
+
+
+def main(argv):
+    print('{:.0f} s, deep sleep, one measurement every {:.0f} s (or as the duty cycle allows), OTAA'.format(DURATION_S, PERIOD_S))
+    print('{:<17} {:>6} {:>10} {:>9} {:>10} {:>9} {:>9} {:>13}'.format(
+        'case', 'boots', 'cold (ms)', 'cold PIC', 'warm (ms)', 'warm PIC', 'warm I2C', 'warm bus (ms)'))
+    for r in run():
+        print('{:<17} {:>6d} {:>10.1f} {:>9d} {:>10.1f} {:>9.1f} {:>9.1f} {:>13.2f}'.format(
+            r['case'], r['boots'], r['cold_ms'], r['cold_pic'], r['warm_ms'], r['warm_pic'],
+            r['warm_i2c'], r['warm_bus_ms']))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,76 @@
+"""Charge per uplink of main.py on the simulated node: awake all the time
+(with and without batching) versus deepSleep, where the node powers down
+between uplinks and keeps its LoRaWAN session in the nvram. The last case
+loses the nvram at every wake-up, like a node that does not save it: with
+OTAA it joins again at every boot.
+
+One measurement every PERIOD_S seconds, OTAA, for DURATION_S seconds of
+virtual time. The charge is estimated from the time awake, on air and
+powered down (see sim.node), and the battery life from BATTERY_MAH.
+
+    python -m bench.deep_sleep
+"""
+
+import contextlib
+import io
+import sys
+
+import sim
+from sim import node
+
+DURATION_S = 6 * 3600
+PERIOD_S = 300.0
+BATTERY_MAH = 2000
+
+CASES = (
+    ('awake', {'batchSamples': 1}, False),
+    ('awake, batch of 4', {'batchSamples': 4}, False),
+    ('deep sleep', {'deepSleep': True}, False),
+    ('deep sleep, no nvram', {'deepSleep': True}, True),
+)
+
+
+def simulate(params, lose_nvram):
+    world = sim.install()
+    world.attach_board('pysense')
+    world.clock.deadline_us = DURATION_S * 1000000
+    if lose_nvram:
+        wake = world.wake
+
+        def wake_without_nvram(reason):
+            world.nvram.clear()
+            wake(reason)
+        world.wake = wake_without_nvram
+    base = {'bTakeMeasurements': True, 'bOTAA': True, 'fixedTime': PERIOD_S, 'randomTime': 0.0, 'logLevel': 'NONE'}
+    base.update(params)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim.run_main(params=base)
+    return world
+
+
+def run():
+    results = []
+    for name, params, lose_nvram in CASES:
+        world = simulate(params, lose_nvram)
+        clock = world.clock
+        charge = node.charge_mah(world)
+        uplinks = len(world.lora_socket.uplinks)
+        results.append({'case': name, 'boots': world.boots, 'uplinks': uplinks, 'joins': world.joins,
+                        'rejected': world.rejected, 'awake_s': (clock.now_us - clock.deep_slept_us) / 1000000,
+                        'charge_mah': charge, 'per_uplink_uah': charge * 1000 / uplinks if uplinks else None,
+                        'battery_days': BATTERY_MAH / (charge / DURATION_S * 86400)})
+    return results
+
+
+def main(argv):
+    print('{:.0f} h, one measurement every {:.0f} s, OTAA'.format(DURATION_S / 3600, PERIOD_S))
+    print('{:<21} {:>6} {:>8} {:>6} {:>9} {:>11} {:>12} {:>16} {:>14}'.format(
+        'case', 'boots', 'uplinks', 'joins', 'rejected', 'awake (s)', 'charge (mAh)', 'per uplink (uAh)', 'battery (days)'))
+    for r in run():
+        print('{:<21} {:>6d} {:>8d} {:>6d} {:>9d} {:>11.1f} {:>12.2f} {:>16.1f} {:>14.0f}'.format(
+            r['case'], r['boots'], r['uplinks'], r['joins'], r['rejected'], r['awake_s'],
+            r['charge_mah'], r['per_uplink_uah'], r['battery_days']))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,96 @@
+"""Transient NACKs on the shared I2C bus (lib/i2cbus.py): concurrent
+measurement cycles of a simulated Pysense whose sensors drop the given
+fraction of their transactions, without retries and with the retries of
+I2CBus.
+
+Every case runs CYCLES warm cycles of acquire.measure_all (the PIC is left
+alone, its command protocol has no transient NACKs here). The columns are
+the readings lost to an I2C error (the driver is then initialized again),
+the retries, and the bus time and elapsed time per cycle.
+
+The accounting of the bus manager is then checked against the simulated
+bus over the cycles of the first case: transactions, bytes and time per
+device address.
+
+    python -m bench.i2c_bus
+"""
+
+import random
+import sys
+
+import sim
+from bench import suite
+
+CYCLES = 200
+SEED = 1
+PIC_ADDRESS = 0x08
+
+# (transient NACK rate of the sensors, retries)
+CASES = (
+    (0.0, 0),
+    (0.0, 1),
+    (0.005, 0),
+    (0.005, 1),
+    (0.02, 0),
+    (0.02, 1),
+    (0.02, 2),
+)
+
+
+def _flaky(world, rate, rnd):
+    for address, dev in world.bus.devices.items():
+        if address != PIC_ADDRESS:
+            dev.ack = lambda ack=dev.ack: rnd.random() >= rate and ack()
+
+
+def simulate(rate, retries):
+    world = sim.install()
+    world.attach_board('pysense')
+    bus = sim.load('i2cbus').shared()
+    sim.load('pycoproc').Pycoproc()
+    bus.retries = retries
+    sensors = suite._registry()
+    acquire = sim.load('acquire')
+    # warm: the drivers are built before the sensors turn flaky
+    acquire.run(acquire.measure_all(sensors, 24.4))
+    _flaky(world, rate, random.Random(SEED))
+    world.bus.reset_stats()
+    bus.reset_stats()
+    lost = [0]
+
+    def cycles():
+        for _ in range(CYCLES):
+            results = acquire.run(acquire.measure_all(sensors, 24.4))
+            lost[0] += sum(1 for r in results.values() if isinstance(r, OSError))
+    cost = suite.measure(world, cycles, repeat=1)
+    # measure() resets the simulated bus, the bus manager counts since the cycles began
+    return {'lost': lost[0], 'retries': bus.totals().retries / CYCLES,
+            'bus_us': cost['bus_time_us'] / CYCLES, 'elapsed_us': cost['elapsed_us'] / CYCLES,
+            'accounted': bus.stats, 'simulated': world.bus.stats}
+
+
+def run():
+    return [dict(simulate(rate, retries), rate=rate, retries_max=retries) for rate, retries in CASES]
+
+
+def main(argv):
+    results = run()
+    print('{} concurrent cycles, warm drivers, sensors NACKing at random'.format(CYCLES))
+    print('{:<10} {:>8} {:>14} {:>17} {:>9} {:>10}'.format(
+        'NACK rate', 'retries', 'readings lost', 'retries / cycle', 'bus (ms)', 'total (ms)'))
+    for r in results:
+        print('{:<10} {:>8d} {:>14d} {:>17.2f} {:>9.2f} {:>10.2f}'.format(
+            '{:.1f} %'.format(r['rate'] * 100), r['retries_max'], r['lost'], r['retries'],
+            r['bus_us'] / 1000, r['elapsed_us'] / 1000))
+    print()
+    print('accounting of the bus manager / simulated bus, first case')
+    print('{:<8} {:>15} {:>17} {:>21}'.format('address', 'transactions', 'bytes', 'time (ms)'))
+    first = results[0]
+    for address in sorted(first['simulated']):
+        a, s = first['accounted'][address], first['simulated'][address]
+        print('0x{:02X}     {:>7d} / {:<7d} {:>8d} / {:<8d} {:>10.2f} / {:.2f}'.format(
+            address, a.transactions, s.transactions, a.bytes, s.bytes, a.time_us / 1000, s.time_us / 1000))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,137 @@
+"""Cost of the messages of a measurement cycle: the former print() calls
+(strings built with str() and + on every cycle) versus lib/log.py, where
+main.py logs them at DEBUG: formatted when the buffer is flushed (one write
+per cycle) at DEBUG, skipped at the default INFO (one level test per group).
+
+Reports, per cycle, the host time, the memory allocated while the messages
+are produced (tracemalloc peak) and the bytes written to the serial port
+with the time they take at 115200 baud on the device. A second table runs
+main.py for ten minutes of virtual time on the simulated node at each level.
+
+    python -m bench.log_cost
+"""
+
+import contextlib
+import io
+import sys
+import time
+import tracemalloc
+
+import sim
+
+CYCLES = 2000
+UART_BAUDRATE = 115200
+NODE_DURATION_S = 600
+
+# values of a typical cycle of takeMeasurement() in main.py
+LIGHT = (31, 27)
+LUX = 31.2
+TEMPERATURE = 24.8125
+ALTITUDE = 121.4375
+PRESSURE = 100842.5
+HUMIDITY = 41.72
+DEW = 10.86
+T_AMBIENT = 24.4
+HUMIDITY_AMBIENT = 43.1
+ACCELERATION = (0.0126, -0.0092, 1.0041)
+ROLL = -0.52
+PITCH = 0.72
+
+
+def _print_cycle():
+    print("[INFO] LTR329ALS01 light (channel Blue lux, channel Red lux): " + str(LIGHT))
+    print("[INFO] LTR329ALS01 light (global lux):                        " + str(LUX))
+    print("[INFO] MPL3115A2 temperature:                                 " + str(TEMPERATURE))
+    print("[INFO] MPL3115A2 altitude:                                    " + str(ALTITUDE))
+    print("[INFO] MPL3115A2 Pressure:                                    " + str(PRESSURE))
+    print("[INFO] SI7006A20 temperature:                                 " + str(TEMPERATURE) + " deg C")
+    print("[INFO] SI7006A20 relative Humidity:                           " + str(HUMIDITY) + " %RH")
+    print("[INFO] SI7006A20 dew point:                                   " + str(DEW) + " deg C")
+    print("[INFO] SI7006A20 humidity ambient for " + str(T_AMBIENT) + " deg C:             " + str(HUMIDITY_AMBIENT) + " %RH")
+    print("[INFO] LIS2HH12 acceleration:                                 " + str(ACCELERATION))
+    print("[INFO] LIS2HH12 roll:                                         " + str(ROLL))
+    print("[INFO] LIS2HH12 pitch:                                        " + str(PITCH))
+
+
+def _log_cycle(log):
+    def cycle():
+        # as in main.py: the calls are skipped below DEBUG
+        if log.level <= log.DEBUG:
+            log.debug("LTR329ALS01 light (channel Blue lux, channel Red lux): {}", LIGHT)
+            log.debug("LTR329ALS01 light (global lux):                        {}", LUX)
+            log.debug("MPL3115A2 temperature:                                 {}", TEMPERATURE)
+            log.debug("MPL3115A2 altitude:                                    {}", ALTITUDE)
+            log.debug("MPL3115A2 Pressure:                                    {}", PRESSURE)
+            log.debug("SI7006A20 temperature:                                 {} deg C", TEMPERATURE)
+            log.debug("SI7006A20 relative Humidity:                           {} %RH", HUMIDITY)
+            log.debug("SI7006A20 dew point:                                   {} deg C", DEW)
+            log.debug("SI7006A20 humidity ambient for {} deg C:             {} %RH", T_AMBIENT, HUMIDITY_AMBIENT)
+            log.debug("LIS2HH12 acceleration:                                 {}", ACCELERATION)
+            log.debug("LIS2HH12 roll:                                         {}", ROLL)
+            log.debug("LIS2HH12 pitch:                                        {}", PITCH)
+        log.flush()
+    return cycle
+
+
+def _measure(cycle, out):
+    """ (host us per cycle, bytes allocated per cycle, bytes written per cycle) """
+    with contextlib.redirect_stdout(out):
+        cycle()
+        start = time.perf_counter()
+        for _ in range(CYCLES):
+            cycle()
+        elapsed = time.perf_counter() - start
+        written = out.tell()
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        cycle()
+        peak = tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+    return elapsed / CYCLES * 1000000, peak, written / (CYCLES + 1)
+
+
+def cycles():
+    sim.install()
+    log = sim.load('log')
+    results = []
+    out = io.StringIO()
+    results.append(('print', _measure(_print_cycle, out)))
+    for name, level in (('log DEBUG', log.DEBUG), ('log INFO', log.INFO)):
+        out = io.StringIO()
+        log.configure(level, sink=out.write)
+        results.append((name, _measure(_log_cycle(log), out)))
+    return results
+
+
+def nodes():
+    """ main.py on the simulated node at each log level: (level, host s, bytes written, uplinks) """
+    from sim import node
+    results = []
+    for level in ('DEBUG', 'INFO', 'WARNING'):
+        out = io.StringIO()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(out):
+            world = node.simulate(NODE_DURATION_S, params={'bTakeMeasurements': True, 'logLevel': level})
+        results.append((level, time.perf_counter() - start, len(out.getvalue()), len(world.lora_socket.uplinks)))
+    return results
+
+
+def run():
+    return {'cycles': cycles(), 'nodes': nodes()}
+
+
+def main(argv):
+    report = run()
+    print('{:<12} {:>10} {:>14} {:>12} {:>14}'.format('messages', 'host (us)', 'allocated (B)', 'UART (B)', 'UART (ms)'))
+    for name, (host_us, allocated, written) in report['cycles']:
+        print('{:<12} {:>10.1f} {:>14d} {:>12.0f} {:>14.2f}'.format(
+            name, host_us, allocated, written, written * 10 / UART_BAUDRATE * 1000))
+    print('\nmain.py, {:d} s of virtual time:'.format(NODE_DURATION_S))
+    print('{:<12} {:>10} {:>14} {:>12}'.format('level', 'host (s)', 'UART (B)', 'uplinks'))
+    for level, host_s, written, uplinks in report['nodes']:
+        print('{:<12} {:>10.2f} {:>14d} {:>12d}'.format(level, host_s, written, uplinks))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,75 @@
+"""Time to a valid LTR329ALS01 reading across light levels: auto-range versus
+rebuilding the driver with the next gain/integration setting.
+
+A reading is valid when no channel is saturated and the peak count is at
+least AUTO_RANGE_LOW (or the setting is already at the end of the range).
+
+    python -m bench.ltr_autorange
+"""
+
+import sys
+
+import sim
+from sim.devices import LTR329ALS01Model
+
+LUX_LEVELS = (0.5, 5.0, 50.0, 500.0, 5000.0, 20000.0, 60000.0)
+
+
+def _valid(ltr, index, data0, data1):
+    steps = ltr.AUTO_RANGE_STEPS
+    peak = max(data0, data1)
+    if peak > ltr.AUTO_RANGE_HIGH:
+        return index == 0 and peak < 0xFFFF
+    return peak >= ltr.AUTO_RANGE_LOW or index == len(steps) - 1
+
+
+def auto_range(lux):
+    world = sim.install()
+    world.bus.attach(LTR329ALS01Model(world.clock, lux))
+    LTR329ALS01 = sim.load('LTR329ALS01').LTR329ALS01
+    start = world.clock.now_us
+    ltr = LTR329ALS01(auto_range=True)
+    data0, data1, value = ltr.read()
+    return (world.clock.now_us - start) / 1000, ltr.range_index, value, world.bus.totals().transactions
+
+
+def rebuild(lux):
+    # previous approach: a new driver object per setting, waiting the default 500 ms rate
+    world = sim.install()
+    world.bus.attach(LTR329ALS01Model(world.clock, lux))
+    LTR329ALS01 = sim.load('LTR329ALS01').LTR329ALS01
+    steps = LTR329ALS01.AUTO_RANGE_STEPS
+    start = world.clock.now_us
+    index = 1
+    while True:
+        gain, integration = steps[index]
+        ltr = LTR329ALS01(gain=gain, integration=integration)
+        ltr.wait_new_data()
+        data0, data1 = ltr.light()
+        if _valid(ltr, index, data0, data1):
+            break
+        index += -1 if max(data0, data1) > ltr.AUTO_RANGE_HIGH else 1
+    return (world.clock.now_us - start) / 1000, index, ltr._lux(data0, data1), world.bus.totals().transactions
+
+
+def run():
+    results = []
+    for lux in LUX_LEVELS:
+        a = auto_range(lux)
+        r = rebuild(lux)
+        results.append({'lux': lux,
+                        'auto_range_ms': a[0], 'auto_range_step': a[1], 'auto_range_lux': a[2], 'auto_range_transactions': a[3],
+                        'rebuild_ms': r[0], 'rebuild_step': r[1], 'rebuild_lux': r[2], 'rebuild_transactions': r[3]})
+    return results
+
+
+def main(argv):
+    print('{:>9} {:>12} {:>6} {:>10} {:>12} {:>6} {:>10}'.format('lux', 'auto (ms)', 'step', 'auto lux', 'rebuild (ms)', 'step', 'rebuild lux'))
+    for r in run():
+        print('{:>9.1f} {:>12.1f} {:>6} {:>10.1f} {:>12.1f} {:>6} {:>10.1f}'.format(
+            r['lux'], r['auto_range_ms'], r['auto_range_step'], r['auto_range_lux'],
+            r['rebuild_ms'], r['rebuild_step'], r['rebuild_lux']))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,49 @@
+"""Time per MPL3115A2 one-shot reading and pressure noise for each oversampling profile.
+
+    python -m bench.mpl_oversampling [readings]
+"""
+
+import math
+import sys
+
+import sim
+from sim.devices import MPL3115A2Model
+
+
+def run(readings=20):
+    results = {}
+    for profile in ('fast', 'balanced', 'precise'):
+        world = sim.install()
+        world.bus.attach(MPL3115A2Model(world.clock, world.random))
+        MPL3115A2 = sim.load('MPL3115A2')
+        mp = MPL3115A2.MPL3115A2(one_shot=True, profile=profile)
+        world.bus.reset_stats()
+        start = world.clock.now_us
+        pressures = []
+        for _ in range(readings):
+            pressures.append(mp.measure()[0])
+        elapsed = world.clock.now_us - start
+        mean = sum(pressures) / readings
+        stdev = math.sqrt(sum([(p - mean) ** 2 for p in pressures]) / readings)
+        totals = world.bus.totals()
+        results[profile] = {
+            'oversampling': mp.oversampling,
+            'conversion_time_ms': mp.conversion_time_ms,
+            'time_per_reading_ms': elapsed / readings / 1000,
+            'transactions_per_reading': totals.transactions / readings,
+            'pressure_stdev_pa': stdev,
+        }
+    return results
+
+
+def main(argv):
+    readings = int(argv[1]) if len(argv) > 1 else 20
+    print('{:<10} {:>4} {:>10} {:>12} {:>10} {:>10}'.format('profile', 'OS', 'conv (ms)', 'reading (ms)', 'I2C trans', 'noise (Pa)'))
+    for profile, r in run(readings).items():
+        print('{:<10} {:>4} {:>10} {:>12.2f} {:>10.1f} {:>10.2f}'.format(
+            profile, r['oversampling'], r['conversion_time_ms'], r['time_per_reading_ms'],
+            r['transactions_per_reading'], r['pressure_stdev_pa']))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,106 @@
+"""One hour of a node on the fake LoRa socket: the former blocking loop
+(sleep, blocking send, downlinks never read) versus the asyncio runtime of
+lib/runtime.py.
+
+Reports the uplinks sent, the time the node could not do anything else
+because it was blocked in send(), and the downlinks received with their
+mean latency (they are queued every DOWNLINK_PERIOD_S seconds). At the
+low data rates the duty cycle allows fewer uplinks than measurements: the
+runtime then holds the measurements back (throttled) instead of queueing
+and dropping them.
+
+    python -m bench.node_runtime
+"""
+
+import asyncio
+import sys
+
+import sim
+from sim.lora import LoRaSocket
+
+DURATION_S = 3600
+PERIOD_S = 10.0
+MEASURE_MS = 25
+DOWNLINK_PERIOD_S = 60
+MESSAGE = bytes(11)
+
+
+def _setup(dr):
+    world = sim.install()
+    sock = LoRaSocket(world.clock, dr)
+    for i in range(1, DURATION_S // DOWNLINK_PERIOD_S):
+        sock.downlink(bytes([i]), port=1, at_s=i * DOWNLINK_PERIOD_S)
+    return world, sock
+
+
+def blocking(dr):
+    world, sock = _setup(dr)
+    airtime = sim.load('airtime')
+    scheduler = airtime.DutyCycleScheduler()
+    clock = world.clock
+    blocked_us = 0
+    next_time = scheduler.clock()
+    sent = 0
+    while clock.now_us < DURATION_S * 1000000:
+        clock.sleep_ms(MEASURE_MS)
+        toa = airtime.uplink_time_on_air(len(MESSAGE), dr)
+        next_time += PERIOD_S
+        wait = max(next_time - scheduler.clock(), scheduler.delay(toa))
+        clock.sleep(wait)
+        sock.setblocking(True)
+        start = clock.now_us
+        sock.send(MESSAGE)
+        blocked_us += clock.now_us - start
+        sock.setblocking(False)
+        scheduler.record(toa)
+        sent += 1
+    return {'uplinks': sent, 'blocked_s': blocked_us / 1000000, 'downlinks': 0, 'downlink_latency_s': None}
+
+
+def asynchronous(dr):
+    world, sock = _setup(dr)
+    runtime = sim.load('runtime')
+    transport = sim.load('transport')
+    log = sim.load('log')
+    log.set_level(log.NONE)
+    received = []
+
+    async def produce(counter):
+        await runtime.sleep_ms(MEASURE_MS)
+        return MESSAGE
+
+    def on_downlink(data, port):
+        received.append(world.clock.now_us / 1000000 - data[0] * DOWNLINK_PERIOD_S)
+
+    node = runtime.Node(transport.LoRaTransport(sock), produce, PERIOD_S, 0, dr,
+                        on_downlink=on_downlink)
+    try:
+        runtime.run(asyncio.wait_for(node.run(), DURATION_S))
+    except asyncio.TimeoutError:
+        pass
+    latency = sum(received) / len(received) if received else None
+    return {'uplinks': node.sent, 'blocked_s': 0.0, 'downlinks': len(received), 'downlink_latency_s': latency,
+            'dropped': node.dropped, 'throttled': node.throttled}
+
+
+def run():
+    results = []
+    for dr in (5, 3, 0):
+        results.append({'dr': dr, 'blocking': blocking(dr), 'runtime': asynchronous(dr)})
+    return results
+
+
+def main(argv):
+    print('{:>3} {:>9} {:>10} {:>11} {:>10} {:>10} {:>8} {:>10}'.format(
+        'DR', 'mode', 'uplinks', 'blocked (s)', 'downlinks', 'latency (s)', 'dropped', 'throttled'))
+    for r in run():
+        for mode in ('blocking', 'runtime'):
+            m = r[mode]
+            latency = '-' if m['downlink_latency_s'] is None else '{:.2f}'.format(m['downlink_latency_s'])
+            print('{:>3} {:>9} {:>10} {:>11.1f} {:>10} {:>10} {:>8} {:>10}'.format(
+                r['dr'], mode, m['uplinks'], m['blocked_s'], m['downlinks'], latency, m.get('dropped', '-'),
+                m.get('throttled', '-')))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
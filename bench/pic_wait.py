@@ -0,0 +1,99 @@
+"""Ready polling of the Pycoproc after each command, for PICs that answer in
+20 us to 40 ms: the polling it replaced (10 us, then a poll every 100 us)
+versus Pycoproc._wait, which learns the latency of each kind of command and
+backs off exponentially.
+
+Every case runs ROUNDS of a PEEK, a POKE, a MAGIC and a firmware version
+read on a simulated Pysense whose PIC is busy for the given time after each
+command (the 'mixed' case makes only the MAGIC slow). The columns are, per
+command: ready polls, I2C bus time and elapsed time, then the latency
+learnt and the p95 bucket of the histogram of the MAGIC commands.
+
+    python -m bench.pic_wait
+"""
+
+import sys
+
+import sim
+from bench import suite
+
+ROUNDS = 50
+PEEK, POKE, MAGIC, FW_VER = 0x00, 0x01, 0x02, 0x11
+
+# (case, {command: latency in us})
+CASES = (
+    ('20 us', dict.fromkeys((PEEK, POKE, MAGIC, FW_VER), 20)),
+    ('200 us', dict.fromkeys((PEEK, POKE, MAGIC, FW_VER), 200)),
+    ('1 ms', dict.fromkeys((PEEK, POKE, MAGIC, FW_VER), 1000)),
+    ('5 ms', dict.fromkeys((PEEK, POKE, MAGIC, FW_VER), 5000)),
+    ('40 ms', dict.fromkeys((PEEK, POKE, MAGIC, FW_VER), 40000)),
+    ('mixed', {PEEK: 200, POKE: 200, MAGIC: 5000, FW_VER: 200}),
+)
+
+
+def _fixed_wait(self, cmd=None):
+    # Pycoproc._wait before the adaptive polling
+    count = 0
+    self._time.sleep_us(10)
+    while self.i2c.readfrom(0x08, 1)[0] != 0xFF:
+        self._time.sleep_us(100)
+        count += 1
+        if (count > 500):  # timeout after 50ms
+            raise Exception('Board timeout')
+
+
+def _commands(p):
+    def run():
+        for _ in range(ROUNDS):
+            p.peek_memory(0x0C)
+            p.poke_memory(0x20C, 0x08)
+            p.set_bits_in_memory(0x0E, 0x80)
+            p.read_fw_version()
+    return run
+
+
+def simulate(latency, adaptive):
+    world = sim.install()
+    world.attach_board('pysense')
+    instrument = sim.load('instrument')
+    p = sim.load('pycoproc').Pycoproc()
+    world.pic.latency_us.update(latency)
+    if not adaptive:
+        p._time = world.time
+        p._wait = _fixed_wait.__get__(p)
+    instrument.reset()
+    instrument.enable()
+    cost = suite.measure(world, _commands(p), repeat=1)
+    commands = ROUNDS * 4
+    # every command is a write, then the polls, then the PEEK, MAGIC and version results
+    polls = cost['transactions'] - commands - ROUNDS * 3
+    result = {'polls': polls / commands, 'bus_us': cost['bus_time_us'] / commands,
+              'elapsed_us': cost['elapsed_us'] / commands}
+    if adaptive:
+        magic = instrument.timers['pic_magic']
+        result['learnt_us'] = p.latency_us['pic_magic']
+        result['p95_us'] = magic.percentile_us(95)
+    instrument.enable(False)
+    return result
+
+
+def run():
+    results = []
+    for case, latency in CASES:
+        results.append({'case': case, 'fixed': simulate(latency, False), 'adaptive': simulate(latency, True)})
+    return results
+
+
+def main(argv):
+    print('{} rounds of PEEK, POKE, MAGIC and firmware version, per command'.format(ROUNDS))
+    print('{:<8} {:>16} {:>18} {:>20} {:>15} {:>14}'.format(
+        'latency', 'polls', 'bus (ms)', 'total (ms)', 'MAGIC learnt', 'MAGIC p95 <'))
+    for r in run():
+        f, a = r['fixed'], r['adaptive']
+        print('{:<8} {:>6.1f} -> {:>6.1f} {:>7.2f} -> {:>7.2f} {:>8.2f} -> {:>8.2f} {:>12d} us {:>11d} us'.format(
+            r['case'], f['polls'], a['polls'], f['bus_us'] / 1000, a['bus_us'] / 1000,
+            f['elapsed_us'] / 1000, a['elapsed_us'] / 1000, a['learnt_us'], a['p95_us']))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,79 @@
+"""PIC register programming of the Pycoproc: one command per operation (each
+MAGIC read back, as poke_memory(), set_bits_in_memory()... do) versus a
+RegisterBatch, which merges the operations on the same register (e.g. the
+five TRISC masks of __init__), sends POKEs where the previous value no
+longer matters and does not read the MAGIC results back.
+
+Each case runs on a fresh simulated Pysense (100 kHz bus); the columns are
+the I2C transactions, the PIC commands, the bus time and the elapsed time
+of one call.
+
+    python -m bench.pycoproc_batch
+"""
+
+import sys
+
+import sim
+from sim.clock import DeepSleep
+from bench import suite
+
+
+def _pycoproc(merge):
+    cls = sim.load('pycoproc').Pycoproc
+
+    class Pycoproc(cls):
+        def batch(self, _merge=True):
+            return cls.batch(self, merge)
+    return Pycoproc
+
+
+def _sleep(p):
+    try:
+        p.go_to_sleep()
+    except DeepSleep:
+        pass
+
+
+def _sleep_int_pin(p):
+    p.setup_int_pin_wake_up()
+    _sleep(p)
+
+
+# (case, call(Pycoproc class) -> callable measured)
+CASES = (
+    ('__init__', lambda cls: cls),
+    ('sensor_power', lambda cls: cls().sensor_power),
+    ('setup_int_wake_up', lambda cls: lambda p=cls(): p.setup_int_wake_up(True, False)),
+    ('go_to_sleep', lambda cls: lambda p=cls(): _sleep(p)),
+    ('go_to_sleep, INT pin', lambda cls: lambda p=cls(): _sleep_int_pin(p)),
+)
+
+
+def run():
+    results = []
+    for case, setup in CASES:
+        entry = {'case': case}
+        for merge in (False, True):
+            world = sim.install()
+            world.attach_board('pysense')
+            call = setup(_pycoproc(merge))
+            commands = sum(world.pic.commands.values())
+            cost = suite.measure(world, call, repeat=1)
+            cost['commands'] = sum(world.pic.commands.values()) - commands
+            entry['batched' if merge else 'direct'] = cost
+        results.append(entry)
+    return results
+
+
+def main(argv):
+    print('{:<21} {:>14} {:>14} {:>18} {:>18}'.format(
+        'call', 'transactions', 'PIC commands', 'bus (ms)', 'total (ms)'))
+    for r in run():
+        d, b = r['direct'], r['batched']
+        print('{:<21} {:>6.0f} -> {:>4.0f} {:>6d} -> {:>4d} {:>8.2f} -> {:>6.2f} {:>8.2f} -> {:>6.2f}'.format(
+            r['case'], d['transactions'], b['transactions'], d['commands'], b['commands'],
+            d['bus_time_us'] / 1000, b['bus_time_us'] / 1000, d['elapsed_us'] / 1000, b['elapsed_us'] / 1000))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,85 @@
+"""RTC calibration of the PIC with deepSleep: before every sleep, as the
+Pycoproc used to (calibrationMaxAge = 0), versus the calibration cached
+across the sleeps for a day, without and with the re-calibration after a
+change of temperature of the SI7006A20 (calibrationMaxTempDelta).
+
+Every calibration blocks the I2C bus for the pulses of the PIC and
+pulses_get's timeout (about 110 ms). Halfway through, the temperature
+rises by STEP_C degrees and the low-frequency oscillator of the PIC slows
+down by STEP_ERROR: until the RTC is calibrated again, the node sleeps
+longer than planned and the uplinks drift away from the period. The
+intervals are measured between the uplinks of the second half.
+
+    python -m bench.rtc_calibration
+"""
+
+import contextlib
+import io
+import sys
+
+import sim
+from sim import node
+
+DURATION_S = 24 * 3600
+PERIOD_S = 300.0
+STEP_C = 13.0
+STEP_ERROR = 1.03
+
+CASES = (
+    ('every sleep', {'calibrationMaxAge': 0}),
+    ('cached, 24 h', {'calibrationMaxAge': 86400, 'calibrationMaxTempDelta': 100.0}),
+    ('cached, 24 h, 5 C', {'calibrationMaxAge': 86400, 'calibrationMaxTempDelta': 5.0}),
+)
+
+
+def simulate(params):
+    world = sim.install()
+    world.attach_board('pysense')
+    world.clock.deadline_us = DURATION_S * 1000000
+    si = world.bus.devices[0x40]
+    wake = world.wake
+
+    def wake_and_warm_up(reason):
+        if world.clock.now_us >= DURATION_S * 1000000 // 2 and world.pic.clock_error == 1.0:
+            si.temperature += STEP_C
+            world.pic.clock_error = STEP_ERROR
+        wake(reason)
+    world.wake = wake_and_warm_up
+    base = {'bTakeMeasurements': True, 'bOTAA': True, 'deepSleep': True, 'fixedTime': PERIOD_S,
+            'randomTime': 0.0, 'logLevel': 'NONE'}
+    base.update(params)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sim.run_main(params=base)
+    return world
+
+
+def run():
+    results = []
+    for name, params in CASES:
+        world = simulate(params)
+        sent = [t for t, _, _, _ in world.lora_socket.uplinks]
+        second = [t for t in sent if t >= DURATION_S * 1000000 // 2]
+        intervals = [(b - a) / 1000000 for a, b in zip(second, second[1:])]
+        calibrations = world.pic.commands.get(0x22, 0)
+        charge = node.charge_mah(world)
+        results.append({'case': name, 'uplinks': len(sent), 'calibrations': calibrations,
+                        'blocked_s': calibrations * (sum(us for _, us in world.pic.pulses()) + 100000) / 1000000,
+                        'interval_s': sum(intervals) / len(intervals),
+                        'error_max_s': max(abs(i - PERIOD_S) for i in intervals),
+                        'per_uplink_uah': charge * 1000 / len(sent)})
+    return results
+
+
+def main(argv):
+    print('{:.0f} h of deep sleep, one measurement every {:.0f} s, +{:.0f} C and oscillator x{} halfway'.format(
+        DURATION_S / 3600, PERIOD_S, STEP_C, STEP_ERROR))
+    print('{:<18} {:>8} {:>13} {:>12} {:>14} {:>15} {:>17}'.format(
+        'case', 'uplinks', 'calibrations', 'blocked (s)', 'interval (s)', 'max error (s)', 'per uplink (uAh)'))
+    for r in run():
+        print('{:<18} {:>8d} {:>13d} {:>12.1f} {:>14.2f} {:>15.2f} {:>17.2f}'.format(
+            r['case'], r['uplinks'], r['calibrations'], r['blocked_s'], r['interval_s'], r['error_max_s'],
+            r['per_uplink_uah']))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,130 @@
+"""Days of periodic measurements across midnight: the former scheduling on
+RTC wall-clock seconds (hour * 3600 + minute * 60 + second, which restarts
+at 0 every midnight) versus the absolute tick deadlines of lib/schedule.py
+used by the runtime.
+
+The node starts at 23:00 and the tick counter is set to wrap a few hours
+later, so both the midnight crossings and the ticks_ms wrap are exercised.
+Every SLOW_EVERY cycles the work takes SLOW_MS, longer than a period.
+Reports the cycles run (and expected), the longest gap between cycles, the
+offset of the last cycle from the ideal grid (drift), and the lateness
+statistics of the runtime.
+
+    python -m bench.scheduling
+"""
+
+import asyncio
+import sys
+
+import sim
+from sim.clock import TICKS_PERIOD
+from sim.lora import LoRaSocket
+
+DAYS = 3
+PERIOD_S = 30
+WORK_MS = 600
+SLOW_EVERY = 500
+SLOW_MS = 75000
+# ticks_ms wraps this many ms after the start
+WRAP_AFTER_MS = 5 * 3600 * 1000
+START = (2026, 3, 14, 23, 0, 0, 0, 0)
+MESSAGE = bytes(11)
+
+
+def _setup():
+    world = sim.install()
+    world.clock.now_us = (TICKS_PERIOD - WRAP_AFTER_MS) * 1000
+    machine = sys.modules['machine']
+    machine.RTC().init(START)
+    return world
+
+
+def _work_ms(counter):
+    return SLOW_MS if counter % SLOW_EVERY == SLOW_EVERY - 1 else WORK_MS
+
+
+def _summary(world, starts, start_us):
+    period_us = PERIOD_S * 1000000
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    # offset of the last cycle from the grid of periods since the start
+    offset = (starts[-1] - start_us) % period_us
+    drift = min(offset, period_us - offset)
+    # seconds of the day at the start plus the seconds elapsed since
+    midnights = (START[3] * 3600 + START[4] * 60 + (world.clock.now_us - start_us) // 1000000) // 86400
+    return {'cycles': len(starts), 'expected': DAYS * 86400 // PERIOD_S, 'midnights': midnights,
+            'max_gap_s': max(gaps) / 1000000 if gaps else None, 'drift_ms': drift / 1000}
+
+
+def wall_clock():
+    """ the loop of the former main.py: deadlines in RTC seconds of the day """
+    world = _setup()
+    clock = world.clock
+    rtc = sys.modules['machine'].RTC()
+    start_us = clock.now_us
+    end_us = start_us + DAYS * 86400 * 1000000
+    starts = []
+    counter = 0
+    timeLastTransmission = None
+    while clock.now_us < end_us:
+        starts.append(clock.now_us)
+        clock.sleep_ms(_work_ms(counter))
+        counter += 1
+        year, month, day, hour, minute, second, usecond, nothing = rtc.now()
+        currentTime = hour * 3600 + minute * 60 + second + usecond / 1000000
+        if timeLastTransmission is None:
+            timeLastTransmission = currentTime - WORK_MS / 1000
+        timeNextTransmission = timeLastTransmission + PERIOD_S
+        timeToWait = timeNextTransmission - currentTime
+        timeLastTransmission = timeNextTransmission
+        if timeToWait > 0:
+            clock.sleep(min(timeToWait, (end_us - clock.now_us) / 1000000))
+    result = _summary(world, starts, start_us)
+    result['late'] = None
+    return result
+
+
+def ticks():
+    """ runtime.Node with its absolute tick deadlines """
+    world = _setup()
+    clock = world.clock
+    runtime = sim.load('runtime')
+    transport = sim.load('transport')
+    log = sim.load('log')
+    log.set_level(log.NONE)
+    start_us = clock.now_us
+    starts = []
+
+    async def produce(counter):
+        starts.append(clock.now_us)
+        await runtime.sleep_ms(_work_ms(counter))
+        return MESSAGE
+
+    node = runtime.Node(transport.LoRaTransport(LoRaSocket(clock, 5)), produce, PERIOD_S, 0, 5)
+    try:
+        runtime.run(asyncio.wait_for(node.run(), DAYS * 86400))
+    except asyncio.TimeoutError:
+        pass
+    result = _summary(world, starts, start_us)
+    p = node.periodic
+    result['late'] = (p.late, p.late_mean_ms(), p.late_max_ms, p.skipped)
+    return result
+
+
+def run():
+    return {'wall clock': wall_clock(), 'ticks': ticks()}
+
+
+def main(argv):
+    print('{:d} days, one cycle every {:d} s, from {:02d}:{:02d}'.format(DAYS, PERIOD_S, START[3], START[4]))
+    print('{:<11} {:>8} {:>9} {:>10} {:>12} {:>11} {:>6} {:>10} {:>9} {:>8}'.format(
+        'scheduling', 'cycles', 'expected', 'midnights', 'max gap (s)', 'drift (ms)',
+        'late', 'mean (ms)', 'max (ms)', 'skipped'))
+    for name, r in run().items():
+        late = ('{:>6d} {:>10.1f} {:>9d} {:>8d}'.format(*r['late']) if r['late'] is not None
+                else '{:>6} {:>10} {:>9} {:>8}'.format('-', '-', '-', '-'))
+        print('{:<11} {:>8d} {:>9d} {:>10d} {:>12.1f} {:>11.1f} {}'.format(
+            name, r['cycles'], r['expected'], r['midnights'], r['max_gap_s'], r['drift_ms'], late))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
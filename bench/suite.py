@@ -0,0 +1,212 @@
+"""I2C cost of every driver API call and of a full measurement cycle.
+
+Each case runs on a fresh simulated Pysense (100 kHz bus) and reports, per
+call: I2C transactions, bytes, NACKs, bus time, time slept and total
+elapsed time. The results can be written as JSON and compared with a
+previous run to spot regressions:
+
+    python -m bench.suite --json before.json
+    python -m bench.suite --json after.json --compare before.json
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+import sim
+
+REPEAT = 5
+METRICS = ('transactions', 'bytes', 'nacks', 'bus_time_us', 'sleep_us', 'elapsed_us')
+
+
+def _world():
+    world = sim.install()
+    world.attach_board('pysense')
+    return world
+
+
+def _new(name, *args, **kwargs):
+    return getattr(sim.load(name), name)(*args, **kwargs)
+
+
+def _lis2hh12_fifo(world):
+    li = _new('LIS2HH12')
+    li.enable_fifo(watermark=16)
+    return li
+
+
+def _lis2hh12_read_fifo(world):
+    li = _lis2hh12_fifo(world)
+    # half a second at 50 Hz (not measured): the FIFO holds 25 samples on every call
+    return (li.read_fifo, lambda: world.clock.advance_us(500000))
+
+
+def _ltr329als01_auto(world):
+    lt = _new('LTR329ALS01', auto_range=True)
+    # first reading selects the range
+    lt.read()
+    return lt.read
+
+
+def _registry():
+    sensors = sim.load('sensors').SensorRegistry()
+    sensors.register('LTR329ALS01', lambda: _new('LTR329ALS01', auto_range=True))
+    sensors.register('MPL3115A2', lambda: _new('MPL3115A2', one_shot=True, profile='precise'))
+    sensors.register('SI7006A20', lambda: _new('SI7006A20'))
+    sensors.register('LIS2HH12', lambda: _new('LIS2HH12'))
+    return sensors
+
+
+def _sequential(sensors):
+    sensors.get('LTR329ALS01').read()
+    sensors.get('MPL3115A2').measure()
+    sensors.get('SI7006A20').measure(24.4)
+    sensors.get('LIS2HH12').orientation()
+
+
+def _cycle(concurrent, warm):
+    def setup(world):
+        sensors = _registry()
+        acquire = sim.load('acquire')
+
+        def cycle():
+            if not warm:
+                for name in ('LTR329ALS01', 'MPL3115A2', 'SI7006A20', 'LIS2HH12'):
+                    sensors.invalidate(name)
+            if concurrent:
+                acquire.run(acquire.measure_all(sensors, 24.4))
+            else:
+                _sequential(sensors)
+        if warm:
+            cycle()
+        return cycle
+    return setup
+
+
+# (driver, API call, setup(world) -> callable measured REPEAT times, or (callable,
+# preparation run before each call and not measured))
+CASES = (
+    ('Pycoproc', '__init__', lambda w: lambda: sim.load('pycoproc').Pycoproc()),
+    ('Pycoproc', 'read_fw_version', lambda w: sim.load('pycoproc').Pycoproc().read_fw_version),
+    ('Pycoproc', 'read_product_id', lambda w: sim.load('pycoproc').Pycoproc().read_product_id),
+    ('Pycoproc', 'peek_memory', lambda w: lambda p=sim.load('pycoproc').Pycoproc(): p.peek_memory(0x0C)),
+    ('Pycoproc', 'poke_memory', lambda w: lambda p=sim.load('pycoproc').Pycoproc(): p.poke_memory(0x20C, 0x08)),
+    ('Pycoproc', 'set_bits_in_memory', lambda w: lambda p=sim.load('pycoproc').Pycoproc(): p.set_bits_in_memory(0x0E, 0x80)),
+    ('Pycoproc', 'read_battery_voltage', lambda w: sim.load('pycoproc').Pycoproc().read_battery_voltage),
+    ('Pycoproc', 'calibrate_rtc', lambda w: sim.load('pycoproc').Pycoproc().calibrate_rtc),
+    ('LIS2HH12', '__init__', lambda w: lambda: _new('LIS2HH12')),
+    ('LIS2HH12', 'acceleration', lambda w: _new('LIS2HH12').acceleration),
+    ('LIS2HH12', 'orientation', lambda w: _new('LIS2HH12').orientation),
+    ('LIS2HH12', 'fifo_status', lambda w: _lis2hh12_fifo(w).fifo_status),
+    ('LIS2HH12', 'read_fifo (25 samples)', _lis2hh12_read_fifo),
+    ('MPL3115A2', '__init__', lambda w: lambda: _new('MPL3115A2', one_shot=True, profile='precise')),
+    ('MPL3115A2', 'measure (fast)', lambda w: _new('MPL3115A2', one_shot=True, profile='fast').measure),
+    ('MPL3115A2', 'measure (precise)', lambda w: _new('MPL3115A2', one_shot=True, profile='precise').measure),
+    ('MPL3115A2', 'pressure', lambda w: _new('MPL3115A2').pressure),
+    ('MPL3115A2', 'temperature', lambda w: _new('MPL3115A2').temperature),
+    ('SI7006A20', '__init__', lambda w: lambda: _new('SI7006A20')),
+    ('SI7006A20', 'temperature', lambda w: _new('SI7006A20').temperature),
+    ('SI7006A20', 'humidity', lambda w: _new('SI7006A20').humidity),
+    ('SI7006A20', 'measure', lambda w: lambda si=_new('SI7006A20'): si.measure(24.4)),
+    ('SI7006A20', 'read_user_reg', lambda w: _new('SI7006A20').read_user_reg),
+    ('LTR329ALS01', '__init__', lambda w: lambda: _new('LTR329ALS01')),
+    ('LTR329ALS01', 'read', lambda w: _new('LTR329ALS01').read),
+    ('LTR329ALS01', 'read (auto-range)', _ltr329als01_auto),
+    ('cycle', 'cold, sequential', _cycle(False, False)),
+    ('cycle', 'warm, sequential', _cycle(False, True)),
+    ('cycle', 'cold, concurrent', _cycle(True, False)),
+    ('cycle', 'warm, concurrent', _cycle(True, True)),
+)
+
+
+def measure(world, call, repeat=REPEAT, prepare=None):
+    """ mean cost of call() over repeat calls """
+    clock = world.clock
+    bus = world.bus
+    total = {'transactions': 0, 'bytes': 0, 'nacks': 0, 'bus_time_us': 0, 'sleep_us': 0, 'elapsed_us': 0}
+    for _ in range(repeat):
+        if prepare is not None:
+            prepare()
+        bus.reset_stats()
+        start = clock.now_us
+        slept = clock.slept_us
+        call()
+        totals = bus.totals()
+        total['transactions'] += totals.transactions
+        total['bytes'] += totals.bytes
+        total['nacks'] += totals.nacks
+        total['bus_time_us'] += totals.time_us
+        total['sleep_us'] += clock.slept_us - slept
+        total['elapsed_us'] += clock.now_us - start
+    return dict((k, v / repeat) for k, v in total.items())
+
+
+def _commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(repeat=REPEAT):
+    results = []
+    for driver, call, setup in CASES:
+        world = _world()
+        fn = setup(world)
+        prepare = None
+        if isinstance(fn, tuple):
+            fn, prepare = fn
+        entry = {'driver': driver, 'call': call}
+        entry.update(measure(world, fn, repeat, prepare))
+        results.append(entry)
+    return {'commit': _commit(), 'baudrate': 100000, 'repeat': repeat, 'results': results}
+
+
+def _key(entry):
+    return entry['driver'] + '.' + entry['call']
+
+
+def compare(current, previous):
+    """ {driver.call: {metric: (previous, current)}} for the metrics that changed """
+    before = dict((_key(e), e) for e in previous['results'])
+    changes = {}
+    for entry in current['results']:
+        old = before.get(_key(entry))
+        if old is None:
+            continue
+        diff = dict((m, (old[m], entry[m])) for m in METRICS if abs(old[m] - entry[m]) > 1e-9)
+        if diff:
+            changes[_key(entry)] = diff
+    return changes
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python -m bench.suite')
+    parser.add_argument('--json', metavar='FILE', help='writes the results to FILE')
+    parser.add_argument('--compare', metavar='FILE', help='compares with the results in FILE')
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    args = parser.parse_args(argv[1:])
+
+    report = run(args.repeat)
+    print('{:<12} {:<24} {:>6} {:>6} {:>6} {:>10} {:>10} {:>11}'.format(
+        'driver', 'call', 'trans', 'bytes', 'NACKs', 'bus (ms)', 'sleep (ms)', 'total (ms)'))
+    for r in report['results']:
+        print('{:<12} {:<24} {:>6.1f} {:>6.1f} {:>6.1f} {:>10.2f} {:>10.2f} {:>11.2f}'.format(
+            r['driver'], r['call'], r['transactions'], r['bytes'], r['nacks'],
+            r['bus_time_us'] / 1000, r['sleep_us'] / 1000, r['elapsed_us'] / 1000))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        changes = compare(report, previous)
+        print('\nchanges since {}:'.format(previous.get('commit')) if changes else '\nno changes since {}'.format(previous.get('commit')))
+        for key, diff in sorted(changes.items()):
+            for metric, (old, new) in sorted(diff.items()):
+                print('  {:<38} {:<13} {:>12.1f} -> {:>12.1f}'.format(key, metric, old, new))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -11,7 +11,9 @@
 import math
 import time
 import struct
+from array import array
 from machine import Pin
+import i2cbus
 
 
 FULL_SCALE_2G = const(0)
@@ -26,6 +28,15 @@ ODR_200_HZ = const(4)
 ODR_400_HZ = const(5)
 ODR_800_HZ = const(6)
 
+FIFO_MODE_BYPASS = const(0)
+FIFO_MODE_FIFO = const(1)
+FIFO_MODE_STREAM = const(2)
+FIFO_MODE_STREAM_TO_FIFO = const(3)
+FIFO_MODE_BYPASS_TO_STREAM = const(4)
+FIFO_MODE_BYPASS_TO_FIFO = const(7)
+
+FIFO_SIZE = const(32)
+
 ACC_G_DIV = 1000 * 65536
 
 
@@ -47,22 +58,27 @@ class LIS2HH12:
     ACC_Z_H_REG = const(0x2D)
     ACT_THS = const(0x1E)
     ACT_DUR = const(0x1F)
+    FIFO_CTRL_REG = const(0x2E)
+    FIFO_SRC_REG = const(0x2F)
 
     SCALES = {FULL_SCALE_2G: 4000, FULL_SCALE_4G: 8000, FULL_SCALE_8G: 16000}
     ODRS = [0, 10, 50, 100, 200, 400, 800]
 
     def __init__(self, pysense = None, sda = 'P22', scl = 'P21'):
         if pysense is not None:
-            self.i2c = pysense.i2c
+            self.i2c = i2cbus.shared(0, sda, scl, i2c=pysense.i2c)
         else:
-            from machine import I2C
-            self.i2c = I2C(0, mode=I2C.MASTER, pins=(sda, scl))
+            self.i2c = i2cbus.shared(0, sda, scl)
 
         self.odr = 0
         self.full_scale = 0
         self.x = 0
         self.y = 0
         self.z = 0
+        self._acc_buf = bytearray(6)
+        self._fifo_buf = None
+        self._ring = None
+        self.fifo_overruns = 0
         self.int_pin = None
         self.act_dur = 0
         self.debounced = False
@@ -77,6 +93,9 @@ class LIS2HH12:
         # change the full-scale to 4g
         self.set_full_scale(FULL_SCALE_4G)
 
+        # enable register address auto-increment for the burst reads
+        self.set_register(CTRL4_REG, 1, 2, 1)
+
         # set the interrupt pin as active low and open drain
         self.set_register(CTRL5_REG, 3, 0, 3)
 
@@ -84,25 +103,127 @@ class LIS2HH12:
         self.acceleration()
 
     def acceleration(self):
-        x = self.i2c.readfrom_mem(ACC_I2CADDR , ACC_X_L_REG, 2)
-        self.x = struct.unpack('<h', x)
-        y = self.i2c.readfrom_mem(ACC_I2CADDR , ACC_Y_L_REG, 2)
-        self.y = struct.unpack('<h', y)
-        z = self.i2c.readfrom_mem(ACC_I2CADDR , ACC_Z_L_REG, 2)
-        self.z = struct.unpack('<h', z)
+        # X, Y and Z (low and high bytes) in a single burst read
+        self.i2c.readfrom_mem_into(ACC_I2CADDR , ACC_X_L_REG, self._acc_buf)
+        self.x, self.y, self.z = struct.unpack('<hhh', self._acc_buf)
         _mult = self.SCALES[self.full_scale] / ACC_G_DIV
-        return (self.x[0] * _mult, self.y[0] * _mult, self.z[0] * _mult)
+        return (self.x * _mult, self.y * _mult, self.z * _mult)
 
-    def roll(self):
-        x,y,z = self.acceleration()
+    def _roll(self, x, y, z):
         rad = math.atan2(-x, z)
         return (180 / math.pi) * rad
 
-    def pitch(self):
-        x,y,z = self.acceleration()
+    def _pitch(self, x, y, z):
         rad = -math.atan2(y, (math.sqrt(x*x + z*z)))
         return (180 / math.pi) * rad
 
+    def roll(self):
+        x,y,z = self.acceleration()
+        return self._roll(x, y, z)
+
+    def pitch(self):
+        x,y,z = self.acceleration()
+        return self._pitch(x, y, z)
+
+    def orientation(self):
+        """ returns (acceleration, roll, pitch) computed from a single sample """
+        acc = self.acceleration()
+        return (acc, self._roll(*acc), self._pitch(*acc))
+
+    def g_per_count(self):
+        """ multiplier from raw counts (as returned by fifo_blocks) to g """
+        return self.SCALES[self.full_scale] / ACC_G_DIV
+
+    def enable_fifo(self, mode=FIFO_MODE_STREAM, watermark=16, ring_samples=128):
+        """ enables the hardware FIFO (32 samples) and a ring buffer of ring_samples samples """
+        if watermark < 1 or watermark > FIFO_SIZE - 1:
+            raise ValueError("FIFO watermark must be between 1 and %d" % (FIFO_SIZE - 1))
+        if self.odr == ODR_POWER_DOWN:
+            raise ValueError("FIFO needs an output data rate, see set_odr")
+        self._fifo_buf = bytearray(FIFO_SIZE * 6)
+        self._ring = array('h', [0] * (ring_samples * 3))
+        self._ring_samples = ring_samples
+        self._ring_start = 0
+        self._ring_count = 0
+        self.fifo_watermark = watermark
+        self.fifo_overruns = 0
+
+        # FIFO_EN
+        self.set_register(CTRL3_REG, 1, 7, 1)
+        # go through bypass mode to restart the FIFO, then set mode and watermark
+        self.i2c.writeto_mem(ACC_I2CADDR, FIFO_CTRL_REG, bytes([0]))
+        self.i2c.writeto_mem(ACC_I2CADDR, FIFO_CTRL_REG, bytes([((mode & 0x07) << 5) | (watermark & 0x1F)]))
+
+    def disable_fifo(self):
+        self.i2c.writeto_mem(ACC_I2CADDR, FIFO_CTRL_REG, bytes([0]))
+        self.set_register(CTRL3_REG, 0, 7, 1)
+        self._fifo_buf = None
+        self._ring = None
+
+    def fifo_status(self):
+        """ returns (unread samples, watermark reached, overrun) """
+        src = self.i2c.readfrom_mem(ACC_I2CADDR, FIFO_SRC_REG, 1)[0]
+        level = src & 0x1F
+        if level == 0 and not src & 0x20:
+            # not empty, but FSS can only count up to 31
+            level = FIFO_SIZE
+        return (level, bool(src & 0x80), bool(src & 0x40))
+
+    def read_fifo(self):
+        """ drains the FIFO into the ring buffer with one burst read, returns the samples read
+            (with auto-increment the address wraps from ACC_Z_H_REG back to ACC_X_L_REG) """
+        level, _, overrun = self.fifo_status()
+        if overrun:
+            self.fifo_overruns += 1
+        if level == 0:
+            return 0
+        self.i2c.readfrom_mem_into(ACC_I2CADDR, ACC_X_L_REG, memoryview(self._fifo_buf)[:level * 6])
+        ring = self._ring
+        size = self._ring_samples
+        for i in range(level):
+            if self._ring_count == size:
+                # ring full, drop the oldest sample
+                self._ring_start = (self._ring_start + 1) % size
+                self._ring_count -= 1
+                self.fifo_overruns += 1
+            j = ((self._ring_start + self._ring_count) % size) * 3
+            ring[j], ring[j + 1], ring[j + 2] = struct.unpack_from('<hhh', self._fifo_buf, i * 6)
+            self._ring_count += 1
+        return level
+
+    def fifo_blocks(self, block=None):
+        """ generator yielding blocks of raw samples as array('h') [x0, y0, z0, x1, ...]
+            (block samples each, the watermark by default). The same array is reused
+            for every block, copy it if it must outlive the next iteration. """
+        if self._ring is None:
+            raise ValueError("FIFO not enabled")
+        if block is None:
+            block = self.fifo_watermark
+        if block > self._ring_samples:
+            raise ValueError("block %d exceeds ring buffer size %d" % (block, self._ring_samples))
+        out = array('h', [0] * (block * 3))
+        while True:
+            while self._ring_count < block:
+                self.read_fifo()
+                missing = block - self._ring_count
+                if missing > 0:
+                    # wait until the FIFO holds the missing samples
+                    time.sleep_ms(max(1, (1000 * min(missing, FIFO_SIZE)) // self.ODRS[self.odr]))
+            ring = self._ring
+            size = self._ring_samples
+            j = self._ring_start
+            for i in range(0, block * 3, 3):
+                r = j * 3
+                out[i] = ring[r]
+                out[i + 1] = ring[r + 1]
+                out[i + 2] = ring[r + 2]
+                j += 1
+                if j == size:
+                    j = 0
+            self._ring_start = j
+            self._ring_count -= block
+            yield out
+
     def set_register(self, register, value, offset, mask):
         reg = bytearray(self.i2c.readfrom_mem(ACC_I2CADDR, register, 1))
         reg[0] &= ~(mask << offset)
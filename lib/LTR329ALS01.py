@@ -9,7 +9,7 @@
 #
 
 import time
-from machine import I2C
+import i2cbus
 
 class LTR329ALS01:
     ALS_I2CADDR = const(0x29) # The device's I2C address
@@ -21,6 +21,7 @@ class LTR329ALS01:
     ALS_DATA_CH1_HIGH = const(0x89)
     ALS_DATA_CH0_LOW = const(0x8A)
     ALS_DATA_CH0_HIGH = const(0x8B)
+    ALS_STATUS_REG = const(0x8C)
 
     ALS_GAIN_1X = const(0x00)
     ALS_GAIN_2X = const(0x01)
@@ -62,15 +63,58 @@ class LTR329ALS01:
     ALS_RATE_500 = const(0x03)
     ALS_RATE_1000 = const(0x04)
     ALS_RATE_2000 = const(0x05)
+    ALS_RATE_VALUES = {
+        ALS_RATE_50: 50,
+        ALS_RATE_100: 100,
+        ALS_RATE_200: 200,
+        ALS_RATE_500: 500,
+        ALS_RATE_1000: 1000,
+        ALS_RATE_2000: 2000
+    }
+
+    # Auto-range: (gain, integration) from the least to the most sensitive.
+    # Readings above AUTO_RANGE_HIGH or below AUTO_RANGE_LOW counts move to the
+    # step expected to give the peak count closest to (not above) AUTO_RANGE_TARGET;
+    # the gap between the thresholds is the hysteresis
+    AUTO_RANGE_STEPS = (
+        (ALS_GAIN_1X, ALS_INT_50),
+        (ALS_GAIN_1X, ALS_INT_100),
+        (ALS_GAIN_2X, ALS_INT_100),
+        (ALS_GAIN_4X, ALS_INT_100),
+        (ALS_GAIN_8X, ALS_INT_100),
+        (ALS_GAIN_8X, ALS_INT_200),
+        (ALS_GAIN_48X, ALS_INT_100),
+        (ALS_GAIN_48X, ALS_INT_200),
+        (ALS_GAIN_96X, ALS_INT_200),
+        (ALS_GAIN_96X, ALS_INT_400)
+    )
+    AUTO_RANGE_HIGH = const(50000)
+    AUTO_RANGE_LOW = const(5000)
+    AUTO_RANGE_TARGET = const(25000)
 
-    def __init__(self, pysense = None, sda = 'P22', scl = 'P21', gain = ALS_GAIN_1X, integration = ALS_INT_100, rate = ALS_RATE_500):
+    def __init__(self, pysense = None, sda = 'P22', scl = 'P21', gain = ALS_GAIN_1X, integration = ALS_INT_100, rate = ALS_RATE_500, auto_range = False):
+        """ auto_range: read() adjusts gain and integration from the last counts (see read_auto) """
         if pysense is not None:
-            self.i2c = pysense.i2c
+            self.i2c = i2cbus.shared(0, sda, scl, i2c=pysense.i2c)
         else:
-            self.i2c = I2C(0, mode=I2C.MASTER, pins=(sda, scl))
+            self.i2c = i2cbus.shared(0, sda, scl)
 
+        if auto_range:
+            # new data after each integration period
+            rate = self._fastest_rate(integration)
         self.gain = gain
         self.integration = integration
+        self.rate = rate
+        self._data = bytearray(4)
+        self._status = bytearray(1)
+        self._update_divisor()
+        self.auto_range = auto_range
+        self.range_index = None
+        # whether a measurement with the current settings is available
+        self.settled = False
+        for i in range(len(self.AUTO_RANGE_STEPS)):
+            if self.AUTO_RANGE_STEPS[i] == (gain, integration):
+                self.range_index = i
 
         contr = self._getContr(gain)
         self.i2c.writeto_mem(ALS_I2CADDR, ALS_CONTR_REG, bytearray([contr]))
@@ -89,29 +133,153 @@ class LTR329ALS01:
     def _getWord(self, high, low):
         return ((high & 0xFF) << 8) + (low & 0xFF)
 
-    def light(self):
-        ch1low = self.i2c.readfrom_mem(ALS_I2CADDR , ALS_DATA_CH1_LOW, 1)
-        ch1high = self.i2c.readfrom_mem(ALS_I2CADDR , ALS_DATA_CH1_HIGH, 1)
-        data1 = int(self._getWord(ch1high[0], ch1low[0]))
+    def _update_divisor(self):
+        # gain x integration, only recomputed when one of them changes
+        self._divisor = self.ALS_GAIN_VALUES[self.gain] * self.ALS_INT_VALUES[self.integration]
 
-        ch0low = self.i2c.readfrom_mem(ALS_I2CADDR , ALS_DATA_CH0_LOW, 1)
-        ch0high = self.i2c.readfrom_mem(ALS_I2CADDR , ALS_DATA_CH0_HIGH, 1)
-        data0 = int(self._getWord(ch0high[0], ch0low[0]))
+    def set_gain(self, gain):
+        self.i2c.writeto_mem(ALS_I2CADDR, ALS_CONTR_REG, bytearray([self._getContr(gain)]))
+        self.gain = gain
+        self._update_divisor()
+
+    def set_integration(self, integration, rate = None):
+        if rate is None:
+            rate = self.rate
+        self.i2c.writeto_mem(ALS_I2CADDR, ALS_MEAS_RATE_REG, bytearray([self._getMeasRate(integration, rate)]))
+        self.integration = integration
+        self.rate = rate
+        self._update_divisor()
 
+    def _read_channels(self):
+        # CH1 low/high and CH0 low/high in a single burst read (CH1 must be read first)
+        data = self._data
+        self.i2c.readfrom_mem_into(ALS_I2CADDR , ALS_DATA_CH1_LOW, data)
+        data1 = self._getWord(data[1], data[0])
+        data0 = self._getWord(data[3], data[2])
         return (data0, data1)
 
-    def lux(self):
+    def _lux(self, data0, data1):
         # Calculate Lux value from formular in Appendix A of the datasheet
-        light_level = self.light()
-        if light_level[0]+light_level[1] > 0:
-            ratio = light_level[1]/(light_level[0]+light_level[1])
+        if data0 + data1 > 0:
+            ratio = data1 / (data0 + data1)
             if ratio < 0.45:
-                return (1.7743 * light_level[0] + 1.1059 * light_level[1]) / self.ALS_GAIN_VALUES[self.gain] / self.ALS_INT_VALUES[self.integration]
-            elif ratio < 0.64 and ratio >= 0.45:
-                return (4.2785 * light_level[0] - 1.9548 * light_level[1]) / self.ALS_GAIN_VALUES[self.gain] / self.ALS_INT_VALUES[self.integration]
-            elif ratio < 0.85 and ratio >= 0.64:
-                return (0.5926 * light_level[0] + 0.1185 * light_level[1]) / self.ALS_GAIN_VALUES[self.gain] / self.ALS_INT_VALUES[self.integration]
+                return (1.7743 * data0 + 1.1059 * data1) / self._divisor
+            elif ratio < 0.64:
+                return (4.2785 * data0 - 1.9548 * data1) / self._divisor
+            elif ratio < 0.85:
+                return (0.5926 * data0 + 0.1185 * data1) / self._divisor
             else:
                 return 0
         else:
             return 0
+
+    def read(self):
+        """ returns (channel 0, channel 1, lux) from one bus transaction
+            (auto-ranged with read_auto() if auto_range is enabled) """
+        if self.auto_range:
+            return self.read_auto()
+        data0, data1 = self._read_channels()
+        return (data0, data1, self._lux(data0, data1))
+
+    def _integration_ms(self):
+        return int(self.ALS_INT_VALUES[self.integration] * 100)
+
+    def _fastest_rate(self, integration):
+        integration_ms = int(self.ALS_INT_VALUES[integration] * 100)
+        rate = ALS_RATE_2000
+        for r, rate_ms in self.ALS_RATE_VALUES.items():
+            if rate_ms >= integration_ms and rate_ms < self.ALS_RATE_VALUES[rate]:
+                rate = r
+        return rate
+
+    def set_range(self, index):
+        """ selects step index of AUTO_RANGE_STEPS, with the fastest measurement rate
+            allowed by its integration time so new data comes after one integration period """
+        gain, integration = self.AUTO_RANGE_STEPS[index]
+        rate = self._fastest_rate(integration)
+        if gain != self.gain:
+            self.set_gain(gain)
+        if integration != self.integration or rate != self.rate:
+            self.set_integration(integration, rate)
+        self.range_index = index
+        self.settled = False
+
+    def period_ms(self):
+        """ time between measurements with the current settings """
+        return max(self._integration_ms(), self.ALS_RATE_VALUES[self.rate])
+
+    def new_data(self):
+        """ True when a new valid measurement is available """
+        self.i2c.readfrom_mem_into(ALS_I2CADDR, ALS_STATUS_REG, self._status)
+        if (self._status[0] & 0x84) == 0x04:
+            self.settled = True
+        return self.settled
+
+    def wait_new_data(self):
+        """ waits for the first measurement with the current settings """
+        period_ms = self.period_ms()
+        time.sleep_ms(period_ms)
+        waited = period_ms
+        while not self.new_data():
+            if waited >= 2 * period_ms:
+                self.settled = True
+                return
+            time.sleep_ms(5)
+            waited += 5
+
+    def _sensitivity(self, index):
+        gain, integration = self.AUTO_RANGE_STEPS[index]
+        return self.ALS_GAIN_VALUES[gain] * self.ALS_INT_VALUES[integration]
+
+    def _range_for(self, peak):
+        """ step for the next reading given the peak count of the last one """
+        index = self.range_index
+        if AUTO_RANGE_LOW <= peak <= AUTO_RANGE_HIGH:
+            return index
+        current = self._sensitivity(index)
+        if peak > AUTO_RANGE_HIGH:
+            # saturated counts are a lower bound, go at least one step down
+            best = max(index - 1, 0)
+            while best > 0 and peak * self._sensitivity(best) / current > AUTO_RANGE_TARGET:
+                best -= 1
+            return best
+        best = index
+        for i in range(index + 1, len(self.AUTO_RANGE_STEPS)):
+            if peak * self._sensitivity(i) / current <= AUTO_RANGE_TARGET:
+                best = i
+        return best
+
+    def auto_range_step(self, last = False):
+        """ one auto-range iteration: returns (channel 0, channel 1, lux) if the counts are
+            in range (or last is True), otherwise selects a better step and returns None
+            (wait for new data, see new_data(), before the next iteration) """
+        if self.range_index is None:
+            # current settings are not part of the range, start from 1X, 100 ms
+            self.set_range(1)
+            return None
+        data0, data1 = self._read_channels()
+        index = self._range_for(max(data0, data1))
+        if index == self.range_index or last:
+            return (data0, data1, self._lux(data0, data1))
+        self.set_range(index)
+        return None
+
+    def read_auto(self, max_steps = None):
+        """ returns (channel 0, channel 1, lux), stepping gain and integration until the
+            counts are within AUTO_RANGE_LOW...AUTO_RANGE_HIGH (or the range ends) """
+        if max_steps is None:
+            max_steps = len(self.AUTO_RANGE_STEPS)
+        steps = 0
+        while True:
+            if not self.settled:
+                self.wait_new_data()
+            result = self.auto_range_step(steps >= max_steps)
+            if result is not None:
+                return result
+            steps += 1
+
+    def light(self):
+        return self._read_channels()
+
+    def lux(self):
+        return self.read()[2]
@@ -9,11 +9,36 @@
 #
 
 import time
-from machine import I2C
+import i2cbus
 
 ALTITUDE = const(0)
 PRESSURE = const(1)
 
+SEA_LEVEL_PRESSURE = 101326.0
+
+# Oversampling ratio -> OS bits of CTRL_REG1 and minimum time between data samples (ms)
+OVERSAMPLING = {
+    1: (0, 6),
+    2: (1, 10),
+    4: (2, 18),
+    8: (3, 34),
+    16: (4, 66),
+    32: (5, 130),
+    64: (6, 258),
+    128: (7, 512),
+}
+
+# Latency/precision trade-off profiles -> oversampling ratio
+PROFILES = {
+    'fast': 2,
+    'balanced': 16,
+    'precise': 128,
+}
+
+def pressure_to_altitude(pressure, sea_level = SEA_LEVEL_PRESSURE):
+    """ altitude (m) from pressure (Pa), barometric formula of the MPL3115A2 datasheet """
+    return 44330.77 * (1 - pow(pressure / sea_level, 0.1902632))
+
 class MPL3115A2exception(Exception):
     pass
 
@@ -53,26 +78,50 @@ class MPL3115A2:
     MPL3115_OFFSET_T = const(0x2c)
     MPL3115_OFFSET_H = const(0x2d)
 
-    def __init__(self, pysense = None, sda = 'P22', scl = 'P21', mode = PRESSURE):
+    def __init__(self, pysense = None, sda = 'P22', scl = 'P21', mode = PRESSURE, one_shot = False, oversampling = 128, profile = None):
+        """ one_shot: keep the sensor in standby (barometer mode) and convert only on measure(),
+            which returns pressure, altitude (computed from pressure) and temperature
+            oversampling: 1, 2, 4 ... 128, or profile: 'fast', 'balanced' or 'precise'
+            (the expected time per conversion is in conversion_time_ms) """
         if pysense is not None:
-            self.i2c = pysense.i2c
+            self.i2c = i2cbus.shared(0, sda, scl, i2c=pysense.i2c)
         else:
-            self.i2c = I2C(0, mode=I2C.MASTER, pins=(sda, scl))
+            self.i2c = i2cbus.shared(0, sda, scl)
 
         self.STA_reg = bytearray(1)
         self.mode = mode
+        self.one_shot = one_shot
+        self.sea_level = SEA_LEVEL_PRESSURE
+        self._data = bytearray(5)
+        self._ctrl = bytearray(1)
+
+        if profile is not None:
+            if profile not in PROFILES:
+                raise MPL3115A2exception("Invalid profile MPL3115A2")
+            oversampling = PROFILES[profile]
+        if oversampling not in OVERSAMPLING:
+            raise MPL3115A2exception("Invalid oversampling MPL3115A2")
+        os_bits, self.conversion_time_ms = OVERSAMPLING[oversampling]
+        self.oversampling = oversampling
+
+        if one_shot:
+            self.mode = PRESSURE
+            self.ctrl_reg1 = os_bits << 3 # barometer mode, not raw, standby
+            self.i2c.writeto_mem(MPL3115_I2CADDR, MPL3115_CTRL_REG1, bytes([self.ctrl_reg1]))
+            self.i2c.writeto_mem(MPL3115_I2CADDR, MPL3115_PT_DATA_CFG, bytes([0x07])) # no events detected
+            return
 
         if self.mode is PRESSURE:
-            self.i2c.writeto_mem(MPL3115_I2CADDR, MPL3115_CTRL_REG1, bytes([0x38])) # barometer mode, not raw, oversampling 128, minimum time 512 ms
-            self.i2c.writeto_mem(MPL3115_I2CADDR, MPL3115_PT_DATA_CFG, bytes([0x07])) # no events detected
-            self.i2c.writeto_mem(MPL3115_I2CADDR, MPL3115_CTRL_REG1, bytes([0x39])) # active
+            self.ctrl_reg1 = os_bits << 3 # barometer mode, not raw, 0x38 for oversampling 128 (minimum time 512 ms)
         elif self.mode is ALTITUDE:
-            self.i2c.writeto_mem(MPL3115_I2CADDR, MPL3115_CTRL_REG1, bytes([0xB8])) # altitude mode, not raw, oversampling 128, minimum time 512 ms
-            self.i2c.writeto_mem(MPL3115_I2CADDR, MPL3115_PT_DATA_CFG, bytes([0x07])) # no events detected
-            self.i2c.writeto_mem(MPL3115_I2CADDR, MPL3115_CTRL_REG1, bytes([0xB9])) # active
+            self.ctrl_reg1 = 0x80 | (os_bits << 3) # altitude mode, not raw, 0xB8 for oversampling 128 (minimum time 512 ms)
         else:
             raise MPL3115A2exception("Invalid Mode MPL3115A2")
 
+        self.i2c.writeto_mem(MPL3115_I2CADDR, MPL3115_CTRL_REG1, bytes([self.ctrl_reg1]))
+        self.i2c.writeto_mem(MPL3115_I2CADDR, MPL3115_PT_DATA_CFG, bytes([0x07])) # no events detected
+        self.i2c.writeto_mem(MPL3115_I2CADDR, MPL3115_CTRL_REG1, bytes([self.ctrl_reg1 | 0x01])) # active
+
         if self._read_status():
             pass
         else:
@@ -97,26 +146,60 @@ class MPL3115A2:
         self.i2c.writeto_mem(MPL3115_I2CADDR, MPL3115_CTRL_REG1, bytes([0x04])) # reset
         return False
 
+    def start_conversion(self):
+        """ triggers a one-shot pressure and temperature conversion (OST) """
+        self.i2c.writeto_mem(MPL3115_I2CADDR, MPL3115_CTRL_REG1, bytes([self.ctrl_reg1 | 0x02]))
+
+    def conversion_done(self):
+        """ the OST bit clears itself at the end of a one-shot conversion """
+        self.i2c.readfrom_mem_into(MPL3115_I2CADDR, MPL3115_CTRL_REG1, self._ctrl)
+        return not self._ctrl[0] & 0x02
+
+    def read_data(self):
+        """ returns (pressure, altitude, temperature) from a single 5-byte burst read """
+        self.i2c.readfrom_mem_into(MPL3115_I2CADDR, MPL3115_PRESSURE_DATA_MSB, self._data)
+        pres = self._pressure(self._data)
+        return (pres, pressure_to_altitude(pres, self.sea_level), self._temperature(self._data[3:5]))
+
+    def measure(self):
+        """ one-shot conversion, returns (pressure (Pa), altitude (m), temperature (deg C)) """
+        if not self.one_shot:
+            raise MPL3115A2exception("MPL3115A2 not in one-shot mode")
+        self.start_conversion()
+        time.sleep_ms(self.conversion_time_ms)
+        read_attempts = 0
+        while not self.conversion_done():
+            read_attempts += 1
+            if read_attempts > 100:
+                raise MPL3115A2exception("MPL3115A2 conversion timeout")
+            time.sleep_ms(2)
+        return self.read_data()
+
+    def _pressure(self, data):
+        return float((data[0] << 10) + (data[1] << 2) + ((data[2] >> 6) & 0x03) + ((data[2] >> 4) & 0x03) / 4.0)
+
+    def _temperature(self, data):
+        temp_int = data[0]
+        if temp_int > 127:
+            temp_int -= 256
+        return float(temp_int + data[1] / 256.0)
+
     def pressure(self):
         if self.mode == ALTITUDE:
             raise MPL3115A2exception("Incorrect Measurement Mode MPL3115A2")
 
-        OUT_P_MSB = self.i2c.readfrom_mem(MPL3115_I2CADDR, MPL3115_PRESSURE_DATA_MSB,1)
-        OUT_P_CSB = self.i2c.readfrom_mem(MPL3115_I2CADDR, MPL3115_PRESSURE_DATA_CSB,1)
-        OUT_P_LSB = self.i2c.readfrom_mem(MPL3115_I2CADDR, MPL3115_PRESSURE_DATA_LSB,1)
+        OUT_P = self.i2c.readfrom_mem(MPL3115_I2CADDR, MPL3115_PRESSURE_DATA_MSB, 3)
 
-        return float((OUT_P_MSB[0] << 10) + (OUT_P_CSB[0] << 2) + ((OUT_P_LSB[0] >> 6) & 0x03) + ((OUT_P_LSB[0] >> 4) & 0x03) / 4.0)
+        return self._pressure(OUT_P)
 
     def altitude(self):
         if self.mode == PRESSURE:
             raise MPL3115A2exception("Incorrect Measurement Mode MPL3115A2")
 
-        OUT_P_MSB = self.i2c.readfrom_mem(MPL3115_I2CADDR, MPL3115_PRESSURE_DATA_MSB,1)
-        OUT_P_CSB = self.i2c.readfrom_mem(MPL3115_I2CADDR, MPL3115_PRESSURE_DATA_CSB,1)
-        OUT_P_LSB = self.i2c.readfrom_mem(MPL3115_I2CADDR, MPL3115_PRESSURE_DATA_LSB,1)
+        OUT_P = self.i2c.readfrom_mem(MPL3115_I2CADDR, MPL3115_PRESSURE_DATA_MSB, 3)
 
-        alt_int = (OUT_P_MSB[0] << 8) + (OUT_P_CSB[0])
-        alt_frac = ((OUT_P_LSB[0] >> 4) & 0x0F)
+        alt_int = (OUT_P[0] << 8) + (OUT_P[1])
+        alt_frac = ((OUT_P[2] >> 4) & 0x0F)
 
         if alt_int > 32767:
             alt_int -= 65536
@@ -124,13 +207,6 @@ class MPL3115A2:
         return float(alt_int + alt_frac / 16.0)
 
     def temperature(self):
-        OUT_T_MSB = self.i2c.readfrom_mem(MPL3115_I2CADDR, MPL3115_TEMP_DATA_MSB,1)
-        OUT_T_LSB = self.i2c.readfrom_mem(MPL3115_I2CADDR, MPL3115_TEMP_DATA_LSB,1)
-
-        temp_int = OUT_T_MSB[0]
-        temp_frac = OUT_T_LSB[0]
-
-        if temp_int > 127:
-            temp_int -= 256
+        OUT_T = self.i2c.readfrom_mem(MPL3115_I2CADDR, MPL3115_TEMP_DATA_MSB, 2)
 
-        return float(temp_int + temp_frac / 256.0)
+        return self._temperature(OUT_T)
@@ -9,7 +9,7 @@
 #
 
 import time
-from machine import I2C
+import i2cbus
 import math
 
 __version__ = '0.0.2'
@@ -25,6 +25,7 @@ class SI7006A20:
     # I2C commands
     TEMP_NOHOLDMASTER = const(0xF3)
     HUMD_NOHOLDMASTER = const(0xF5)
+    TEMP_FROM_PREVIOUS_RH = const(0xE0)
     WRITE_USER_REG1 = const(0xE6)
     READ_USER_REG1 = const(0xE7)
     WRITE_HEATER_CTRL_REG = const(0x51)
@@ -35,46 +36,115 @@ class SI7006A20:
     USER_REG1_HTR_ENABLE_OFFSET = const(0x02)
     HTR_CTRL_REG_MASK = const(0b00001111)
 
+    # Conversion times (ms, datasheet maximum): a humidity conversion is followed
+    # by a temperature conversion, whose result can be read with TEMP_FROM_PREVIOUS_RH
+    TEMP_CONVERSION_MS = const(11)
+    HUMD_CONVERSION_MS = const(23)
+    POLL_INTERVAL_MS = const(2)
+    POLL_TIMEOUT_MS = const(100)
+
     def __init__(self, pysense = None, sda = 'P22', scl = 'P21'):
         if pysense is not None:
-            self.i2c = pysense.i2c
+            self.i2c = i2cbus.shared(0, sda, scl, i2c=pysense.i2c)
         else:
-            self.i2c = I2C(0, mode=I2C.MASTER, pins=(sda, scl))
+            self.i2c = i2cbus.shared(0, sda, scl)
 
     def _getWord(self, high, low):
         return ((high & 0xFF) << 8) + (low & 0xFF)
 
+    def _temperature(self, data):
+        return ((175.72 * self._getWord(data[0], data[1])) / 65536.0) - 46.85
+
+    def _humidity(self, data):
+        return ((125.0 * self._getWord(data[0], data[1])) / 65536.0) - 6.0
+
+    def _command(self, cmd):
+        self.i2c.writeto(SI7006A20_I2C_ADDR, bytearray([cmd]))
+
+    def poll(self, size):
+        """ returns the result (size bytes) of the command in progress,
+            or None while the sensor is still converting (it NACKs its address) """
+        try:
+            return self.i2c.readfrom(SI7006A20_I2C_ADDR, size, retries=0)
+        except OSError:
+            return None
+
+    def _wait_result(self, size, delay_ms=0, timeout_ms=POLL_TIMEOUT_MS):
+        if delay_ms > 0:
+            time.sleep_ms(delay_ms)
+        waited = delay_ms
+        while True:
+            data = self.poll(size)
+            if data is not None:
+                return data
+            if waited >= timeout_ms:
+                raise OSError("SI7006A20 conversion timeout")
+            time.sleep_ms(POLL_INTERVAL_MS)
+            waited += POLL_INTERVAL_MS
+
+    def start_temperature(self):
+        """ starts a temperature conversion, read it with poll(3) or temperature() """
+        self._command(TEMP_NOHOLDMASTER)
+
+    def start_humidity(self):
+        """ starts a humidity conversion (followed by a temperature conversion) """
+        self._command(HUMD_NOHOLDMASTER)
+
     def temperature(self):
         """ obtaining the temperature(degrees Celsius) measured by sensor """
-        self.i2c.writeto(SI7006A20_I2C_ADDR, bytearray([0xF3]))
-        time.sleep(0.5)
-        data = self.i2c.readfrom(SI7006A20_I2C_ADDR, 3)
+        self.start_temperature()
+        data = self._wait_result(3, TEMP_CONVERSION_MS)
         #print("CRC Raw temp data: " + hex(data[0]*65536 + data[1]*256 + data[2]))
-        data = self._getWord(data[0], data[1])
-        temp = ((175.72 * data) / 65536.0) - 46.85
-        return temp
+        return self._temperature(data)
 
     def humidity(self):
         """ obtaining the relative humidity(%) measured by sensor """
-        self.i2c.writeto(SI7006A20_I2C_ADDR, bytearray([0xF5]))
-        time.sleep(0.5)
-        data = self.i2c.readfrom(SI7006A20_I2C_ADDR, 2)
-        data = self._getWord(data[0], data[1])
-        humidity = ((125.0 * data) / 65536.0) - 6.0
-        return humidity
+        self.start_humidity()
+        data = self._wait_result(2, HUMD_CONVERSION_MS)
+        return self._humidity(data)
+
+    def start_measurement(self):
+        """ starts the conversions used by poll_measurement() and measure() """
+        self.start_humidity()
+
+    def poll_measurement(self, t_ambient=None):
+        """ returns None while converting, then (temperature, humidity, dew point, humidity
+            at t_ambient or None) from a single humidity + temperature conversion pair """
+        data = self.poll(2)
+        if data is None:
+            return None
+        humid = self._humidity(data)
+        # the temperature measured during the humidity conversion, no new conversion
+        self._command(TEMP_FROM_PREVIOUS_RH)
+        temp = self._temperature(self._wait_result(2))
+        dew_p = self.dew_point(temp, humid)
+        humid_amb = None if t_ambient is None else self.humid_ambient(t_ambient, dew_p)
+        return (temp, humid, dew_p, humid_amb)
+
+    def measure(self, t_ambient=None):
+        """ blocking version of start_measurement() + poll_measurement() """
+        self.start_measurement()
+        time.sleep_ms(HUMD_CONVERSION_MS)
+        waited = HUMD_CONVERSION_MS
+        while True:
+            result = self.poll_measurement(t_ambient)
+            if result is not None:
+                return result
+            if waited >= POLL_TIMEOUT_MS:
+                raise OSError("SI7006A20 conversion timeout")
+            time.sleep_ms(POLL_INTERVAL_MS)
+            waited += POLL_INTERVAL_MS
 
     def read_user_reg(self):
         """ reading the user configuration register """
-        self.i2c.writeto(SI7006A20_I2C_ADDR, bytearray([READ_USER_REG1]))
-        time.sleep(0.5)
-        data = self.i2c.readfrom(SI7006A20_I2C_ADDR, 1)
+        self._command(READ_USER_REG1)
+        data = self._wait_result(1)
         return data[0]
 
     def read_heater_reg(self):
         """ reading the heater configuration register """
-        self.i2c.writeto(SI7006A20_I2C_ADDR, bytearray([READ_HEATER_CTRL_REG]))
-        time.sleep(0.5)
-        data = self.i2c.readfrom(SI7006A20_I2C_ADDR, 1)
+        self._command(READ_HEATER_CTRL_REG)
+        data = self._wait_result(1)
         return data[0]
 
     def write_heater_reg(self, heater_value):
@@ -94,26 +164,21 @@ class SI7006A20:
     def read_electronic_id(self):
         """ reading electronic identifier """
         self.i2c.writeto(SI7006A20_I2C_ADDR, bytearray([0xFA]) + bytearray([0x0F]))
-        time.sleep(0.5)
-        sna = self.i2c.readfrom(SI7006A20_I2C_ADDR, 4)
-        time.sleep(0.1)
+        sna = self._wait_result(4)
         self.i2c.writeto(SI7006A20_I2C_ADDR, bytearray([0xFC]) + bytearray([0xC9]))
-        time.sleep(0.5)
-        snb = self.i2c.readfrom(SI7006A20_I2C_ADDR, 4)
+        snb = self._wait_result(4)
         return [sna[0], sna[1], sna[2], sna[3], snb[0], snb[1], snb[2], snb[3]]
 
     def read_firmware(self):
         """ reading firmware version """
         self.i2c.writeto(SI7006A20_I2C_ADDR, bytearray([0x84])+ bytearray([0xB8]))
-        time.sleep(0.5)
-        fw = self.i2c.readfrom(SI7006A20_I2C_ADDR, 1)
+        fw = self._wait_result(1)
         return fw[0]
 
     def read_reg(self, reg_addr):
         """ reading a register """
-        self.i2c.writeto(SI7006A20_I2C_ADDR, bytearray([reg_addr]))
-        time.sleep(0.5)
-        data = self.i2c.readfrom(SI7006A20_I2C_ADDR, 1)
+        self._command(reg_addr)
+        data = self._wait_result(1)
         return data[0]
 
     def write_reg(self, reg_addr, value):
@@ -121,11 +186,13 @@ class SI7006A20:
         self.i2c.writeto(SI7006A20_I2C_ADDR, bytearray([reg_addr])+bytearray([value]))
         time.sleep(0.1)
 
-    def dew_point(self):
+    def dew_point(self, temp = None, humid = None):
         """ computing the dew pointe temperature (deg C) for the current Temperature and Humidity measured pair
-            at dew-point temperature the relative humidity is 100% """
-        temp = self.temperature()
-        humid = self.humidity()
+            at dew-point temperature the relative humidity is 100%
+            (temp and humid are measured if not given) """
+        if temp is None or humid is None:
+            temp, humid, dew_p, _ = self.measure()
+            return dew_p
         h = (math.log(humid, 10) - 2) / 0.4343 + (17.62 * temp) / (243.12 + temp)
         dew_p = 243.12 * h / (17.62 - h)
         return dew_p
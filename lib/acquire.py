@@ -0,0 +1,111 @@
+"""Concurrent sensor acquisition.
+
+Every sensor first starts its conversion, then one coroutine per sensor
+waits for its own result, so the conversion waits overlap and a cycle takes
+about as long as the slowest sensor instead of the sum of all of them. The
+coroutines run under uasyncio on the device and asyncio under CPython.
+
+    results = acquire.run(acquire.measure_all(sensors, t_ambient=24.4))
+    # {'MPL3115A2': (pressure, altitude, temperature), 'SI7006A20': OSError(...), ...}
+"""
+
+import instrument
+from compat import asyncio, sleep_ms
+
+POLL_INTERVAL_MS = 2
+POLL_ATTEMPTS = 100
+
+
+async def ltr329als01(lt):
+    """ (channel 0, channel 1, lux), auto-ranged if enabled in the driver """
+    if not lt.auto_range:
+        return lt.read()
+    steps = 0
+    while True:
+        if not lt.settled:
+            await sleep_ms(lt.period_ms())
+            attempts = 0
+            while not lt.new_data() and attempts < POLL_ATTEMPTS:
+                await sleep_ms(5)
+                attempts += 1
+            lt.settled = True
+        result = lt.auto_range_step(steps >= len(lt.AUTO_RANGE_STEPS))
+        if result is not None:
+            return result
+        steps += 1
+
+
+async def mpl3115a2(mp):
+    """ (pressure, altitude, temperature) from a one-shot conversion """
+    mp.start_conversion()
+    await sleep_ms(mp.conversion_time_ms)
+    attempts = 0
+    while not mp.conversion_done():
+        attempts += 1
+        if attempts > POLL_ATTEMPTS:
+            raise OSError("MPL3115A2 conversion timeout")
+        await sleep_ms(POLL_INTERVAL_MS)
+    return mp.read_data()
+
+
+async def si7006a20(si, t_ambient=None):
+    """ (temperature, humidity, dew point, humidity at t_ambient) """
+    si.start_measurement()
+    await sleep_ms(si.HUMD_CONVERSION_MS)
+    attempts = 0
+    while True:
+        result = si.poll_measurement(t_ambient)
+        if result is not None:
+            return result
+        attempts += 1
+        if attempts > POLL_ATTEMPTS:
+            raise OSError("SI7006A20 conversion timeout")
+        await sleep_ms(POLL_INTERVAL_MS)
+
+
+async def lis2hh12(li):
+    """ (acceleration, roll, pitch), no conversion to wait for """
+    return li.orientation()
+
+
+READERS = {
+    'LTR329ALS01': ltr329als01,
+    'MPL3115A2': mpl3115a2,
+    'SI7006A20': si7006a20,
+    'LIS2HH12': lis2hh12,
+}
+
+
+async def _guarded(sensors, name, coro_factory):
+    try:
+        return await coro_factory(sensors.get(name))
+    except (OSError, ValueError) as e:
+        # I2C error (or a wrong answer, e.g. a WHO_AM_I read during a glitch), the
+        # driver is initialized again on the next cycle
+        sensors.errors[name] += 1
+        instrument.count('i2c_errors')
+        sensors.invalidate(name)
+        return e
+
+
+async def measure_all(sensors, t_ambient=None):
+    """ reads every sensor of the registry concurrently,
+        returns {name: result tuple, or the OSError (ValueError) raised by the sensor} """
+    names = []
+    tasks = []
+    for name, reader in READERS.items():
+        if name not in sensors:
+            continue
+        if name == 'SI7006A20':
+            factory = lambda si, reader=reader: reader(si, t_ambient)
+        else:
+            factory = reader
+        names.append(name)
+        tasks.append(_guarded(sensors, name, factory))
+    results = await asyncio.gather(*tasks)
+    return dict(zip(names, results))
+
+
+def run(coro):
+    """ runs coro to completion on the event loop """
+    return asyncio.run(coro)
@@ -0,0 +1,177 @@
+"""LoRa time-on-air and EU868 duty-cycle aware transmission scheduling.
+
+time_on_air() follows the Semtech SX1272/76 datasheet formula. The scheduler
+keeps the airtime of past uplinks per ETSI sub-band over a sliding window
+and returns the earliest time at which a new uplink keeps the sub-band below
+its duty-cycle limit. The clock is injectable, so it can be driven by a fake
+clock on a PC.
+"""
+
+import math
+
+from compat import ticks_diff, ticks_ms
+
+# EU868 data rates: DR -> (spreading factor, bandwidth in Hz)
+EU868_DATA_RATES = {
+    0: (12, 125000),
+    1: (11, 125000),
+    2: (10, 125000),
+    3: (9, 125000),
+    4: (8, 125000),
+    5: (7, 125000),
+    6: (7, 250000),
+}
+
+# EU868 maximum application payload (bytes, no MAC commands in FOpts) per DR
+EU868_MAX_PAYLOAD = {0: 51, 1: 51, 2: 51, 3: 115, 4: 222, 5: 222, 6: 222}
+
+# EU868 sub-bands: (lowest frequency, highest frequency, duty cycle)
+EU868_SUBBANDS = (
+    (863000000, 865000000, 0.001),
+    (865000000, 868000000, 0.01),
+    (868000000, 868600000, 0.01),   # default channels 868.1, 868.3, 868.5 MHz
+    (868700000, 869200000, 0.001),
+    (869400000, 869650000, 0.1),
+    (869700000, 870000000, 0.01),
+)
+
+EU868_DEFAULT_FREQUENCY = 868100000
+
+# MHDR (1) + FHDR without options (7) + FPort (1) + MIC (4)
+LORAWAN_OVERHEAD = 13
+
+DUTY_CYCLE_WINDOW = 3600.0
+
+
+def time_on_air(payload_len, sf, bw=125000, cr=1, preamble=8, explicit_header=True, crc=True, low_dr_optimize=None):
+    """ time on air (s) of a LoRa frame with payload_len PHY payload bytes
+        cr is the coding rate index: 1 (4/5) ... 4 (4/8) """
+    t_sym = (1 << sf) / bw
+    if low_dr_optimize is None:
+        low_dr_optimize = t_sym > 0.016
+    de = 1 if low_dr_optimize else 0
+    ih = 0 if explicit_header else 1
+    num = 8 * payload_len - 4 * sf + 28 + (16 if crc else 0) - 20 * ih
+    n_payload = 8 + max(math.ceil(num / (4 * (sf - 2 * de))) * (cr + 4), 0)
+    return (preamble + 4.25) * t_sym + n_payload * t_sym
+
+
+def uplink_time_on_air(app_payload_len, dr=5, data_rates=EU868_DATA_RATES):
+    """ time on air (s) of a LoRaWAN uplink carrying app_payload_len bytes at data rate dr """
+    sf, bw = data_rates[dr]
+    return time_on_air(app_payload_len + LORAWAN_OVERHEAD, sf, bw)
+
+
+class _TicksClock:
+    """ seconds from ticks_ms, accumulated with ticks_diff so it survives the wrap """
+
+    def __init__(self):
+        self._last = ticks_ms()
+        self._elapsed_ms = 0
+
+    def __call__(self):
+        now = ticks_ms()
+        self._elapsed_ms += ticks_diff(now, self._last)
+        self._last = now
+        return self._elapsed_ms / 1000
+
+
+class DutyCycleScheduler:
+    """ tracks airtime per sub-band over a sliding window
+        clock: callable returning the current time in seconds (monotonic) """
+
+    def __init__(self, clock=None, window=DUTY_CYCLE_WINDOW, subbands=EU868_SUBBANDS):
+        self.clock = clock if clock is not None else _TicksClock()
+        self.window = window
+        self.subbands = subbands
+        # sub-band index -> list of [start time, airtime], oldest first
+        self._history = [[] for _ in subbands]
+
+    def subband(self, freq):
+        for i in range(len(self.subbands)):
+            lo, hi, _ = self.subbands[i]
+            if lo <= freq <= hi:
+                return i
+        raise ValueError("Frequency {} outside of the known sub-bands".format(freq))
+
+    def _prune(self, band, now):
+        history = self._history[band]
+        while history and history[0][0] <= now - self.window:
+            history.pop(0)
+        return history
+
+    def used(self, freq=EU868_DEFAULT_FREQUENCY, now=None):
+        """ airtime (s) used in the sub-band of freq within the current window """
+        if now is None:
+            now = self.clock()
+        band = self.subband(freq)
+        return sum([toa for _, toa in self._prune(band, now)])
+
+    def budget(self, freq=EU868_DEFAULT_FREQUENCY):
+        """ airtime (s) allowed per window in the sub-band of freq """
+        return self.subbands[self.subband(freq)][2] * self.window
+
+    def earliest(self, toa, freq=EU868_DEFAULT_FREQUENCY, not_before=None):
+        """ earliest time (clock units) at which an uplink of toa seconds is legal """
+        now = self.clock()
+        t = now if not_before is None or not_before < now else not_before
+        budget = self.budget(freq)
+        if toa > budget:
+            raise ValueError("Airtime {:.3f} s exceeds the sub-band budget of {:.3f} s".format(toa, budget))
+        band = self.subband(freq)
+        history = self._prune(band, now)
+        used = 0
+        for _, airtime in history:
+            used += airtime
+        i = 0
+        # bounded by the history: the float sum may not come back to 0 once it is all released
+        while i < len(history) and used + toa > budget:
+            start, airtime = history[i]
+            t = max(t, start + self.window)
+            used -= airtime
+            i += 1
+        return t
+
+    def delay(self, toa, freq=EU868_DEFAULT_FREQUENCY):
+        """ seconds to wait from now before an uplink of toa seconds is legal """
+        return self.earliest(toa, freq) - self.clock()
+
+    def record(self, toa, freq=EU868_DEFAULT_FREQUENCY, start=None):
+        """ accounts an uplink of toa seconds started at start (default now) """
+        if start is None:
+            start = self.clock()
+        self._history[self.subband(freq)].append([start, toa])
+
+    def checkpoint(self, slices=8):
+        """ the history in a fixed size, e.g. to keep it across a deep sleep (with a clock
+            that keeps counting across it): the airtime (s) used in slices of window / slices
+            seconds aligned on the clock (slice n starts at n * window / slices). Returns n
+            of the current slice and {sub-band index: [airtime of slice n, n - 1, ...]} for
+            the sub-bands with airtime in the window """
+        now = self.clock()
+        width = self.window / slices
+        current = int(now // width)
+        result = {}
+        for band in range(len(self.subbands)):
+            history = self._prune(band, now)
+            if not history:
+                continue
+            used = [0.0] * slices
+            for start, toa in history:
+                j = current - int(start // width)
+                used[min(j, slices - 1)] += toa
+            result[band] = used
+        return current, result
+
+    def restore(self, current, used):
+        """ inverse of checkpoint(): the airtime of a slice is accounted at the end of the
+            slice, so it is released at most window / slices seconds later than it would
+            have been, and a later checkpoint puts it back in the same slice """
+        for band in used:
+            slices = used[band]
+            width = self.window / len(slices)
+            entries = []
+            for j in range(len(slices) - 1, -1, -1):
+                if slices[j] > 0:
+                    entries.append([(current - j + 1) * width - 0.001, slices[j]])
+            self._history[band][:0] = entries
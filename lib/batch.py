@@ -0,0 +1,187 @@
+"""Aggregation of several sensor samples into one LoRaWAN uplink.
+
+A batch frame starts with the schema id with BATCH_FLAG set and the number
+of samples. The first sample follows with the fixed-point fields of
+lib/payload.py; every later sample is sent as the seconds elapsed since the
+previous sample (varint, one byte up to 127 s) followed by the difference of
+each raw field with respect to the previous sample, zigzag and varint
+encoded (one byte for differences within +/-63). Samples are quantized
+exactly as in a single message, so no data is lost. The times are rounded
+to the second from the first sample of the frame, so the rounding does not
+accumulate.
+
+    batch = Batcher(payload.SCHEMA_PYSENSE, max_samples=8, dr=5, clock=scheduler.clock)
+    frame = batch.add((lux, temperature, humidity, pressure))
+    if frame is not None:
+        s.send(frame)
+
+    schema_id, samples = decode(frame)   # host side, list of dicts, 't': s since the first
+"""
+
+import time
+
+import payload
+from airtime import EU868_MAX_PAYLOAD
+
+BATCH_FLAG = 0x80
+BATCH_HEADER_SIZE = 2
+MAX_BATCH_SAMPLES = 255
+
+
+def zigzag(value):
+    return value << 1 if value >= 0 else ((-value) << 1) - 1
+
+
+def unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def varint_size(value):
+    n = 1
+    while value > 0x7F:
+        value >>= 7
+        n += 1
+    return n
+
+
+def pack_varint(buf, value):
+    while value > 0x7F:
+        buf.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def unpack_varint(data, pos):
+    """ returns (value, next position) """
+    value = 0
+    shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        value |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return value, pos
+        shift += 7
+
+
+class Batcher:
+    """ collects samples until max_samples or the byte budget (max_bytes, or
+        the maximum payload of data rate dr) is reached
+        clock: callable returning seconds (time.time by default), the time of each sample """
+
+    def __init__(self, schema_id, max_samples=8, max_bytes=None, dr=5, clock=None):
+        self.schema_id = schema_id
+        self.fields = payload.SCHEMAS[schema_id]
+        self.max_samples = min(max_samples, MAX_BATCH_SAMPLES)
+        self.max_bytes = max_bytes if max_bytes is not None else EU868_MAX_PAYLOAD[dr]
+        self._first_size = payload.size(schema_id) - payload.HEADER_SIZE
+        self.clock = clock if clock is not None else time.time
+        # every delta takes at least one byte per field and one for the time
+        self._min_delta_size = len(self.fields) + 1
+        if BATCH_HEADER_SIZE + self._first_size > self.max_bytes:
+            raise payload.PayloadError("A single sample does not fit in {} bytes".format(self.max_bytes))
+        self._samples = []
+        # seconds since the first sample, one per sample
+        self._times = []
+        self._start = 0
+        self._size = BATCH_HEADER_SIZE
+
+    def __len__(self):
+        return len(self._samples)
+
+    def size(self):
+        """ size in bytes of the frame with the samples collected so far """
+        return self._size
+
+    def add(self, values):
+        """ quantizes and queues one sample (a sequence in schema order)
+            returns a frame ready to be sent when the batch is complete, None otherwise
+            (a sample that does not fit flushes the batch and starts the next one) """
+        raw = [payload.quantize(values[i], self.fields[i][1], self.fields[i][2]) for i in range(len(self.fields))]
+        now = self.clock()
+        frame = None
+        if self._samples:
+            prev = self._samples[-1]
+            # a clock that went back counts as no time elapsed
+            t = max(int(now - self._start + 0.5), self._times[-1])
+            n = varint_size(t - self._times[-1])
+            for i in range(len(raw)):
+                n += varint_size(zigzag(raw[i] - prev[i]))
+            if self._size + n > self.max_bytes:
+                frame = self.flush()
+        if not self._samples:
+            self._start = now
+            t = 0
+            n = self._first_size
+        self._size += n
+        self._samples.append(raw)
+        self._times.append(t)
+        if frame is None and self.full():
+            frame = self.flush()
+        return frame
+
+    def full(self):
+        """ True when no other sample can fit """
+        return len(self._samples) >= self.max_samples or self._size + self._min_delta_size > self.max_bytes
+
+    def flush(self):
+        """ returns the frame with the collected samples (None if empty) and starts a new batch """
+        if not self._samples:
+            return None
+        buf = bytearray(BATCH_HEADER_SIZE + self._first_size)
+        buf[0] = self.schema_id | BATCH_FLAG
+        buf[1] = len(self._samples)
+        pos = BATCH_HEADER_SIZE
+        first = self._samples[0]
+        for i in range(len(self.fields)):
+            pos = payload.pack_raw(buf, pos, self.fields[i][1], first[i])
+        prev = first
+        for k in range(1, len(self._samples)):
+            raw = self._samples[k]
+            pack_varint(buf, self._times[k] - self._times[k - 1])
+            for i in range(len(raw)):
+                pack_varint(buf, zigzag(raw[i] - prev[i]))
+            prev = raw
+        self._samples = []
+        self._times = []
+        self._size = BATCH_HEADER_SIZE
+        return bytes(buf)
+
+
+def decode(data):
+    """ host-side unpacker for batch frames and single messages,
+        returns (schema_id, list of {field name: value, 't': seconds since the first sample}) """
+    if not data:
+        raise payload.PayloadError("Empty payload")
+    if not data[0] & BATCH_FLAG:
+        schema_id, values = payload.decode(data)
+        values['t'] = 0
+        return schema_id, [values]
+    schema_id = data[0] & ~BATCH_FLAG
+    fields = payload.schema(schema_id)
+    count = data[1]
+    pos = BATCH_HEADER_SIZE
+    raw = []
+    for _, ftype, _ in fields:
+        value, pos = payload.unpack_raw(data, pos, ftype)
+        raw.append(value)
+    samples = [raw]
+    times = [0]
+    for _ in range(count - 1):
+        prev = raw
+        delta, pos = unpack_varint(data, pos)
+        times.append(times[-1] + delta)
+        raw = []
+        for i in range(len(fields)):
+            delta, pos = unpack_varint(data, pos)
+            raw.append(prev[i] + unzigzag(delta))
+        samples.append(raw)
+    if pos != len(data):
+        raise payload.PayloadError("Batch frame has {} trailing bytes".format(len(data) - pos))
+    result = []
+    for k in range(count):
+        values = dict([(fields[i][0], payload.dequantize(samples[k][i], fields[i][1], fields[i][2]))
+                       for i in range(len(fields))])
+        values['t'] = times[k]
+        result.append(values)
+    return schema_id, result
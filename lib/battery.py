@@ -0,0 +1,73 @@
+"""Battery voltage of an expansion board with a PIC, averaged and read rarely.
+
+A single conversion of the PIC ADC is noisy and costs three PIC commands
+(see Pycoproc.read_battery_adc). update() takes the mean of `samples`
+conversions and folds it into an exponentially weighted estimate, but
+reads the ADC at most once every interval_s seconds of clock; in between
+it returns the estimate. With load()/save() the estimate and the time of
+the last reading are kept in the NVS across deep sleeps.
+
+    monitor = battery.BatteryMonitor(pyexp, clock=scheduler.clock)
+    monitor.update()       # every cycle
+    volts = monitor.volts
+"""
+
+import time
+
+import pycom
+
+import nvs
+
+# NVS keys: estimate (mV), time of the last reading (s of clock)
+_VOLTS = 'bat_mv'
+_TIME = 'bat_time'
+
+
+class BatteryMonitor:
+
+    def __init__(self, pycoproc, samples=8, alpha=0.25, interval_s=3600, clock=None):
+        """ alpha: weight of a new reading in the estimate
+            clock: callable returning seconds (time.time by default) """
+        self.pycoproc = pycoproc
+        self.samples = samples
+        self.alpha = alpha
+        self.interval_s = interval_s
+        self.clock = clock if clock is not None else time.time
+        # estimate (V), None before the first reading
+        self.volts = None
+        # ADC conversions so far
+        self.conversions = 0
+        self._last = None
+
+    def due(self):
+        """ True if update() reads the ADC """
+        return nvs.expired(self.clock, self._last, self.interval_s)
+
+    def update(self, force=False):
+        """ reads the ADC when due() (or force), returns the estimate (V) """
+        if not force and not self.due():
+            return self.volts
+        total = 0
+        for _ in range(self.samples):
+            total += self.pycoproc.read_battery_adc()
+        self.conversions += self.samples
+        volts = self.pycoproc.battery_voltage(total / self.samples)
+        if self.volts is None:
+            self.volts = volts
+        else:
+            self.volts += self.alpha * (volts - self.volts)
+        self._last = self.clock()
+        return self.volts
+
+    def load(self):
+        """ estimate saved before a deep sleep (the clock must keep counting across it) """
+        mv = nvs.get(_VOLTS)
+        last = nvs.get(_TIME)
+        if mv is not None and last is not None:
+            self.volts = mv / 1000
+            self._last = last
+
+    def save(self):
+        if self.volts is not None:
+            pycom.nvs_set(_TIME, int(self._last))
+            pycom.nvs_set(_VOLTS, int(self.volts * 1000 + 0.5))
@@ -0,0 +1,61 @@
+"""What the node found out at its first boot, kept in the NVS for the next ones.
+
+A cold boot detects the expansion board (the Pycoproc checks its firmware
+twice, then the product id, hardware and firmware versions are read) and
+looks the DevEUI up in the list of devices. None of that changes from one
+deep sleep to the next, so it is saved here once and a warm boot only
+checks it cheaply: the cache belongs to the DevEUI it was written for, and
+main.py asks the PIC for its product id (one command) before trusting it.
+
+    cached = bootcache.load(dev_eui)   # None: cold boot
+    ...
+    bootcache.save(dev_eui, board=..., hw=..., fw=..., pid=..., index=...)
+
+Values are integers (the NVS of older firmware only holds integers).
+"""
+
+import pycom
+
+import nvs
+
+# cached values, NVS key 'bc_' + name (15 characters at most)
+KEYS = ('board', 'hw', 'fw', 'pid', 'index')
+# the last 8 hexadecimal digits of the DevEUI the cache was written for
+_OWNER = 'bc_owner'
+
+
+def _owner(dev_eui):
+    return int(dev_eui[-8:], 16)
+
+
+def load(dev_eui):
+    """ {name: value} saved for dev_eui (hexadecimal string), None if there is no cache
+        or it was written for another device """
+    if nvs.get(_OWNER) != _owner(dev_eui):
+        return None
+    values = {}
+    for name in KEYS:
+        value = nvs.get('bc_' + name)
+        if value is None:
+            return None
+        values[name] = value
+    return values
+
+
+def save(dev_eui, **values):
+    """ values: one integer for each name in KEYS. Only the values that differ from the
+        NVS are written (flash wear), the owner is erased first and written last so a
+        cache written in part is never loaded """
+    owner = _owner(dev_eui)
+    changed = [name for name in KEYS if nvs.get('bc_' + name) != values[name]]
+    if not changed and nvs.get(_OWNER) == owner:
+        return
+    invalidate()
+    for name in changed:
+        pycom.nvs_set('bc_' + name, values[name])
+    pycom.nvs_set(_OWNER, owner)
+
+
+def invalidate():
+    """ the next boot is a cold one """
+    nvs.erase(_OWNER)
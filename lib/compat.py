@@ -0,0 +1,44 @@
+"""MicroPython time and asyncio functions, with their CPython equivalents on the host.
+
+ticks_ms/ticks_us/ticks_add/ticks_diff are those of the time module when it
+has them (the device, the simulation). Otherwise they are computed from
+time.perf_counter_ns with the same wrap as on the device, so ticks_diff
+works the same. asyncio is uasyncio on the device.
+
+    start = compat.ticks_us()
+    await compat.sleep_ms(10)
+    elapsed_us = compat.ticks_diff(compat.ticks_us(), start)
+"""
+
+import time
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+if hasattr(time, 'ticks_ms'):
+    ticks_ms = time.ticks_ms
+    ticks_us = time.ticks_us
+    ticks_add = time.ticks_add
+    ticks_diff = time.ticks_diff
+else:
+    _TICKS_PERIOD = 1 << 30
+    _TICKS_MAX = _TICKS_PERIOD - 1
+    _TICKS_HALFPERIOD = _TICKS_PERIOD // 2
+
+    def ticks_ms():
+        return (time.perf_counter_ns() // 1000000) & _TICKS_MAX
+
+    def ticks_us():
+        return (time.perf_counter_ns() // 1000) & _TICKS_MAX
+
+    def ticks_add(ticks, delta):
+        return (ticks + delta) & _TICKS_MAX
+
+    def ticks_diff(end, start):
+        return ((end - start + _TICKS_HALFPERIOD) & _TICKS_MAX) - _TICKS_HALFPERIOD
+
+
+async def sleep_ms(ms):
+    await asyncio.sleep(ms / 1000)
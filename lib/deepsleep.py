@@ -0,0 +1,187 @@
+"""Deep-sleep duty cycling: one measurement and one uplink per boot.
+
+Between uplinks the node is powered down, by the PIC of the expansion board
+(Pycoproc.setup_sleep/go_to_sleep cut the power of the module) or by the
+deep sleep of the ESP32 (machine.deepsleep) on the universal board. Both
+wake up with a reset, so what the node has to remember is kept in the NVS
+(pycom.nvs_*) by a Checkpoint:
+
+* the message counter and the number of uplinks sent
+* the node time: ms since the first boot, including the time slept, so the
+  measurement deadlines and the duty-cycle history stay valid across sleeps
+* the next measurement deadline
+* the airtime used per sub-band within the duty-cycle window, in slices of
+  fixed size (see airtime.DutyCycleScheduler.checkpoint)
+
+The LoRaWAN session (DevAddr, keys, frame counters) is kept by the LoRa
+stack itself with lora.nvram_save()/nvram_restore(), so the node joins
+only once.
+
+    checkpoint = deepsleep.Checkpoint()
+    checkpoint.load(deepsleep.slept_ms(pyexp))
+    scheduler = airtime.DutyCycleScheduler(clock=checkpoint.clock)
+    checkpoint.restore(scheduler)
+    ...
+    checkpoint.save(counter, periodic, scheduler, sent)
+    lora.nvram_save()
+    checkpoint.sleep(ms, pyexp)
+"""
+
+import math
+import time
+
+import machine
+import pycom
+
+import nvs
+
+# duty-cycle history kept across the sleep, in slices of window / SLICES
+SLICES = 8
+# the node stays awake this long after an uplink (class A receive windows:
+# RX1 opens 1 s and RX2 2 s after the end of the uplink)
+RX_WINDOWS_MS = 3000
+
+# NVS keys (15 characters at most)
+_COUNTER = 'ds_counter'
+_SENT = 'ds_sent'
+_TIME_S = 'ds_time_s'
+_TIME_MS = 'ds_time_ms'
+_DEADLINE = 'ds_deadline'
+_AFTER = 'ds_after'
+_SLEEP = 'ds_sleep'
+_SLICE = 'ds_slice'
+_BANDS = 'ds_bands'
+_AIRTIME = 'ds_air'
+
+
+def slept_ms(pyexp=None):
+    """ ms slept before this boot, None when the node did not wake up from a
+        sleep() of this module (power on, reset) """
+    planned = nvs.get(_SLEEP)
+    if planned is None:
+        return None
+    if pyexp is not None:
+        if not pyexp.get_wake_reason():
+            return None
+        # the button or the accelerometer may have ended the sleep early
+        return max(0, planned - pyexp.get_sleep_remaining() * 1000)
+    if machine.reset_cause() != machine.DEEPSLEEP_RESET:
+        return None
+    return planned
+
+
+def sleep(ms, pyexp=None, before=None):
+    """ powers the node down for ms (whole seconds with the PIC), does not return
+        before: called right before, once the sleep is programmed """
+    if pyexp is not None:
+        ms = max(1, (ms + 500) // 1000) * 1000
+    pycom.nvs_set(_SLEEP, ms)
+    if pyexp is not None:
+        pyexp.setup_sleep(ms // 1000)
+        if before is not None:
+            before()
+        pyexp.go_to_sleep()
+    else:
+        if before is not None:
+            before()
+        machine.deepsleep(ms)
+
+
+class Checkpoint:
+
+    def __init__(self):
+        self.counter = 0
+        # uplinks sent before this boot
+        self.sent = 0
+        self.restored = False
+        # node time (ms) at _base_ticks (ticks_ms)
+        self._base_ms = 0
+        self._base_ticks = time.ticks_ms()
+        self._deadline_ms = None
+        self._slice = None
+        self._airtime = {}
+        self._saved_ticks = None
+        # ms from the boot to load()
+        self.boot_ms = 0
+
+    def now_ms(self):
+        """ node time: ms since the first boot, counting the time slept """
+        return self._base_ms + time.ticks_diff(time.ticks_ms(), self._base_ticks)
+
+    def clock(self):
+        """ node time in seconds, the clock of the duty-cycle scheduler """
+        return self.now_ms() / 1000
+
+    def load(self, slept_ms):
+        """ reads the checkpoint saved before the sleep (slept_ms from slept_ms()), returns
+            False when there is none to restore (or a key of it is missing) """
+        counter = nvs.get(_COUNTER)
+        if slept_ms is None or counter is None:
+            return False
+        time_s = nvs.get(_TIME_S)
+        time_ms = nvs.get(_TIME_MS)
+        deadline = nvs.get(_DEADLINE)
+        current = nvs.get(_SLICE)
+        bands = nvs.get(_BANDS)
+        if time_s is None or time_ms is None or deadline is None or current is None or bands is None:
+            return False
+        airtime = {}
+        for band in range(32):
+            if bands & (1 << band):
+                used = [nvs.get(_AIRTIME + str(band) + str(j)) for j in range(SLICES)]
+                if None in used:
+                    return False
+                airtime[band] = [ms / 1000 for ms in used]
+        saved_ms = time_s * 1000 + time_ms
+        # ticks_ms counts from the boot
+        self._base_ticks = self.boot_ms = time.ticks_ms()
+        self._base_ms = saved_ms + (nvs.get(_AFTER) or 0) + slept_ms + self._base_ticks
+        self._deadline_ms = saved_ms + deadline
+        self._slice = current
+        self._airtime = airtime
+        self.counter = counter
+        self.sent = nvs.get(_SENT) or 0
+        self.restored = True
+        return True
+
+    def deadline(self):
+        """ ticks_ms of the next measurement (now without a checkpoint) """
+        now = time.ticks_ms()
+        if self._deadline_ms is None:
+            return now
+        return time.ticks_add(now, self._deadline_ms - self.now_ms())
+
+    def restore(self, scheduler):
+        """ airtime used before the sleep, in scheduler (whose clock must be clock()) """
+        if self._airtime:
+            scheduler.restore(self._slice, self._airtime)
+
+    def save(self, counter, periodic, scheduler, sent=0):
+        """ periodic: schedule.Periodic of the measurements, scheduler: the duty-cycle
+            scheduler (on clock()), sent: uplinks sent so far. The counter is erased first and written last, so a
+            checkpoint written in part is never loaded """
+        now = self.now_ms()
+        nvs.erase(_COUNTER)
+        pycom.nvs_set(_SENT, sent)
+        pycom.nvs_set(_TIME_S, now // 1000)
+        pycom.nvs_set(_TIME_MS, now % 1000)
+        pycom.nvs_set(_DEADLINE, max(0, periodic.remaining_ms()))
+        current, used = scheduler.checkpoint(SLICES)
+        pycom.nvs_set(_SLICE, current)
+        bands = 0
+        for band in used:
+            bands |= 1 << band
+            for j in range(SLICES):
+                # rounded up, never less airtime than used
+                pycom.nvs_set(_AIRTIME + str(band) + str(j), math.ceil(used[band][j] * 1000))
+        pycom.nvs_set(_BANDS, bands)
+        pycom.nvs_set(_COUNTER, counter)
+        self._saved_ticks = time.ticks_ms()
+
+    def sleep(self, ms, pyexp=None):
+        """ sleep() after save() until the deadline in ms: the node wakes up earlier by the
+            time this boot took to get to load(), and the time between save() and the sleep
+            counts in the node time """
+        def before():
+            pycom.nvs_set(_AFTER, time.ticks_diff(time.ticks_ms(), self._saved_ticks))
+        sleep(max(0, ms - self.boot_ms), pyexp, before)
@@ -0,0 +1,179 @@
+"""Shared I2C bus of the expansion board (the PIC and the sensors): machine.I2C with a
+re-entrant lock, deinit()/init(), retries of NACKs and accounting per device address."""
+
+import time
+
+from machine import I2C
+
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
+from compat import ticks_diff, ticks_us
+
+RETRIES = 1
+RETRY_DELAY_US = 200
+
+_buses = {}
+
+
+class Stats:
+
+    def __init__(self):
+        self.transactions = 0
+        self.bytes = 0
+        self.time_us = 0
+        self.nacks = 0
+        self.retries = 0
+
+    def as_dict(self):
+        return {'transactions': self.transactions, 'bytes': self.bytes, 'time_us': self.time_us,
+                'nacks': self.nacks, 'retries': self.retries}
+
+
+class I2CBus:
+
+    def __init__(self, bus_id=0, sda='P22', scl='P21', baudrate=100000, i2c=None,
+                 retries=RETRIES, retry_delay_us=RETRY_DELAY_US):
+        """ i2c: machine.I2C object already initialized (one is created otherwise) """
+        self.bus_id = bus_id
+        self.sda = sda
+        self.scl = scl
+        self.baudrate = baudrate
+        self.retries = retries
+        self.retry_delay_us = retry_delay_us
+        # device address -> Stats
+        self.stats = {}
+        if i2c is None:
+            i2c = I2C(bus_id, mode=I2C.MASTER, pins=(sda, scl), baudrate=baudrate)
+        self.i2c = i2c
+        self.enabled = True
+        # held by every transaction and by `with bus:`; the coroutines of an event loop share
+        # its owner, so a `with bus:` section must not await
+        self._lock = _thread.allocate_lock() if _thread is not None else None
+        self._owner = None
+        self._depth = 0
+
+    def _ident(self):
+        return _thread.get_ident() if _thread is not None else 0
+
+    def acquire(self):
+        me = self._ident()
+        if self._depth > 0 and self._owner == me:
+            self._depth += 1
+            return
+        if self._lock is not None:
+            self._lock.acquire()
+        self._owner = me
+        self._depth = 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            self._owner = None
+            if self._lock is not None:
+                self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def deinit(self):
+        """ releases the pins; holds the bus until init() (nothing if already done) """
+        if self.enabled:
+            self.acquire()
+            self.i2c.deinit()
+            self.enabled = False
+
+    def init(self):
+        """ reinitializes the bus after deinit() with its pins and baudrate """
+        if not self.enabled:
+            self.i2c.init(mode=I2C.MASTER, pins=(self.sda, self.scl), baudrate=self.baudrate)
+            self.enabled = True
+            self.release()
+
+    def reset_stats(self):
+        self.stats = {}
+
+    def totals(self):
+        total = Stats()
+        for s in self.stats.values():
+            total.transactions += s.transactions
+            total.bytes += s.bytes
+            total.time_us += s.time_us
+            total.nacks += s.nacks
+            total.retries += s.retries
+        return total
+
+    def _transaction(self, addr, nbytes, retries, call, *args):
+        if retries is None:
+            retries = self.retries
+        self.acquire()
+        try:
+            if not self.enabled:
+                raise OSError("I2C bus deinitialized")
+            s = self.stats.get(addr)
+            if s is None:
+                s = self.stats[addr] = Stats()
+            attempt = 0
+            while True:
+                start = ticks_us()
+                try:
+                    result = call(*args)
+                except OSError:
+                    s.transactions += 1
+                    s.bytes += 1
+                    s.time_us += ticks_diff(ticks_us(), start)
+                    s.nacks += 1
+                    if attempt >= retries:
+                        raise
+                    attempt += 1
+                    s.retries += 1
+                    time.sleep_us(self.retry_delay_us)
+                    continue
+                s.transactions += 1
+                s.bytes += nbytes
+                s.time_us += ticks_diff(ticks_us(), start)
+                return result
+        finally:
+            self.release()
+
+    def scan(self):
+        with self:
+            return self.i2c.scan()
+
+    def writeto(self, addr, buf, retries=None):
+        return self._transaction(addr, 1 + len(buf), retries, self.i2c.writeto, addr, buf)
+
+    def readfrom(self, addr, nbytes, retries=None):
+        return self._transaction(addr, 1 + nbytes, retries, self.i2c.readfrom, addr, nbytes)
+
+    def readfrom_into(self, addr, buf, retries=None):
+        return self._transaction(addr, 1 + len(buf), retries, self.i2c.readfrom_into, addr, buf)
+
+    def writeto_mem(self, addr, memaddr, buf, retries=None):
+        return self._transaction(addr, 2 + len(buf), retries, self.i2c.writeto_mem, addr, memaddr, buf)
+
+    def readfrom_mem(self, addr, memaddr, nbytes, retries=None):
+        return self._transaction(addr, 3 + nbytes, retries, self.i2c.readfrom_mem, addr, memaddr, nbytes)
+
+    def readfrom_mem_into(self, addr, memaddr, buf, retries=None):
+        return self._transaction(addr, 3 + len(buf), retries, self.i2c.readfrom_mem_into, addr, memaddr, buf)
+
+
+def shared(bus_id=0, sda='P22', scl='P21', baudrate=100000, i2c=None):
+    """ the I2CBus of the peripheral bus_id, created on the first call (with i2c if given,
+        an I2CBus is returned as is). ValueError if i2c is not the machine.I2C object the
+        bus already wraps """
+    if isinstance(i2c, I2CBus):
+        return i2c
+    bus = _buses.get(bus_id)
+    if bus is None:
+        bus = _buses[bus_id] = I2CBus(bus_id, sda, scl, baudrate, i2c)
+    elif i2c is not None and i2c is not bus.i2c:
+        raise ValueError("I2C bus {} already wraps another I2C object".format(bus_id))
+    return bus
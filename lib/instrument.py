@@ -0,0 +1,190 @@
+"""Timers, counters and histograms for the hot paths of the node.
+
+Disabled by default: start() returns None and stop()/count() return at the
+first test, so instrumented code costs one function call per probe. Once
+enabled, every timer keeps its count, total, minimum, maximum and a
+histogram with power-of-two microsecond buckets, all of fixed size.
+
+    t = instrument.start()
+    ...
+    instrument.stop('sensor', t)
+    instrument.count('busy')
+
+Times come from compat.ticks_us (time.ticks_us on the device). The
+statistics can be printed with dump() or sent as a compact uplink with
+encode(); decode() unpacks it on the host.
+"""
+
+import payload
+from compat import ticks_diff, ticks_us
+
+# First byte of a statistics uplink, next to the payload schema ids and batch frames
+STATS_SCHEMA = 0x7F
+# Names with an identifier in the statistics uplink (others are only dumped)
+TIMERS = ('sensor', 'encode', 'wait', 'send', 'join', 'late', 'boot')
+COUNTERS = ('uplinks', 'busy', 'dropped', 'downlinks', 'i2c_errors', 'throttled')
+# bucket i: durations below 2**i us (the last bucket takes the rest, from 2**24 us = 16.8 s)
+HIST_BUCKETS = 26
+
+enabled = False
+timers = {}
+counters = {}
+
+
+class Timer:
+
+    def __init__(self):
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = 0
+        self.hist = [0] * HIST_BUCKETS
+
+    def add(self, us):
+        self.count += 1
+        self.total_us += us
+        if self.min_us is None or us < self.min_us:
+            self.min_us = us
+        if us > self.max_us:
+            self.max_us = us
+        b = 0
+        while us and b < HIST_BUCKETS - 1:
+            us >>= 1
+            b += 1
+        self.hist[b] += 1
+
+    def mean_us(self):
+        return self.total_us // self.count if self.count else 0
+
+    def percentile_us(self, p):
+        """ upper bound of the histogram bucket holding the p-th percentile """
+        if not self.count:
+            return 0
+        rank = self.count * p / 100
+        seen = 0
+        for b in range(HIST_BUCKETS):
+            seen += self.hist[b]
+            if seen >= rank:
+                return 1 << b
+        return 1 << (HIST_BUCKETS - 1)
+
+
+def enable(flag=True):
+    global enabled
+    enabled = flag
+
+
+def reset():
+    timers.clear()
+    counters.clear()
+
+
+def start():
+    """ start time to pass to stop(), None while disabled """
+    if not enabled:
+        return None
+    return ticks_us()
+
+
+def stop(name, started):
+    """ records the time since started (from start()) in timer name, returns it (us) """
+    if started is None:
+        return None
+    us = ticks_diff(ticks_us(), started)
+    timer = timers.get(name)
+    if timer is None:
+        timer = timers[name] = Timer()
+    timer.add(us)
+    return us
+
+
+def record(name, us):
+    """ records a duration measured elsewhere (e.g. a wait computed by a scheduler) """
+    if not enabled:
+        return
+    timer = timers.get(name)
+    if timer is None:
+        timer = timers[name] = Timer()
+    timer.add(int(us))
+
+
+def count(name, n=1):
+    if not enabled:
+        return
+    counters[name] = counters.get(name, 0) + n
+
+
+def dump(out=print):
+    for name in sorted(timers):
+        t = timers[name]
+        out("[STATS] {:<10s} n={:d} mean={:d}us min={:d}us max={:d}us p50<{:d}us p95<{:d}us".format(
+            name, t.count, t.mean_us(), t.min_us, t.max_us, t.percentile_us(50), t.percentile_us(95)))
+    for name in sorted(counters):
+        out("[STATS] {:<10s} {:d}".format(name, counters[name]))
+
+
+# Statistics uplink: STATS_SCHEMA, number of timers, number of counters, then per
+# timer: id (u8), count (u16), mean (u24, us), p95 bucket (u8), max (u24, us)
+# and per counter: id (u8), value (u16); counts and times saturate
+_TIMER_FIELDS = (('count', 'u16'), ('mean_us', 'u24'), ('p95', 'u8'), ('max_us', 'u24'))
+TIMER_SIZE = 1 + 2 + 3 + 1 + 3
+COUNTER_SIZE = 1 + 2
+
+
+def _p95_bucket(t):
+    us = t.percentile_us(95)
+    b = 0
+    while us > 1:
+        us >>= 1
+        b += 1
+    return b
+
+
+def encode(max_bytes=None):
+    """ statistics uplink with the timers of TIMERS and the counters of COUNTERS
+        (the ones that do not fit in max_bytes are left out) """
+    items_t = [(i, timers[n]) for i, n in enumerate(TIMERS) if n in timers]
+    items_c = [(i, counters[n]) for i, n in enumerate(COUNTERS) if n in counters]
+    if max_bytes is not None:
+        room = max_bytes - 3
+        items_t = items_t[:max(0, room // TIMER_SIZE)]
+        room -= len(items_t) * TIMER_SIZE
+        items_c = items_c[:max(0, room // COUNTER_SIZE)]
+    buf = bytearray(3 + len(items_t) * TIMER_SIZE + len(items_c) * COUNTER_SIZE)
+    buf[0] = STATS_SCHEMA
+    buf[1] = len(items_t)
+    buf[2] = len(items_c)
+    pos = 3
+    for i, t in items_t:
+        buf[pos] = i
+        pos += 1
+        values = (t.count, t.mean_us(), _p95_bucket(t), t.max_us)
+        for (_, ftype), value in zip(_TIMER_FIELDS, values):
+            pos = payload.pack_raw(buf, pos, ftype, payload.quantize(value, ftype, 1))
+    for i, value in items_c:
+        buf[pos] = i
+        pos = payload.pack_raw(buf, pos + 1, 'u16', payload.quantize(value, 'u16', 1))
+    return bytes(buf)
+
+
+def decode(data):
+    """ inverse of encode(): {'timers': {name: {...}}, 'counters': {name: value}} """
+    if len(data) < 3 or data[0] != STATS_SCHEMA:
+        raise payload.PayloadError("Not a statistics uplink")
+    n_timers, n_counters = data[1], data[2]
+    if len(data) != 3 + n_timers * TIMER_SIZE + n_counters * COUNTER_SIZE:
+        raise payload.PayloadError("Statistics uplink of {} bytes".format(len(data)))
+    result = {'timers': {}, 'counters': {}}
+    pos = 3
+    for _ in range(n_timers):
+        name = TIMERS[data[pos]]
+        pos += 1
+        t = {}
+        for field, ftype in _TIMER_FIELDS:
+            t[field], pos = payload.unpack_raw(data, pos, ftype)
+        t['p95_us'] = 1 << t.pop('p95')
+        result['timers'][name] = t
+    for _ in range(n_counters):
+        name = COUNTERS[data[pos]]
+        result['counters'][name], pos = payload.unpack_raw(data, pos + 1, 'u16')
+    return result
@@ -0,0 +1,164 @@
+"""Level-filtered logger with a preallocated ring buffer.
+
+A call below the active level returns after one comparison, without
+formatting anything:
+
+    log.info("MPL3115A2 pressure: {:.2f} Pa", pressure)
+    log.debug("Batch payload: {:d} bytes", len(message))
+
+Records are kept unformatted (level, format string, arguments) in a ring
+buffer of fixed size and formatted only when the buffer is flushed, in one
+write per batch, to the UART (stdout) or to a file. The first two
+arguments are stored in slots of their own, so a call with up to two
+arguments allocates nothing. When the buffer overflows, the oldest records
+are dropped (and counted) without ever being formatted. ERROR records
+flush the buffer at once.
+"""
+
+import sys
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+NONE = 100
+
+NAMES = {DEBUG: 'DEBUG', INFO: 'INFO', WARNING: 'WARNING', ERROR: 'ERROR'}
+_PREFIXES = {DEBUG: '[DEBUG] ', INFO: '[INFO] ', WARNING: '[WARNING] ', ERROR: '[ERROR] '}
+
+# active level, checked first by every call
+level = INFO
+
+_size = 0
+_levels = None
+_fmts = None
+_arg0 = None
+_arg1 = None
+_more = None
+_start = 0
+_count = 0
+_flush_at = 0
+_sink = None
+dropped = 0
+
+
+def stdout_sink(text):
+    sys.stdout.write(text)
+
+
+def file_sink(path):
+    """ sink appending every batch to the file path """
+    def write(text):
+        with open(path, 'a') as f:
+            f.write(text)
+    return write
+
+
+def configure(level=INFO, size=64, flush_at=None, sink=None):
+    """ size: records kept before the oldest is dropped
+        flush_at: pending records that trigger a flush (3/4 of size by default)
+        sink: callable receiving each formatted batch (stdout by default) """
+    global _size, _levels, _fmts, _arg0, _arg1, _more, _start, _count, _flush_at, _sink, dropped
+    set_level(level)
+    _size = size
+    _levels = bytearray(size)
+    _fmts = [None] * size
+    _arg0 = [None] * size
+    _arg1 = [None] * size
+    _more = [None] * size
+    _start = 0
+    _count = 0
+    _flush_at = flush_at if flush_at is not None else size * 3 // 4
+    _sink = sink if sink is not None else stdout_sink
+    dropped = 0
+
+
+def set_level(new_level):
+    global level
+    level = new_level
+
+
+def pending():
+    return _count
+
+
+# argument not given (None is a valid argument)
+_NO_ARG = object()
+
+
+def _put(lvl, fmt, a, b, more):
+    global _start, _count, dropped
+    if _count == _size:
+        # full: the oldest record is overwritten
+        _start = (_start + 1) % _size
+        _count -= 1
+        dropped += 1
+    i = (_start + _count) % _size
+    _levels[i] = lvl
+    _fmts[i] = fmt
+    _arg0[i] = a
+    _arg1[i] = b
+    _more[i] = more
+    _count += 1
+    if _count >= _flush_at or lvl >= ERROR:
+        flush()
+
+
+def debug(fmt, a=_NO_ARG, b=_NO_ARG, *more):
+    if level > DEBUG:
+        return
+    _put(DEBUG, fmt, a, b, more)
+
+
+def info(fmt, a=_NO_ARG, b=_NO_ARG, *more):
+    if level > INFO:
+        return
+    _put(INFO, fmt, a, b, more)
+
+
+def warning(fmt, a=_NO_ARG, b=_NO_ARG, *more):
+    if level > WARNING:
+        return
+    _put(WARNING, fmt, a, b, more)
+
+
+def error(fmt, a=_NO_ARG, b=_NO_ARG, *more):
+    if level > ERROR:
+        return
+    _put(ERROR, fmt, a, b, more)
+
+
+def _format(fmt, a, b, more):
+    if a is _NO_ARG:
+        return fmt
+    if b is _NO_ARG:
+        return fmt.format(a)
+    if not more:
+        return fmt.format(a, b)
+    return fmt.format(a, b, *more)
+
+
+def flush():
+    """ formats the pending records and writes them to the sink in one call """
+    global _start, _count, dropped
+    if not _count:
+        return
+    lines = []
+    if dropped:
+        lines.append("[WARNING] {:d} log records dropped\n".format(dropped))
+        dropped = 0
+    for k in range(_count):
+        i = (_start + k) % _size
+        lines.append(_PREFIXES[_levels[i]])
+        lines.append(_format(_fmts[i], _arg0[i], _arg1[i], _more[i]))
+        lines.append("\n")
+        _fmts[i] = None
+        _arg0[i] = None
+        _arg1[i] = None
+        _more[i] = None
+    _start = 0
+    _count = 0
+    _sink("".join(lines))
+
+
+configure()
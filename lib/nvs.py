@@ -0,0 +1,36 @@
+"""Reads and erasures of the NVS of the Pycom firmware (pycom.nvs_*) for the
+modules that keep state across deep sleeps (deepsleep, bootcache, battery
+and the RTC calibration of the Pycoproc). A key that is not there is not
+an error:
+
+    counter = nvs.get('ds_counter')   # None if not there
+    nvs.erase('bc_owner')
+    old = nvs.expired(clock, nvs.get('bat_time'), 3600)   # a time saved on clock
+"""
+
+import pycom
+
+
+def get(key):
+    try:
+        return pycom.nvs_get(key)
+    except ValueError:
+        # no such key (older firmware returns None)
+        return None
+
+
+def erase(key):
+    try:
+        pycom.nvs_erase(key)
+    except Exception:
+        # not there
+        pass
+
+
+def expired(clock, saved_s, max_age_s):
+    """ True if the time saved_s (s of clock) is None, max_age_s old or in the future """
+    if saved_s is None:
+        return True
+    age = clock() - saved_s
+    # a negative age: the clock restarted (power on), saved_s is from another run
+    return age < 0 or age >= max_age_s
@@ -0,0 +1,164 @@
+"""Compact binary encoding of sensor readings for LoRaWAN uplinks.
+
+Every field of a schema is sent as a big-endian fixed-point integer
+(value * scale, rounded and saturated to the range of the field type). The
+first byte of a message is the schema identifier, so the decoder (which also
+runs unmodified on the host under CPython) knows how to unpack the rest.
+A missing reading (None, e.g. a sensor that failed) is sent as the maximum
+raw value of its field type, which readings saturate below, and decoded as
+None.
+
+Example (PySense, 11 bytes instead of the 27 bytes of "123.45 21.30 45.67 94210.25"):
+
+    data = encode(SCHEMA_PYSENSE, (lux, temperature, humidity, pressure))
+    schema_id, values = decode(data)   # values['temperature'] -> 21.3
+"""
+
+import struct
+
+# Field types: name -> (struct format, size in bytes, minimum, maximum).
+# 'u24' has no struct format and is packed by hand.
+FIELD_TYPES = {
+    'u8': ('>B', 1, 0, 0xFF),
+    'i8': ('>b', 1, -0x80, 0x7F),
+    'u16': ('>H', 2, 0, 0xFFFF),
+    'i16': ('>h', 2, -0x8000, 0x7FFF),
+    'u24': (None, 3, 0, 0xFFFFFF),
+}
+
+SCHEMA_PYSENSE = 1
+SCHEMA_LIGHT = 2
+# the same with the battery voltage (boards with a PIC, see lib/battery.py)
+SCHEMA_PYSENSE_BATTERY = 3
+SCHEMA_LIGHT_BATTERY = 4
+
+# Schema id -> tuple of (field name, field type, scale)
+SCHEMAS = {
+    # lux: 0.01 lx up to 167772 lx; temperature: 0.01 deg C;
+    # humidity: 0.01 %RH; pressure: 0.25 Pa (MPL3115A2 resolution)
+    SCHEMA_PYSENSE: (
+        ('lux', 'u24', 100),
+        ('temperature', 'i16', 100),
+        ('humidity', 'u16', 100),
+        ('pressure', 'u24', 4),
+    ),
+    SCHEMA_LIGHT: (
+        ('lux', 'u24', 100),
+    ),
+    # battery: 0.02 V up to 5.1 V
+    SCHEMA_PYSENSE_BATTERY: (
+        ('lux', 'u24', 100),
+        ('temperature', 'i16', 100),
+        ('humidity', 'u16', 100),
+        ('pressure', 'u24', 4),
+        ('battery', 'u8', 50),
+    ),
+    SCHEMA_LIGHT_BATTERY: (
+        ('lux', 'u24', 100),
+        ('battery', 'u8', 50),
+    ),
+}
+
+HEADER_SIZE = 1
+
+
+class PayloadError(Exception):
+    pass
+
+
+def schema(schema_id):
+    try:
+        return SCHEMAS[schema_id]
+    except KeyError:
+        raise PayloadError("Unknown payload schema {}".format(schema_id))
+
+
+def quantize(value, ftype, scale):
+    """ fixed-point representation of value, saturated to the range of ftype
+        (None is the maximum raw value of ftype, reserved for it) """
+    _, _, lo, hi = FIELD_TYPES[ftype]
+    if value is None:
+        return hi
+    raw = int(round(value * scale))
+    if raw < lo:
+        return lo
+    if raw >= hi:
+        return hi - 1
+    return raw
+
+
+def dequantize(raw, ftype, scale):
+    """ value of a raw field, None for the maximum raw value of ftype """
+    if raw == FIELD_TYPES[ftype][3]:
+        return None
+    return raw / scale
+
+
+def size(schema_id):
+    """ number of bytes of an encoded message for the given schema """
+    n = HEADER_SIZE
+    for _, ftype, _ in schema(schema_id):
+        n += FIELD_TYPES[ftype][1]
+    return n
+
+
+def pack_raw(buf, pos, ftype, raw):
+    """ packs an already quantized value into buf at pos, returns the next position """
+    fmt, n, _, _ = FIELD_TYPES[ftype]
+    if fmt is None:
+        buf[pos] = (raw >> 16) & 0xFF
+        buf[pos + 1] = (raw >> 8) & 0xFF
+        buf[pos + 2] = raw & 0xFF
+    else:
+        struct.pack_into(fmt, buf, pos, raw)
+    return pos + n
+
+
+def unpack_raw(data, pos, ftype):
+    """ returns (raw value, next position) """
+    fmt, n, _, _ = FIELD_TYPES[ftype]
+    if fmt is None:
+        raw = (data[pos] << 16) | (data[pos + 1] << 8) | data[pos + 2]
+    else:
+        raw = struct.unpack_from(fmt, data, pos)[0]
+    return raw, pos + n
+
+
+def encode(schema_id, values):
+    """ encodes values (a sequence in schema order) into a bytes message """
+    fields = schema(schema_id)
+    if len(values) != len(fields):
+        raise PayloadError("Schema {} expects {} values, got {}".format(schema_id, len(fields), len(values)))
+    buf = bytearray(size(schema_id))
+    buf[0] = schema_id
+    pos = HEADER_SIZE
+    for i in range(len(fields)):
+        _, ftype, scale = fields[i]
+        pos = pack_raw(buf, pos, ftype, quantize(values[i], ftype, scale))
+    return bytes(buf)
+
+
+def decode(data):
+    """ host-side decoder, returns (schema_id, {field name: value}) """
+    if len(data) < HEADER_SIZE:
+        raise PayloadError("Empty payload")
+    schema_id = data[0]
+    fields = schema(schema_id)
+    if len(data) != size(schema_id):
+        raise PayloadError("Payload of {} bytes does not match schema {} ({} bytes)".format(len(data), schema_id, size(schema_id)))
+    values = {}
+    pos = HEADER_SIZE
+    for name, ftype, scale in fields:
+        raw, pos = unpack_raw(data, pos, ftype)
+        values[name] = dequantize(raw, ftype, scale)
+    return schema_id, values
+
+
+def string_size(values):
+    """ size of the same values sent as strings with two decimals (previous format) """
+    return len(' '.join(['{:.2f}'.format(v) for v in values if v is not None]))
+
+
+def bytes_saved(schema_id, values):
+    """ bytes saved per message with respect to the string format """
+    return string_size(values) - size(schema_id)
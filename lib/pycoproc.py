@@ -11,9 +11,11 @@
 # See https://docs.pycom.io for more information regarding library specifics
 
 from machine import Pin
-from machine import I2C
 import time
 import pycom
+import i2cbus
+import nvs
+import instrument
 
 __version__ = '0.0.3'
 
@@ -23,6 +25,10 @@ WAKE_REASON_PUSH_BUTTON = 2
 WAKE_REASON_TIMER = 4
 WAKE_REASON_INT_PIN = 8
 
+""" latency of the PIC per kind of command: instrument timer (histogram) and key of Pycoproc.latency_us """
+_LATENCY_NAMES = {0x00: 'pic_peek', 0x01: 'pic_poke', 0x02: 'pic_magic',
+                  0x10: 'pic_version', 0x11: 'pic_version', 0x12: 'pic_version'}
+
 class Pycoproc:
     """ class for handling the interaction with PIC MCU """
 
@@ -92,11 +98,23 @@ class Pycoproc:
 
     EXP_RTC_PERIOD = const(7000)
 
-    def __init__(self, i2c=None, sda='P22', scl='P21'):
-        if i2c is not None:
-            self.i2c = i2c
-        else:
-            self.i2c = I2C(0, mode=I2C.MASTER, pins=(sda, scl), baudrate=100000)
+    # ready polling (see _wait): first backoff, longest backoff and timeout
+    WAIT_MIN_US = const(50)
+    WAIT_MAX_US = const(5000)
+    WAIT_TIMEOUT_US = const(50000)
+
+    # RTC calibration cache (see cache_calibration): age (s) and temperature change (deg C)
+    # after which the RTC is calibrated again
+    CAL_MAX_AGE_S = const(86400)
+    CAL_MAX_TEMP_DELTA = const(5)
+    # offset (deg C) of the temperature of the calibration in the NVS
+    CAL_TEMP_OFFSET = const(100)
+
+    def __init__(self, i2c=None, sda='P22', scl='P21', fw_version=None):
+        """ fw_version: firmware version read on a previous boot (see lib/bootcache.py), the
+            PIC is then not asked for it: detecting the board is up to the caller """
+        # the bus shared with the sensor drivers (see lib/i2cbus.py), i2c can be a machine.I2C
+        self.i2c = i2cbus.shared(0, sda, scl, 100000, i2c)
 
         self.sda = sda
         self.scl = scl
@@ -105,80 +123,133 @@ class Pycoproc:
         self.wake_int = False
         self.wake_int_pin = False
         self.wake_int_pin_rising_edge = True
+        # latency learnt per kind of command (us from the end of the command to the PIC
+        # being ready, see _wait) and duration of a ready poll
+        self.latency_us = {}
+        self.poll_us = 0
+        # RTC calibration cache, disabled until cache_calibration()
+        self.temperature = None
+        self._cal_clock = None
+        self._cal_time_s = None
+        self._cal_temp = None
+        self._cal_pending = False
 
         # Make sure we are inserted into the
         # correct board and can talk to the PIC
-        try:
-            self.read_fw_version()
-        except Exception as e:
-            raise Exception('Board not detected: {}'.format(e))
+        if fw_version is None:
+            try:
+                fw_version = self.read_fw_version()
+            except Exception as e:
+                raise Exception('Board not detected: {}'.format(e))
 
+        ops = self.batch()
         # init the ADC for the battery measurements
-        self.poke_memory(ANSELC_ADDR, 1 << 2)
-        self.poke_memory(ADCON0_ADDR, (0x06 << _ADCON0_CHS_POSN) | _ADCON0_ADON_MASK)
-        self.poke_memory(ADCON1_ADDR, (0x06 << _ADCON1_ADCS_POSN))
+        ops.poke(ANSELC_ADDR, 1 << 2)
+        ops.poke(ADCON0_ADDR, (0x06 << _ADCON0_CHS_POSN) | _ADCON0_ADON_MASK)
+        ops.poke(ADCON1_ADDR, (0x06 << _ADCON1_ADCS_POSN))
         # enable the pull-up on RA3
-        self.poke_memory(WPUA_ADDR, (1 << 3))
+        ops.poke(WPUA_ADDR, (1 << 3))
         # make RC5 an input
-        self.set_bits_in_memory(TRISC_ADDR, 1 << 5)
+        ops.set_bits(TRISC_ADDR, 1 << 5)
         # set RC6 and RC7 as outputs and enable power to the sensors and the GPS
-        self.mask_bits_in_memory(TRISC_ADDR, ~(1 << 6))
-        self.mask_bits_in_memory(TRISC_ADDR, ~(1 << 7))
+        ops.mask_bits(TRISC_ADDR, ~(1 << 6))
+        ops.mask_bits(TRISC_ADDR, ~(1 << 7))
 
 
-        self.gps_standby(False)
-        self.sensor_power()
-        self.sd_power()
+        self.gps_standby(False, ops)
+        self.sensor_power(ops=ops)
+        self.sd_power(ops=ops)
+        ops.commit()
 
-        if self.read_fw_version() < 6:
+        if fw_version < 6:
             raise ValueError('Firmware out of date')
 
 
     def _write(self, data, wait=True):
-        self.i2c.writeto(I2C_SLAVE_ADDR, data)
-        if wait:
-            self._wait()
+        # the bus is held from a command to the PIC being ready (and, by the callers,
+        # to its result being read): nothing else may talk to the PIC in between
+        with self.i2c:
+            self.i2c.writeto(I2C_SLAVE_ADDR, data)
+            if wait:
+                self._wait(data[0])
 
     def _read(self, size):
         return self.i2c.readfrom(I2C_SLAVE_ADDR, size + 1)[1:(size + 1)]
 
-    def _wait(self):
-        count = 0
-        time.sleep_us(10)
-        while self.i2c.readfrom(I2C_SLAVE_ADDR, 1)[0] != 0xFF:
-            time.sleep_us(100)
-            count += 1
-            if (count > 500):  # timeout after 50ms
+    def _wait(self, cmd=None):
+        """ polls until the PIC is ready after cmd: the first poll ends when the latency
+            learnt for its kind of command is over, then the polls back off exponentially
+            from WAIT_MIN_US to WAIT_MAX_US until WAIT_TIMEOUT_US """
+        name = _LATENCY_NAMES.get(cmd, 'pic_other')
+        expected = self.latency_us.get(name, 0)
+        start = time.ticks_us()
+        delay = expected - self.poll_us
+        # late: in steps of a fraction of the expected latency at first
+        backoff = max(WAIT_MIN_US, expected >> 6)
+        polls = 0
+        while True:
+            if delay > 0:
+                time.sleep_us(delay)
+            polled = time.ticks_us()
+            ready = self.i2c.readfrom(I2C_SLAVE_ADDR, 1)[0] == 0xFF
+            now = time.ticks_us()
+            polls += 1
+            self.poll_us += (time.ticks_diff(now, polled) - self.poll_us) >> 2
+            elapsed = time.ticks_diff(now, start)
+            if ready:
+                break
+            if elapsed >= WAIT_TIMEOUT_US:
                 raise Exception('Board timeout')
+            delay = min(backoff, WAIT_TIMEOUT_US - elapsed)
+            backoff = min(backoff * 2, WAIT_MAX_US)
+        if polls == 1:
+            # ready at the first poll: the latency may be shorter, try a bit less next time
+            self.latency_us[name] = expected - (expected >> 6)
+        else:
+            self.latency_us[name] = expected + ((elapsed - expected) >> 1)
+        instrument.record(name, elapsed)
 
     def _send_cmd(self, cmd):
         self._write(bytes([cmd]))
 
     def read_hw_version(self):
-        self._send_cmd(CMD_HW_VER)
-        d = self._read(2)
+        with self.i2c:
+            self._send_cmd(CMD_HW_VER)
+            d = self._read(2)
         return (d[1] << 8) + d[0]
 
     def read_fw_version(self):
-        self._send_cmd(CMD_FW_VER)
-        d = self._read(2)
+        with self.i2c:
+            self._send_cmd(CMD_FW_VER)
+            d = self._read(2)
         return (d[1] << 8) + d[0]
 
     def read_product_id(self):
-        self._send_cmd(CMD_PROD_ID)
-        d = self._read(2)
+        with self.i2c:
+            self._send_cmd(CMD_PROD_ID)
+            d = self._read(2)
         return (d[1] << 8) + d[0]
 
     def peek_memory(self, addr):
-        self._write(bytes([CMD_PEEK, addr & 0xFF, (addr >> 8) & 0xFF]))
-        return self._read(1)[0]
+        with self.i2c:
+            self._write(bytes([CMD_PEEK, addr & 0xFF, (addr >> 8) & 0xFF]))
+            return self._read(1)[0]
 
     def poke_memory(self, addr, value):
         self._write(bytes([CMD_POKE, addr & 0xFF, (addr >> 8) & 0xFF, value & 0xFF]))
 
     def magic_write_read(self, addr, _and=0xFF, _or=0, _xor=0):
+        with self.i2c:
+            self.magic_write(addr, _and, _or, _xor)
+            return self._read(1)[0]
+
+    def magic_write(self, addr, _and=0xFF, _or=0, _xor=0):
+        """ magic_write_read() without reading the new value back """
         self._write(bytes([CMD_MAGIC, addr & 0xFF, (addr >> 8) & 0xFF, _and & 0xFF, _or & 0xFF, _xor & 0xFF]))
-        return self._read(1)[0]
+
+    def batch(self, merge=True):
+        """ a RegisterBatch to queue register operations in """
+        return RegisterBatch(self, merge)
 
     def toggle_bits_in_memory(self, addr, bits):
         self.magic_write_read(addr, _xor=bits)
@@ -200,53 +271,58 @@ class Pycoproc:
         c1 = self.peek_memory(WAKE_REASON_ADDR + 1)
         time_device_s = (c3 << 16) + (c2 << 8) + c1
         # this time is from PIC internal oscilator, so it needs to be adjusted with the calibration value
-        try:
-            self.calibrate_rtc()
-        except Exception:
-            pass
+        # (a cached one is the value the sleep was programmed with)
+        if self._cal_time_s is None:
+            try:
+                self.calibrate_rtc()
+            except Exception:
+                pass
         time_s = int((time_device_s / self.clk_cal_factor) + 0.5) # 0.5 used for round
         return time_s
 
     def setup_sleep(self, time_s):
-        try:
-            self.calibrate_rtc()
-        except Exception:
-            pass
+        if self.calibration_stale():
+            try:
+                self.calibrate_rtc()
+            except Exception:
+                pass
         time_s = int((time_s * self.clk_cal_factor) + 0.5)  # round to the nearest integer
         if time_s >= 2**(8*3):
             time_s = 2**(8*3)-1
         self._write(bytes([CMD_SETUP_SLEEP, time_s & 0xFF, (time_s >> 8) & 0xFF, (time_s >> 16) & 0xFF]))
 
     def go_to_sleep(self, gps=True):
+        ops = self.batch()
         # enable or disable back-up power to the GPS receiver
         if gps:
-            self.set_bits_in_memory(PORTC_ADDR, 1 << 7)
+            ops.set_bits(PORTC_ADDR, 1 << 7)
         else:
-            self.mask_bits_in_memory(PORTC_ADDR, ~(1 << 7))
+            ops.mask_bits(PORTC_ADDR, ~(1 << 7))
         # disable the ADC
-        self.poke_memory(ADCON0_ADDR, 0)
+        ops.poke(ADCON0_ADDR, 0)
 
         if self.wake_int:
             # Don't touch RA3, RA5 or RC1 so that interrupt wake-up works
-            self.poke_memory(ANSELA_ADDR, ~((1 << 3) | (1 << 5)))
-            self.poke_memory(ANSELC_ADDR, ~((1 << 6) | (1 << 7) | (1 << 1)))
+            ops.poke(ANSELA_ADDR, ~((1 << 3) | (1 << 5)))
+            ops.poke(ANSELC_ADDR, ~((1 << 6) | (1 << 7) | (1 << 1)))
         else:
             # disable power to the accelerometer, and don't touch RA3 so that button wake-up works
-            self.poke_memory(ANSELA_ADDR, ~(1 << 3))
-            self.poke_memory(ANSELC_ADDR, ~(1 << 7))
+            ops.poke(ANSELA_ADDR, ~(1 << 3))
+            ops.poke(ANSELC_ADDR, ~(1 << 7))
 
-        self.poke_memory(ANSELB_ADDR, 0xFF)
+        ops.poke(ANSELB_ADDR, 0xFF)
 
         # check if INT pin (PIC RC1), should be used for wakeup
         if self.wake_int_pin:
             if self.wake_int_pin_rising_edge:
-                self.set_bits_in_memory(OPTION_REG_ADDR, 1 << 6) # rising edge of INT pin
+                ops.set_bits(OPTION_REG_ADDR, 1 << 6) # rising edge of INT pin
             else:
-                self.mask_bits_in_memory(OPTION_REG_ADDR, ~(1 << 6)) # falling edge of INT pin
-            self.mask_bits_in_memory(ANSELC_ADDR, ~(1 << 1)) # disable analog function for RC1 pin
-            self.set_bits_in_memory(TRISC_ADDR, 1 << 1) # make RC1 input pin
-            self.mask_bits_in_memory(INTCON_ADDR, ~(1 << 1)) # clear INTF
-            self.set_bits_in_memory(INTCON_ADDR, 1 << 4) # enable interrupt; set INTE)
+                ops.mask_bits(OPTION_REG_ADDR, ~(1 << 6)) # falling edge of INT pin
+            ops.mask_bits(ANSELC_ADDR, ~(1 << 1)) # disable analog function for RC1 pin
+            ops.set_bits(TRISC_ADDR, 1 << 1) # make RC1 input pin
+            ops.mask_bits(INTCON_ADDR, ~(1 << 1)) # clear INTF
+            ops.set_bits(INTCON_ADDR, 1 << 4) # enable interrupt; set INTE)
+        ops.commit()
 
         self._write(bytes([CMD_GO_SLEEP]), wait=False)
         # kill the run pin
@@ -257,11 +333,15 @@ class Pycoproc:
         # WDT has a frequency divider to generate 1 ms
         # and then there is a binary prescaler, e.g., 1, 2, 4 ... 512, 1024 ms
         # hence the need for the constant
-        self._write(bytes([CMD_CALIBRATE]), wait=False)
-        self.i2c.deinit()
-        Pin('P21', mode=Pin.IN)
-        pulses = pycom.pulses_get('P21', 100)
-        self.i2c.init(mode=I2C.MASTER, pins=(self.sda, self.scl), baudrate=100000)
+        with self.i2c:
+            self._write(bytes([CMD_CALIBRATE]), wait=False)
+            # SCL carries the pulses: the sensors wait for the bus (or fail) meanwhile
+            self.i2c.deinit()
+            try:
+                Pin('P21', mode=Pin.IN)
+                pulses = pycom.pulses_get('P21', 100)
+            finally:
+                self.i2c.init()
         idx = 0
         for i in range(len(pulses)):
             if pulses[i][1] > EXP_RTC_PERIOD:
@@ -275,33 +355,92 @@ class Pycoproc:
             self.clk_cal_factor = (EXP_RTC_PERIOD / period) * (1000 / 1024)
         if self.clk_cal_factor > 1.25 or self.clk_cal_factor < 0.75:
             self.clk_cal_factor = 1
+        if period > 0:
+            # saved once the clock of the cache is known (see cache_calibration)
+            self._cal_pending = True
+            if self._cal_clock is not None:
+                self._save_calibration()
+
+    def load_calibration(self):
+        """ clk_cal_factor of the cache, if any (the factor the sleep was programmed with) """
+        factor = nvs.get('pc_cal_factor')
+        if factor is not None:
+            self.clk_cal_factor = factor / 1000000
+            self._cal_time_s = nvs.get('pc_cal_time')
+            temp = nvs.get('pc_cal_temp')
+            self._cal_temp = temp / 100 - CAL_TEMP_OFFSET if temp is not None else None
+
+    def cache_calibration(self, clock, max_age_s=CAL_MAX_AGE_S, max_temp_delta=CAL_MAX_TEMP_DELTA):
+        """ keeps clk_cal_factor in the NVS, calibrated again after max_age_s s of clock (counting
+            across the sleeps) or a change of max_temp_delta degrees """
+        self._cal_clock = clock
+        self._cal_max_age_s = max_age_s
+        self._cal_max_temp_delta = max_temp_delta
+        if self._cal_pending:
+            self._save_calibration()
+        elif self._cal_time_s is None:
+            self.load_calibration()
+
+    def set_temperature(self, temperature):
+        """ temperature of the board (deg C, e.g. from the SI7006A20), the PIC oscillator drifts with it """
+        self.temperature = temperature
+
+    def calibration_stale(self):
+        """ True if setup_sleep() has to calibrate the RTC (always without cache_calibration()) """
+        if self._cal_clock is None or nvs.expired(self._cal_clock, self._cal_time_s, self._cal_max_age_s):
+            return True
+        if self.temperature is None:
+            return False
+        return self._cal_temp is None or abs(self.temperature - self._cal_temp) > self._cal_max_temp_delta
+
+    def _save_calibration(self):
+        self._cal_pending = False
+        self._cal_time_s = int(self._cal_clock())
+        self._cal_temp = self.temperature
+        # without the factor until it is saved in full (a cache saved in part is never loaded)
+        nvs.erase('pc_cal_factor')
+        nvs.erase('pc_cal_temp')
+        pycom.nvs_set('pc_cal_time', self._cal_time_s)
+        if self.temperature is not None:
+            # the NVS holds uint32 values: offset to keep temperatures below 0 deg C
+            pycom.nvs_set('pc_cal_temp', max(0, int((self.temperature + CAL_TEMP_OFFSET) * 100 + 0.5)))
+        pycom.nvs_set('pc_cal_factor', int(self.clk_cal_factor * 1000000))
 
     def button_pressed(self):
         button = self.peek_memory(PORTA_ADDR) & (1 << 3)
         return not button
 
     def read_battery_voltage(self):
-        self.set_bits_in_memory(ADCON0_ADDR, _ADCON0_GO_nDONE_MASK)
-        time.sleep_us(50)
-        while self.peek_memory(ADCON0_ADDR) & _ADCON0_GO_nDONE_MASK:
-            time.sleep_us(100)
-        adc_val = (self.peek_memory(ADRESH_ADDR) << 2) + (self.peek_memory(ADRESL_ADDR) >> 6)
+        return self.battery_voltage(self.read_battery_adc())
+
+    def read_battery_adc(self):
+        """ one conversion of the battery ADC (10 bits) in three PIC commands: the conversion
+            (11.5 TAD, under 50 us) is over before the PIC gets the next command, as sending
+            a PEEK alone takes longer, so GO/nDONE is neither read back nor polled """
+        with self.i2c:
+            self.magic_write(ADCON0_ADDR, _or=_ADCON0_GO_nDONE_MASK)
+            return (self.peek_memory(ADRESH_ADDR) << 2) + (self.peek_memory(ADRESL_ADDR) >> 6)
+
+    def battery_voltage(self, adc_val):
+        """ battery voltage of a value (or a mean of values) of read_battery_adc() """
         return (((adc_val * 3.3 * 280) / 1023) / 180) + 0.01    # add 10mV to compensate for the drop in the FET
 
     def setup_int_wake_up(self, rising, falling):
         """ rising is for activity detection, falling for inactivity """
+        ops = self.batch()
         wake_int = False
         if rising:
-            self.set_bits_in_memory(IOCAP_ADDR, 1 << 5)
+            ops.set_bits(IOCAP_ADDR, 1 << 5)
             wake_int = True
         else:
-            self.mask_bits_in_memory(IOCAP_ADDR, ~(1 << 5))
+            ops.mask_bits(IOCAP_ADDR, ~(1 << 5))
 
         if falling:
-            self.set_bits_in_memory(IOCAN_ADDR, 1 << 5)
+            ops.set_bits(IOCAN_ADDR, 1 << 5)
             wake_int = True
         else:
-            self.mask_bits_in_memory(IOCAN_ADDR, ~(1 << 5))
+            ops.mask_bits(IOCAN_ADDR, ~(1 << 5))
+        ops.commit()
         self.wake_int = wake_int
 
     def setup_int_pin_wake_up(self, rising_edge = True):
@@ -309,38 +448,111 @@ class Pycoproc:
         self.wake_int_pin = True
         self.wake_int_pin_rising_edge = rising_edge
 
-    def gps_standby(self, enabled=True):
+    def gps_standby(self, enabled=True, ops=None):
+        """ ops: a RegisterBatch to queue the operations in (written by its commit()) """
+        batch = ops if ops is not None else self.batch()
         # make RC4 an output
-        self.mask_bits_in_memory(TRISC_ADDR, ~(1 << 4))
+        batch.mask_bits(TRISC_ADDR, ~(1 << 4))
         if enabled:
             # drive RC4 low
-            self.mask_bits_in_memory(PORTC_ADDR, ~(1 << 4))
+            batch.mask_bits(PORTC_ADDR, ~(1 << 4))
         else:
             # drive RC4 high
-            self.set_bits_in_memory(PORTC_ADDR, 1 << 4)
+            batch.set_bits(PORTC_ADDR, 1 << 4)
+        if ops is None:
+            batch.commit()
 
-    def sensor_power(self, enabled=True):
+    def sensor_power(self, enabled=True, ops=None):
+        batch = ops if ops is not None else self.batch()
         # make RC7 an output
-        self.mask_bits_in_memory(TRISC_ADDR, ~(1 << 7))
+        batch.mask_bits(TRISC_ADDR, ~(1 << 7))
         if enabled:
             # drive RC7 high
-            self.set_bits_in_memory(PORTC_ADDR, 1 << 7)
+            batch.set_bits(PORTC_ADDR, 1 << 7)
         else:
             # drive RC7 low
-            self.mask_bits_in_memory(PORTC_ADDR, ~(1 << 7))
+            batch.mask_bits(PORTC_ADDR, ~(1 << 7))
+        if ops is None:
+            batch.commit()
 
-    def sd_power(self, enabled=True):
+    def sd_power(self, enabled=True, ops=None):
+        batch = ops if ops is not None else self.batch()
         # make RA5 an output
-        self.mask_bits_in_memory(TRISA_ADDR, ~(1 << 5))
+        batch.mask_bits(TRISA_ADDR, ~(1 << 5))
         if enabled:
             # drive RA5 high
-            self.set_bits_in_memory(PORTA_ADDR, 1 << 5)
+            batch.set_bits(PORTA_ADDR, 1 << 5)
         else:
             # drive RA5 low
-            self.mask_bits_in_memory(PORTA_ADDR, ~(1 << 5))
+            batch.mask_bits(PORTA_ADDR, ~(1 << 5))
+        if ops is None:
+            batch.commit()
 
 
     # at the end:
     def reset_cmd(self):
         self._send_cmd(CMD_RESET)
         return
+
+
+class RegisterBatch:
+    """ register operations written by commit(), merged into one command per address
+        (at the first operation on it); merge=False sends one command per operation """
+
+    def __init__(self, pycoproc, merge=True):
+        self.pycoproc = pycoproc
+        self.merge = merge
+        # [addr, and, or, xor]: the new value is ((value & and) | or) ^ xor
+        self._ops = []
+
+    def poke(self, addr, value):
+        self._add(addr, 0, value, 0)
+
+    def set_bits(self, addr, bits):
+        self._add(addr, 0xFF, bits, 0)
+
+    def mask_bits(self, addr, mask):
+        self._add(addr, mask, 0, 0)
+
+    def toggle_bits(self, addr, bits):
+        self._add(addr, 0xFF, 0, bits)
+
+    def _add(self, addr, _and, _or, _xor):
+        _and &= 0xFF
+        _or &= 0xFF
+        _xor &= 0xFF
+        if self.merge:
+            for op in self._ops:
+                if op[0] == addr:
+                    # bits that go through both operations keep depending on the
+                    # value, the others end up with the constant of value 0
+                    keep = op[1] & ~op[2] & _and & ~_or & 0xFF
+                    value = ((((op[2] ^ op[3]) & _and) | _or) ^ _xor) & 0xFF
+                    op[1] = keep
+                    op[2] = value & ~keep & 0xFF
+                    op[3] = (op[3] ^ _xor) & keep
+                    return
+        self._ops.append([addr, _and, _or, _xor])
+
+    def __len__(self):
+        return len(self._ops)
+
+    def commit(self):
+        """ writes the queued operations, returns the number of commands sent """
+        ops = self._ops
+        self._ops = []
+        sent = 0
+        for addr, _and, _or, _xor in ops:
+            if not self.merge:
+                if _and == 0 and _xor == 0:
+                    self.pycoproc.poke_memory(addr, _or)
+                else:
+                    self.pycoproc.magic_write_read(addr, _and, _or, _xor)
+            elif _and == 0:
+                self.pycoproc.poke_memory(addr, _or ^ _xor)
+            elif _and == 0xFF and _or == 0 and _xor == 0:
+                continue
+            else:
+                self.pycoproc.magic_write(addr, _and, _or, _xor)
+            sent += 1
+        return sent
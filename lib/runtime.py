@@ -0,0 +1,223 @@
+"""Event-loop runtime of the node.
+
+Three concurrent tasks replace the blocking measure/sleep/send loop:
+
+* measure: calls produce(counter) every fixed_time + random(0, random_time)
+  seconds and queues the message it returns (None: nothing to send yet); the
+  deadlines are absolute and kept in ticks (lib/schedule.py), so they do
+  not drift and the lateness of every cycle is recorded. While the queue is
+  full (the duty cycle allows fewer uplinks than measurements), it waits
+  for a message to be sent: the periods missed meanwhile are skipped
+  instead of measured and dropped
+* transmit: sends queued messages as soon as the duty cycle of the sub-band
+  allows, without blocking the other tasks while the radio is busy
+* receive: polls the transport for downlinks (the node runs as class C, so
+  they can arrive at any time) and passes them to on_downlink(data, port)
+
+A radio error other than busy is logged and retried after a backoff, so
+neither loop ends while the node runs.
+
+With instrumentation enabled (lib/instrument.py), the duty-cycle waits,
+the sends and the lateness of the measurements are timed, and every stats_every uplinks the statistics are
+queued as an uplink of their own.
+
+The radio is reached through a transport (lib/transport.py), so the whole
+runtime also runs under CPython against the fake LoRa socket of the
+simulation:
+
+    node = Node(LoRaTransport(s), produceMessage, fixed_time=10.0, random_time=10.0)
+    runtime.run(node.run())
+"""
+
+import airtime
+import instrument
+import log
+import schedule
+from compat import asyncio, sleep_ms
+
+# retry period of a send while the radio is busy with the previous uplink
+BUSY_RETRY_MS = 100
+# period of the downlink polling
+RECV_POLL_MS = 200
+# first retry after a radio error (other than busy), doubled up to ERROR_RETRY_MAX_MS
+ERROR_RETRY_MS = 1000
+ERROR_RETRY_MAX_MS = 60000
+# messages waiting for the duty cycle: no measurement while the queue is full (the
+# oldest is dropped beyond this, only statistics uplinks can get there)
+MAX_QUEUE = 8
+
+
+class Node:
+
+    def __init__(self, transport, produce, fixed_time=10.0, random_time=10.0, dr=5, random=None,
+                 scheduler=None, on_sent=None, on_downlink=None, stats_every=0, periodic=None):
+        """ produce: coroutine function, produce(counter) returns the message to send or None
+            random: callable returning a float in [0, 1) for the random part of the period
+            scheduler: airtime.DutyCycleScheduler
+            stats_every: uplinks between statistics uplinks (0: never)
+            periodic: schedule.Periodic of the measurements (default: one from now
+            on every fixed_time + random(0, random_time) seconds) """
+        self.transport = transport
+        self.produce = produce
+        self.fixed_time = fixed_time
+        self.random_time = random_time
+        self.dr = dr
+        self.random = random
+        # schedule.Periodic of the measurements, with their lateness statistics
+        self.periodic = periodic
+        self.scheduler = scheduler if scheduler is not None else airtime.DutyCycleScheduler()
+        self.on_sent = on_sent
+        self.on_downlink = on_downlink
+        self.stats_every = stats_every
+        self.queue = []
+        self._queued = asyncio.Event()
+        self._dequeued = asyncio.Event()
+        self._sending = False
+        self.counter = 0
+        self.sent = 0
+        self.dropped = 0
+        # measurements held back by a full queue
+        self.throttled = 0
+        self.downlinks = 0
+        self.busy_retries = 0
+        # radio errors other than busy, retried after a backoff
+        self.send_errors = 0
+        self.recv_errors = 0
+        self.delayed_s = 0.0
+        # time on air (s) of the last uplink
+        self.last_toa = 0.0
+
+    def enqueue(self, message):
+        self.queue.append(message)
+        if len(self.queue) > MAX_QUEUE:
+            self.queue.pop(0)
+            self.dropped += 1
+            instrument.count('dropped')
+        self._queued.set()
+
+    async def measure(self, cycles=None):
+        # next measurement relative to the scheduled time, not to the end of this one
+        if self.periodic is None:
+            self.periodic = schedule.Periodic(int(self.fixed_time * 1000), int(self.random_time * 1000), self.random)
+        periodic = self.periodic
+        while cycles is None or self.counter < cycles:
+            wait = periodic.remaining_ms()
+            if wait > 0:
+                await sleep_ms(wait)
+            throttled = len(self.queue) >= MAX_QUEUE
+            if throttled:
+                # backpressure: measure again once the duty cycle lets a message out
+                self.throttled += 1
+                instrument.count('throttled')
+                while len(self.queue) >= MAX_QUEUE:
+                    self._dequeued.clear()
+                    await self._dequeued.wait()
+            skipped = periodic.skipped
+            late = periodic.tick()
+            if periodic.skipped != skipped and not throttled:
+                log.warning("Measurement {:d} ms late, {:d} periods skipped", late, periodic.skipped - skipped)
+            message = await self.produce(self.counter)
+            self.counter += 1
+            if message is not None:
+                self.enqueue(message)
+
+    def _backoff_ms(self, retry_ms):
+        return min(retry_ms * 2, ERROR_RETRY_MAX_MS) if retry_ms else ERROR_RETRY_MS
+
+    async def transmit(self):
+        retry_ms = 0
+        while True:
+            if not self.queue:
+                self._queued.clear()
+                await self._queued.wait()
+                continue
+            self._sending = True
+            message = self.queue[0]
+            toa = airtime.uplink_time_on_air(len(message), self.dr)
+            wait = self.scheduler.delay(toa)
+            if wait > 0:
+                log.info("Transmission delayed {:.3f} s by the duty cycle limit", wait)
+                log.flush()
+                self.delayed_s += wait
+                instrument.record('wait', wait * 1000000)
+                await asyncio.sleep(wait)
+            started = instrument.start()
+            try:
+                while not self.transport.send(message):
+                    self.busy_retries += 1
+                    instrument.count('busy')
+                    await sleep_ms(BUSY_RETRY_MS)
+            except Exception as e:
+                # the message stays at the head of the queue
+                retry_ms = self._backoff_ms(retry_ms)
+                log.error("Uplink failed ({}), retry in {:d} ms", e, retry_ms)
+                self.send_errors += 1
+                await sleep_ms(retry_ms)
+                continue
+            retry_ms = 0
+            instrument.stop('send', started)
+            instrument.count('uplinks')
+            self.scheduler.record(toa)
+            self.last_toa = toa
+            # only dequeued once sent, enqueue() may have dropped older messages meanwhile
+            if self.queue and self.queue[0] is message:
+                self.queue.pop(0)
+            self._dequeued.set()
+            self.sent += 1
+            self._sending = False
+            if self.on_sent is not None:
+                self.on_sent(message)
+            if self.stats_every and instrument.enabled and self.sent % self.stats_every == 0:
+                self.send_stats()
+
+    def send_stats(self):
+        """ queues an uplink with the instrumentation statistics """
+        self.enqueue(instrument.encode(airtime.EU868_MAX_PAYLOAD[self.dr]))
+
+    async def receive(self):
+        retry_ms = 0
+        while True:
+            try:
+                downlink = self.transport.recv()
+            except Exception as e:
+                retry_ms = self._backoff_ms(retry_ms)
+                log.error("Downlink polling failed ({}), retry in {:d} ms", e, retry_ms)
+                self.recv_errors += 1
+                await sleep_ms(retry_ms)
+                continue
+            retry_ms = 0
+            if downlink is None:
+                await sleep_ms(RECV_POLL_MS)
+                continue
+            self.downlinks += 1
+            instrument.count('downlinks')
+            if self.on_downlink is not None:
+                try:
+                    self.on_downlink(downlink[0], downlink[1])
+                except Exception as e:
+                    log.error("Downlink handler failed: {}", e)
+
+    def idle(self):
+        """ True when there is nothing left to send """
+        return not self.queue and not self._sending
+
+    async def run(self, cycles=None, linger_ms=0):
+        """ runs the node forever, or until the counter reaches cycles and the messages are
+            sent; then downlinks are still received during the time on air of the last
+            uplink plus linger_ms (the class A receive windows before a deep sleep) """
+        transmit = asyncio.create_task(self.transmit())
+        receive = asyncio.create_task(self.receive())
+        try:
+            await self.measure(cycles)
+            while not self.idle():
+                await sleep_ms(BUSY_RETRY_MS)
+            if linger_ms:
+                await sleep_ms(int(self.last_toa * 1000) + linger_ms)
+        finally:
+            transmit.cancel()
+            receive.cancel()
+
+
+def run(coro):
+    """ runs coro to completion on the event loop """
+    return asyncio.run(coro)
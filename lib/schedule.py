@@ -0,0 +1,74 @@
+"""Drift-free periodic deadlines on the monotonic tick counter.
+
+Deadlines are absolute: each one is the previous deadline plus the period
+(plus an optional random part), never "now" plus the period, so the time
+the work takes and late wake-ups do not accumulate. All the arithmetic is
+done on integer ticks_ms values with ticks_add/ticks_diff, so it is exact,
+allocates nothing and is not affected by the wrap of the tick counter nor
+by the RTC (midnight, NTP or manual adjustments).
+
+    periodic = Periodic(10000, jitter_ms=10000, random=Random)
+    while True:
+        wait = periodic.remaining_ms()
+        if wait > 0:
+            await sleep_ms(wait)
+        periodic.tick()
+        ...
+
+tick() records how late the work started. When it is late by whole periods,
+the missed deadlines are skipped (and counted) instead of being run back to
+back.
+"""
+
+import instrument
+from compat import ticks_add, ticks_diff, ticks_ms
+
+
+class Periodic:
+
+    def __init__(self, period_ms, jitter_ms=0, random=None, start=None):
+        """ period_ms: fixed part of the period
+            jitter_ms, random: random part of the period, random() * jitter_ms with random()
+            returning a float in [0, 1) (none if random is None)
+            start: ticks_ms of the first deadline (default now) """
+        self.period_ms = period_ms
+        self.jitter_ms = jitter_ms
+        self.random = random
+        self.deadline = ticks_ms() if start is None else start
+        # lateness statistics (ms)
+        self.count = 0
+        self.late = 0
+        self.late_total_ms = 0
+        self.late_max_ms = 0
+        self.skipped = 0
+
+    def _step(self):
+        if self.random is None or self.jitter_ms <= 0:
+            return self.period_ms
+        return self.period_ms + int(self.random() * self.jitter_ms)
+
+    def remaining_ms(self):
+        """ ms left until the current deadline (negative when it has passed) """
+        return ticks_diff(self.deadline, ticks_ms())
+
+    def tick(self):
+        """ to be called when the work of the current deadline starts: records its
+            lateness, moves to the next deadline and returns the lateness (ms) """
+        late = -self.remaining_ms()
+        self.count += 1
+        if late > 0:
+            self.late += 1
+            self.late_total_ms += late
+            if late > self.late_max_ms:
+                self.late_max_ms = late
+            instrument.record('late', late * 1000)
+            if late >= self.period_ms > 0:
+                # whole periods missed: stay on the grid, but do not run them back to back
+                missed = late // self.period_ms
+                self.skipped += missed
+                self.deadline = ticks_add(self.deadline, missed * self.period_ms)
+        self.deadline = ticks_add(self.deadline, self._step())
+        return late if late > 0 else 0
+
+    def late_mean_ms(self):
+        return self.late_total_ms / self.late if self.late else 0.0
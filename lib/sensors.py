@@ -0,0 +1,60 @@
+"""Registry of sensor drivers kept initialized between measurement cycles.
+
+Drivers are built the first time they are used and reused afterwards, so
+their register initialization only runs once. A driver is dropped (and
+rebuilt on its next use) only after an I2C error. The registry measures how
+long each driver took to initialize, which is the time saved every time it
+is reused. The caller drops the driver with invalidate() after an error.
+
+    sensors = SensorRegistry()
+    sensors.register('light', lambda: LTR329ALS01(pyexp))
+    ch0, ch1, lux = sensors.get('light').read()
+"""
+
+from compat import ticks_diff, ticks_us
+
+
+class SensorRegistry:
+
+    def __init__(self):
+        self._factories = {}
+        self._drivers = {}
+        # name -> initialization time (us) of the current driver
+        self.init_us = {}
+        self.builds = {}
+        self.errors = {}
+        self._cycle_saved_us = 0
+        self.saved_us = 0
+
+    def register(self, name, factory):
+        """ factory: callable returning a new, initialized driver """
+        self._factories[name] = factory
+        self.builds[name] = 0
+        self.errors[name] = 0
+
+    def __contains__(self, name):
+        return name in self._factories
+
+    def get(self, name):
+        driver = self._drivers.get(name)
+        if driver is not None:
+            self._cycle_saved_us += self.init_us[name]
+            self.saved_us += self.init_us[name]
+            return driver
+        start = ticks_us()
+        driver = self._factories[name]()
+        self.init_us[name] = ticks_diff(ticks_us(), start)
+        self.builds[name] += 1
+        self._drivers[name] = driver
+        return driver
+
+    def invalidate(self, name):
+        """ drops the driver, it is initialized again on its next use """
+        self._drivers.pop(name, None)
+
+    def begin_cycle(self):
+        self._cycle_saved_us = 0
+
+    def cycle_saved_us(self):
+        """ initialization time saved by reusing drivers since begin_cycle() """
+        return self._cycle_saved_us
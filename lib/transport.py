@@ -0,0 +1,45 @@
+"""Transports used by the node runtime (lib/runtime.py).
+
+A transport moves payloads without blocking:
+
+    send(data)  -> True if the uplink was queued, False if the radio is busy
+    recv()      -> (data, port) of a pending downlink, or None
+
+LoRaTransport wraps the LoRaWAN socket of the Pycom firmware; any object
+with the same two methods (e.g. the fake LoRa socket of the simulation)
+can be used instead.
+"""
+
+EAGAIN = 11
+# largest downlink application payload in EU868
+MAX_DOWNLINK = 242
+
+
+class LoRaTransport:
+    """ LoRaWAN socket (socket.AF_LORA, socket.SOCK_RAW) in non-blocking mode """
+
+    def __init__(self, sock, bufsize=MAX_DOWNLINK):
+        self.sock = sock
+        self.bufsize = bufsize
+        sock.setblocking(False)
+
+    def send(self, data):
+        try:
+            self.sock.send(data)
+        except OSError as e:
+            # the previous uplink (and its receive windows) is still in progress
+            if e.args and e.args[0] == EAGAIN:
+                return False
+            raise
+        return True
+
+    def recv(self):
+        try:
+            data, port = self.sock.recvfrom(self.bufsize)
+        except OSError as e:
+            if e.args and e.args[0] == EAGAIN:
+                return None
+            raise
+        if not data:
+            return None
+        return (data, port)
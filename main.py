@@ -14,18 +14,86 @@ from pycoproc import Pycoproc
 from LIS2HH12 import LIS2HH12
 from SI7006A20 import SI7006A20
 from LTR329ALS01 import LTR329ALS01
-from MPL3115A2 import MPL3115A2,ALTITUDE,PRESSURE
+from MPL3115A2 import MPL3115A2
+# Sensor drivers kept initialized between measurements
+from sensors import SensorRegistry
+# All sensor conversions in parallel
+import acquire
+# Binary encoding of the measurements (see lib/payload.py for the decoder)
+import payload
+# Time on air and duty cycle limits
+import airtime
+# Several measurements per uplink
+import batch
+# Timers and counters of the hot paths (near zero cost while disabled)
+import instrument
+# Level-filtered logging, buffered and written in batches
+import log
+# Power down between uplinks, state kept across the sleep
+import deepsleep
+import schedule
+# Board and device found at the first boot, kept for the next ones
+import bootcache
+# Battery voltage averaged over several conversions and read rarely
+from battery import BatteryMonitor
+# Event-loop runtime (measurement, transmit and downlink tasks) and LoRa transport
+import runtime
+from transport import LoRaTransport
 
 bTakeMeasurements = False
 boardType = 0
 
 ## PARAMETERS
 # Period between packets = fixedTime + random (0, fixedTime)
+# Transmissions are always delayed to respect the duty cycle of the sub-band,
+# so fixedTime = randomTime = 0 sends as fast as the duty cycle allows
 fixedTime = 10.0
 randomTime = 10.0
+# LoRaWAN data rate (DR0...DR5 - the lower DR, the higher SF)
+dataRate = 5
+# Measurements sent per uplink (1 = one uplink per measurement). Fewer samples
+# are sent if they do not fit in the maximum payload of the data rate. Not
+# used with deepSleep (one measurement per uplink)
+batchSamples = 4
+# Deep sleep between uplinks (battery nodes): the node wakes up, measures,
+# sends one uplink (class A) and powers down until the next period, through
+# the PIC of the expansion board or the ESP32 deep sleep on the universal
+# board. The LoRaWAN session is kept in the nvram (the node joins only once);
+# the message counter, the next deadline and the airtime used are kept in
+# the NVS (see lib/deepsleep.py)
+deepSleep = False
+# Board type, PIC versions and device found in the list below are kept in the
+# NVS after the first boot: later boots skip the board detection and the
+# lookup (see lib/bootcache.py)
+bootCache = True
+# The RTC of the PIC (sleep time) is calibrated again after calibrationMaxAge
+# seconds or a change of temperature (SI7006A20) of calibrationMaxTempDelta
+# degrees, instead of before every sleep (deepSleep; 0 = before every sleep)
+calibrationMaxAge = 86400
+calibrationMaxTempDelta = 5.0
+# Battery voltage sent with the measurements (PySense and PyScan): mean of
+# batterySamples conversions, the PIC ADC is read at most every batteryInterval
+# seconds (an exponentially weighted estimate is sent in between)
+batteryMonitor = True
+batterySamples = 8
+batteryInterval = 3600.0
+# MPL3115A2 oversampling profile: 'fast' (10 ms), 'balanced' (66 ms) or 'precise' (512 ms)
+pressureProfile = 'precise'
+# LTR329ALS01 gain and integration time adjusted to the light level
+lightAutoRange = True
 
 # Debug messages
 debug = 0
+# Messages below logLevel ('DEBUG', 'INFO', 'WARNING', 'ERROR' or 'NONE') are
+# not even formatted ('DEBUG' when debug > 0). They are buffered and written
+# once per cycle to the serial port, or appended to logFile if set
+logLevel = 'INFO'
+logFile = None
+# Timers and counters (sensor, encode, wait, send, join) sent as a statistics
+# uplink every statsEvery uplinks (0 = never) and on request by a downlink
+# starting with 0x7F (see lib/instrument.py)
+instrumentation = False
+statsEvery = 20
 # OTAA or ABP
 # VERY IMPORTANT!!! If ABP is used, make sure that RX2 data rate is set to 5
 # and RX2 frequency is set to 869.525 MHz (chirpstack -> device profile ->
@@ -102,108 +170,192 @@ def zfill(s, width):
   return '{:0>{w}}'.format(s, w=width)
 
 # Functions related to board
-def takeMeasurement():
-  global lt_light, lt_lux, mp_temp, mp_alt, mp_pres, si_temp, si_humid, si_dew, si_humid_tamb, li_acc, li_roll, li_pitch
-
+def createSensors(pyexp, boardType):
+  # Drivers are initialized on their first use and kept (re-initialized only after an I2C error)
+  sensors = SensorRegistry()
   if boardType == Pycoproc.PYSCAN or boardType == Pycoproc.PYSENSE:
-    lt = LTR329ALS01(pyexp)
-    lt_light = lt.light()
-    lt_lux = lt.lux()
-    print("[INFO] LTR329ALS01 light (channel Blue lux, channel Red lux): " + str(lt_light))
-    print("[INFO] LTR329ALS01 light (global lux):                        " + str(lt_lux))
-
+    sensors.register('LTR329ALS01', lambda: LTR329ALS01(pyexp, auto_range=lightAutoRange))
   # From https://docs.pycom.io/tutorials/expansionboards/pysense/
   if boardType == Pycoproc.PYSENSE:
-    mp = MPL3115A2(pyexp,mode=ALTITUDE) # Returns height in meters. Mode may also be set to PRESSURE, returning a value in Pascals
-    mp_temp = mp.temperature()
-    mp_alt = mp.altitude()
-    print("[INFO] MPL3115A2 temperature:                                 " + str(mp_temp))
-    print("[INFO] MPL3115A2 altitude:                                    " + str(mp_alt))
-    mpp = MPL3115A2(pyexp,mode=PRESSURE) # Returns pressure in Pa. Mode may also be set to ALTITUDE, returning a value in meters
-    mp_pres = mpp.pressure()
-    print("[INFO] MPL3115A2 Pressure:                                    " + str(mp_pres))
-
-    si = SI7006A20(pyexp)
-    si_temp = si.temperature()
-    si_humid = si.humidity()
-    si_dew = si.dew_point()
-    t_ambient = 24.4
-    si_humid_tamb = si.humid_ambient(t_ambient)
-    print("[INFO] SI7006A20 temperature:                                 " + str(si_temp)+ " deg C")
-    print("[INFO] SI7006A20 relative Humidity:                           " + str(si_humid) + " %RH")
-    print("[INFO] SI7006A20 dew point:                                   "+ str(si_dew) + " deg C")
-    print("[INFO] SI7006A20 humidity ambient for " + str(t_ambient) + " deg C:             " + str(si_humid_tamb) + " %RH")
-
-    li = LIS2HH12(pyexp)
-    li_acc = li.acceleration()
-    li_roll = li.roll()
-    li_pitch = li.pitch()
-    print("[INFO] LIS2HH12 acceleration:                                 " + str(li_acc))
-    print("[INFO] LIS2HH12 roll:                                         " + str(li_roll))
-    print("[INFO] LIS2HH12 pitch:                                        " + str(li_pitch))
+    sensors.register('MPL3115A2', lambda: MPL3115A2(pyexp, one_shot=True, profile=pressureProfile)) # It stays in standby between conversions
+    sensors.register('SI7006A20', lambda: SI7006A20(pyexp))
+    sensors.register('LIS2HH12', lambda: LIS2HH12(pyexp))
+  return sensors
+
+async def takeMeasurement():
+  global lt_light, lt_lux, mp_temp, mp_alt, mp_pres, si_temp, si_humid, si_dew, si_humid_tamb, li_acc, li_roll, li_pitch
+
+  # A sensor that fails in this cycle is sent as missing (see lib/payload.py), not with its previous value
+  lt_light = lt_lux = mp_temp = mp_alt = mp_pres = None
+  si_temp = si_humid = si_dew = si_humid_tamb = li_acc = li_roll = li_pitch = None
+
+  sensors.begin_cycle()
+  started = instrument.start()
+
+  # Conversions of all sensors overlap (see lib/acquire.py); an I2C error in one sensor
+  # is returned as its result and the driver is initialized again in the next cycle
+  t_ambient = 24.4
+  results = await acquire.measure_all(sensors, t_ambient)
+  instrument.stop('sensor', started)
+  for name, result in results.items():
+    if isinstance(result, Exception):
+      log.error("{:s} I2C error ({}), it will be initialized again", name, result)
+
+  # The values are logged at DEBUG, below the default logLevel: the calls are skipped as a whole
+  debugLog = log.level <= log.DEBUG
+  result = results.get('LTR329ALS01')
+  if result is not None and not isinstance(result, Exception):
+    lt_light0, lt_light1, lt_lux = result
+    lt_light = (lt_light0, lt_light1)
+    if debugLog:
+      log.debug("LTR329ALS01 light (channel Blue lux, channel Red lux): {}", lt_light)
+      log.debug("LTR329ALS01 light (global lux):                        {}", lt_lux)
+
+  result = results.get('MPL3115A2')
+  if result is not None and not isinstance(result, Exception):
+    mp_pres, mp_alt, mp_temp = result # Pressure in Pa, altitude in meters (computed from pressure) and temperature
+    if debugLog:
+      log.debug("MPL3115A2 temperature:                                 {}", mp_temp)
+      log.debug("MPL3115A2 altitude:                                    {}", mp_alt)
+      log.debug("MPL3115A2 Pressure:                                    {}", mp_pres)
+
+  result = results.get('SI7006A20')
+  if result is not None and not isinstance(result, Exception):
+    si_temp, si_humid, si_dew, si_humid_tamb = result
+    # The RTC of the PIC drifts with the temperature (see calibrationMaxTempDelta)
+    pyexp.set_temperature(si_temp)
+    if debugLog:
+      log.debug("SI7006A20 temperature:                                 {} deg C", si_temp)
+      log.debug("SI7006A20 relative Humidity:                           {} %RH", si_humid)
+      log.debug("SI7006A20 dew point:                                   {} deg C", si_dew)
+      log.debug("SI7006A20 humidity ambient for {} deg C:             {} %RH", t_ambient, si_humid_tamb)
+
+  result = results.get('LIS2HH12')
+  if result is not None and not isinstance(result, Exception):
+    li_acc, li_roll, li_pitch = result
+    if debugLog:
+      log.debug("LIS2HH12 acceleration:                                 {}", li_acc)
+      log.debug("LIS2HH12 roll:                                         {}", li_roll)
+      log.debug("LIS2HH12 pitch:                                        {}", li_pitch)
+
+  if battery is not None:
+    # A PIC error keeps the previous estimate (None before the first reading)
+    try:
+      battery.update()
+    except Exception as e:
+      instrument.count('i2c_errors')
+      log.error("Battery voltage read error ({})", e)
+    if debugLog and battery.volts is not None:
+      log.debug("Battery voltage:                                       {:.2f} V", battery.volts)
+
+  if debugLog:
+    log.debug("Sensor initialization time saved in this cycle: {:.1f} ms ({:.1f} ms in total)", sensors.cycle_saved_us()/1000, sensors.saved_us/1000)
 
 def detectBoard(lora):
-  global DevAddr
+  global DevAddr, warmBoot
+
+  ## LORAWAN MAC address
+  DevEUI=ubinascii.hexlify(lora.mac()).upper().decode('utf-8')
+
+  # Board and device found in a previous boot (see lib/bootcache.py)
+  warmBoot = False
+  if bootCache:
+    detected = detectBoardCached(DevEUI)
+    if detected is not None:
+      warmBoot = True
+      return detected
 
-  print("[INFO] Detected board:", sys.platform)
+  log.info("Detected board: {:s}", sys.platform)
 
   # Expansion board
   pid = 0
+  hwVersion = fwVersion = 0
   try:
     pyexp = Pycoproc()
     pid = pyexp.read_product_id()
+    hwVersion = pyexp.read_hw_version()
+    fwVersion = pyexp.read_fw_version()
   except:
     pyexp = None
-    print("Detected universal expansion board")
+    log.info("Detected universal expansion board")
     boardType = Pycoproc.PYUNIV
 
   if (pid == 61458):   # From web
-    print("[INFO] Detected expansion board: PySense (HW version {:d}, FW version {:d})".format(pyexp.read_hw_version(), pyexp.read_fw_version()))
+    log.info("Detected expansion board: PySense (HW version {:d}, FW version {:d})", hwVersion, fwVersion)
     #pyexp = Pysense()
     boardType = Pycoproc.PYSENSE
   elif (pid == 61459): # From web
-    print("[INFO] Detected expansion board: PyTrack (HW version {:d}, FW version {:d})".format(pyexp.read_hw_version(), pyexp.read_fw_version()))
+    log.info("Detected expansion board: PyTrack (HW version {:d}, FW version {:d})", hwVersion, fwVersion)
     #pyexp = Pytrack()
     boardType = Pycoproc.PYTRACK
   elif (pid == 61240):   # Testing my own device
-    print("[INFO] Detected expansion board: PyScan (HW version {:d}, FW version {:d})".format(pyexp.read_hw_version(), pyexp.read_fw_version()))
+    log.info("Detected expansion board: PyScan (HW version {:d}, FW version {:d})", hwVersion, fwVersion)
     #pyexp = Pycoproc(Pycoproc.PYSCAN)
     boardType = Pycoproc.PYSCAN
 
   ## WI-FI MAC address
   #print("Device unique ID:", ubinascii.hexlify(machine.unique_id()).upper().decode('utf-8'))
-  print("[INFO] Wi-Fi MAC:     ", ubinascii.hexlify(WLAN().mac()[0]).upper().decode('utf-8'))
+  log.info("Wi-Fi MAC:      {:s}", ubinascii.hexlify(WLAN().mac()[0]).upper().decode('utf-8'))
 
-  ## LORAWAN MAC address
-  DevEUI=ubinascii.hexlify(lora.mac()).upper().decode('utf-8')
   #print("[INFO] LORAWAN DevEUI:", DevEUI[2:-1])
-  print("[INFO] LORAWAN DevEUI:", DevEUI)
+  log.info("LORAWAN DevEUI: {:s}", DevEUI)
 
   dev_eui_list = [device["dev_eui"] for device in devices_list]
-  if (debug > 0):
-    print("[DEBUG] dev_eui_list:", dev_eui_list)
-    print("[DEBUG] DevEUI:", DevEUI)
+  log.debug("dev_eui_list: {}", dev_eui_list)
+  log.debug("DevEUI: {:s}", DevEUI)
   if DevEUI in dev_eui_list:
       DevEUI_index = dev_eui_list.index(DevEUI)
       deviceNo = devices_list[DevEUI_index]["no"]
       DevAddr = devices_list[DevEUI_index]["DevAddr"]
       deviceTag = devices_list[DevEUI_index]["tag"]
-      print("[ERROR] LoRaWAN device found in the database!")
+      log.info("LoRaWAN device found in the database!")
+      if bootCache:
+        bootcache.save(DevEUI, board=boardType, hw=hwVersion, fw=fwVersion, pid=pid, index=DevEUI_index)
   else:
-      print("[ERROR] LoRaWAN device not found in the database!")
+      log.error("LoRaWAN device not found in the database!")
 
   if bOTAA:
-    print("[INFO] LORAWAN device " + deviceTag + " (no. " + str(deviceNo) + ") with DevEUI (LSB) 0x" + DevEUI + " will have DevAddr 0x" + DevAddr + ", NwkSKey 0x" + NwkSKey + " and AppSKey 0x" + AppSKey)
+    log.info("LORAWAN device {:s} (no. {:d}) with DevEUI (LSB) 0x{:s} will have DevAddr 0x{:s}, NwkSKey 0x{:s} and AppSKey 0x{:s}", deviceTag, deviceNo, DevEUI, DevAddr, NwkSKey, AppSKey)
   else:
-    print("[INFO] LORAWAN device " + deviceTag + " (no. " + str(deviceNo) + ") with DevEUI (LSB) 0x" + DevEUI + " will have DevAddr 0x" + DevAddr + " and AppEUI 0x" + AppEUI + " (not used) and AppKey 0x" + AppKey)
+    log.info("LORAWAN device {:s} (no. {:d}) with DevEUI (LSB) 0x{:s} will have DevAddr 0x{:s} and AppEUI 0x{:s} (not used) and AppKey 0x{:s}", deviceTag, deviceNo, DevEUI, DevAddr, AppEUI, AppKey)
 
   return (pyexp, boardType)
 
+def detectBoardCached(DevEUI):
+  global DevAddr
+
+  # None (cold boot) if there is no cache for this DevEUI or the board does not match it
+  cached = bootcache.load(DevEUI)
+  if cached is None or cached["index"] >= len(devices_list) or devices_list[cached["index"]]["dev_eui"] != DevEUI:
+    return None
+  boardType = cached["board"]
+  pyexp = None
+  try:
+    if boardType == Pycoproc.PYUNIV:
+      # No PIC to ask: only trusted after a deep sleep of the ESP32 itself
+      if machine.reset_cause() != machine.DEEPSLEEP_RESET:
+        return None
+    else:
+      # Its firmware was checked when the cache was written, one command checks the board
+      pyexp = Pycoproc(fw_version=cached["fw"])
+      if pyexp.read_product_id() != cached["pid"]:
+        return None
+  except:
+    return None
+
+  device = devices_list[cached["index"]]
+  DevAddr = device["DevAddr"]
+  log.info("Warm boot: {:s} expansion board (HW version {:d}, FW version {:d}), LORAWAN device {:s} (no. {:d}) with DevEUI (LSB) 0x{:s} and DevAddr 0x{:s}", ('PySense', 'PyTrack', 'PyScan', 'universal')[boardType-1], cached["hw"], cached["fw"], device["tag"], device["no"], DevEUI, DevAddr)
+  return (pyexp, boardType)
+
 # Functions related to LoRaWAN
 def initializeLoRaWAN():
   global DevAddr
 
-  if (bOTAA):
+  if lora.has_joined():
+    # Session (DevAddr, keys, frame counters) restored from the nvram after a deep sleep
+    log.info('LoRaWAN session restored, no join needed')
+  elif (bOTAA):
     # Create an OTAA authentication parameters
     app_eui = ubinascii.unhexlify(AppEUI)
     app_key = ubinascii.unhexlify(AppKey)
@@ -217,24 +369,26 @@ def initializeLoRaWAN():
     dev_addr = struct.unpack(">l", ubinascii.unhexlify(DevAddr))[0]
     nwk_swkey = ubinascii.unhexlify(NwkSKey)
     app_swkey = ubinascii.unhexlify(AppSKey)
-    print("DevAddr: 0x" + DevAddr + ", dev_addr: " + str(dev_addr) + ", nwk_swkey: " + str(nwk_swkey) + ", app_swkey: " + str(app_swkey))
+    log.info("DevAddr: 0x{:s}, dev_addr: {}, nwk_swkey: {}, app_swkey: {}", DevAddr, dev_addr, nwk_swkey, app_swkey)
 
     # Join a network using ABP (Activation By Personalization)
     lora.join(activation=LoRa.ABP, auth=(dev_addr, nwk_swkey, app_swkey), timeout=0)
 
   # Wait until the module has joined the network
-  print('[INFO] Not joined yet...')
+  started = instrument.start()
   while not lora.has_joined():
     #blink(red, 0.5, 1)
+    log.info('Not joined yet...')
+    log.flush()
     time.sleep(2.5)
-    print('[INFO] Not joined yet...')
 
-  print('[INFO] --- Joined Sucessfully --- ')
+  instrument.stop('join', started)
+  log.info('--- Joined Sucessfully --- ')
 
   # Create a LoRa socket
   s = socket.socket(socket.AF_LORA, socket.SOCK_RAW)
   # Set the LoRaWAN data rate (DR0...DR5 - the lower DR, the higher SF)
-  s.setsockopt(socket.SOL_LORA, socket.SO_DR, 5)
+  s.setsockopt(socket.SOL_LORA, socket.SO_DR, dataRate)
   # Set CONFIRMED to false
   s.setsockopt(socket.SOL_LORA, socket.SO_CONFIRMED, False)
 
@@ -252,12 +406,28 @@ li_acc = None
 li_roll = None
 li_pitch = None
 def generateMessage(messageCounter):
-#  if boardType == Pycoproc.PYSENSE:
-#    message = "{:.2f} {:.2f} {:.2f} {:.2f}".format(lt_lux, si_temp, si_humid, mp_pres)
-#  elif boardType == Pycoproc.PYSCAN:
-#    message = "{:.2f}".format(lt_lux)
-#  else:
-  if True:
+  started = instrument.start()
+  message = encodeMessage(messageCounter)
+  instrument.stop('encode', started)
+  return message
+
+def encodeMessage(messageCounter):
+  global batcher
+
+  # Measurements are sent as a compact binary payload (see lib/payload.py and lib/batch.py)
+  if bTakeMeasurements and boardType == Pycoproc.PYSENSE and battery is not None:
+    schema = payload.SCHEMA_PYSENSE_BATTERY
+    values = (lt_lux, si_temp, si_humid, mp_pres, battery.volts)
+  elif bTakeMeasurements and boardType == Pycoproc.PYSENSE:
+    schema = payload.SCHEMA_PYSENSE
+    values = (lt_lux, si_temp, si_humid, mp_pres)
+  elif bTakeMeasurements and boardType == Pycoproc.PYSCAN and battery is not None:
+    schema = payload.SCHEMA_LIGHT_BATTERY
+    values = (lt_lux, battery.volts)
+  elif bTakeMeasurements and boardType == Pycoproc.PYSCAN:
+    schema = payload.SCHEMA_LIGHT
+    values = (lt_lux,)
+  else:
     if (messageCounter < 10):
       message = "Testing data....." + str(messageCounter)
     elif (messageCounter < 100):
@@ -268,9 +438,58 @@ def generateMessage(messageCounter):
       message = "Testing data.." + str(messageCounter)
     else:
       message = "Testing data." + str(messageCounter)
+    return message
+
+  if (batchSamples > 1) and not deepSleep:
+    # None until the batch is complete
+    if batcher is None:
+      batcher = batch.Batcher(schema, max_samples=batchSamples, dr=dataRate, clock=dutyCycle.clock)
+    message = batcher.add(values)
+    if message is not None and log.level <= log.DEBUG:
+      log.debug("Batch payload: {:d} samples in {:d} bytes", message[1], len(message))
+  else:
+    message = payload.encode(schema, values)
+    if log.level <= log.DEBUG:
+      log.debug("Binary payload: {:d} bytes ({:d} bytes saved vs. string format)", len(message), payload.bytes_saved(schema, values))
+
+  return message
+
+async def produceMessage(messageCounter):
+  # Take one measurement
+  if bTakeMeasurements:
+    await takeMeasurement()
 
+  # Generate message (None if the measurement is kept for a later batch uplink)
+  message = generateMessage(messageCounter) # Testing data.....01, ...
+  log.flush()
   return message
 
+def messageSent(message):
+  global firstUplink
+  if firstUplink is None:
+    # ticks_ms counts from the boot
+    firstUplink = time.ticks_ms()
+    instrument.record('boot', firstUplink*1000)
+    log.info("First uplink {:d} ms after the boot ({:s} boot)", firstUplink, 'warm' if warmBoot else 'cold')
+  if log.level <= log.INFO:
+    year, month, day, hour, minute, second, usecond, nothing = rtc.now()
+    if isinstance(message, str):
+      messageText = message
+    else:
+      messageText = ubinascii.hexlify(message).decode('utf-8')
+    log.info("Message \"{:s}\" sent at {:02d}:{:02d}:{:02d}.{:06d}", messageText, hour, minute, second, usecond)
+  log.flush()
+  if (debug > 0) and not isinstance(message, str) and message[:1] == bytes([instrument.STATS_SCHEMA]):
+    instrument.dump()
+
+def downlinkReceived(data, port):
+  log.info("Downlink received on port {}: {:s}", port, ubinascii.hexlify(data).decode('utf-8'))
+  log.flush()
+  # Statistics requested by the network server
+  if instrument.enabled and data[:1] == bytes([instrument.STATS_SCHEMA]):
+    instrument.dump()
+    node.send_stats()
+
 ###################
 ## MAIN FUNCTION ##
 ###################
@@ -278,59 +497,77 @@ def generateMessage(messageCounter):
 # Real-time clock
 rtc = machine.RTC()
 
+log.configure(level=log.DEBUG if debug > 0 else getattr(log, logLevel),
+              sink=log.file_sink(logFile) if logFile else None)
+
+instrument.enable(instrumentation)
+
 # INITIALIZE LORA (LORAWAN mode. Europe = LoRa.EU868)
-lora = LoRa(mode=LoRa.LORAWAN, region=LoRa.EU868, public=True, tx_retries=3, device_class=LoRa.CLASS_C, adr=False)
+lora = LoRa(mode=LoRa.LORAWAN, region=LoRa.EU868, public=True, tx_retries=3,
+            device_class=LoRa.CLASS_A if deepSleep else LoRa.CLASS_C, adr=False)
+if deepSleep:
+  # Session of the previous boot, if any (then there is no new join)
+  lora.nvram_restore()
 
 # BOARD INFORMATION
 (pyexp, boardType) = detectBoard(lora)
+sensors = createSensors(pyexp, boardType)
 
 ## LORAWAN (initialize and return a socket)
 s = initializeLoRaWAN()
 
-# Infinite loop
-messageCounter = 0
-while True:
-
-  # Take one measurement
-  if bTakeMeasurements:
-    takeMeasurement()
-
-  # Generate message
-  message = generateMessage (messageCounter) # Testing data.....01, ...
-  payloadsize = len(message)
-  messageCounter = messageCounter + 1
-
-  # Time between transmissions
-  randNo = fixedTime + RandomRange(0,randomTime)
-  if (debug > 0):
-    print("[DEBUG] Time for next transmission = {:.1f}".format(randNo))
-
-  if (messageCounter == 1):
-    year, month, day, hour, minute, second, usecond, nothing = rtc.now()
-    currentTime = hour*3600 + minute*60 + second + usecond/1000000
-    timeNextTransmission = currentTime + randNo
-  else:
-    # Not the first packet
-    timeNextTransmission = timeLastTransmission + randNo
-
-  year, month, day, hour, minute, second, usecond, nothing = rtc.now()
-  currentTime = hour*3600 + minute*60 + second + usecond/1000000
-  timeToWait = timeNextTransmission - currentTime
-  if (debug > 0):
-    print("[DEBUG] currentTime = {:.3f}".format(currentTime))
-    print("[DEBUG] timeNextTransmission = {:.3f}".format(timeNextTransmission))
-    print("[DEBUG] timeToWait = {:.3f}".format(timeToWait))
-  timeLastTransmission = timeNextTransmission
-
-  if (timeToWait > 0):
-    print("[INFO] Waiting {:.3f} s for next transmission...".format(timeToWait))
-    time.sleep(timeToWait)
-  else:
-    print("[INFO] Next transmission starts immediately (time between transmissions too short)!")
-
-  s.setblocking(True)
-  s.send(message)
-  s.setblocking(False)
-
-  year, month, day, hour, minute, second, usecond, nothing = rtc.now()
-  print("[INFO] Message \"{:s}\" sent at {:02d}:{:02d}:{:02d}.{:.06d}".format(message, hour, minute, second, usecond))
+# Airtime used per sub-band (EU868 duty cycle)
+if deepSleep:
+  # Counter, deadline and airtime used before the sleep, on a clock that counts the time slept
+  checkpoint = deepsleep.Checkpoint()
+  cacheCalibration = pyexp is not None and calibrationMaxAge > 0
+  if cacheCalibration:
+    # RTC calibration kept across the sleeps: the factor the sleep was programmed with
+    # converts the sleep remaining
+    pyexp.load_calibration()
+  checkpoint.load(deepsleep.slept_ms(pyexp))
+  if cacheCalibration:
+    # On the node time restored by the checkpoint: calibrated again when old or after a change of temperature
+    pyexp.cache_calibration(checkpoint.clock, calibrationMaxAge, calibrationMaxTempDelta)
+  dutyCycle = airtime.DutyCycleScheduler(clock=checkpoint.clock)
+  checkpoint.restore(dutyCycle)
+  periodic = schedule.Periodic(int(fixedTime*1000), int(randomTime*1000), Random, start=checkpoint.deadline())
+else:
+  dutyCycle = airtime.DutyCycleScheduler()
+  periodic = None
+
+# Battery voltage (boards with a PIC), read in the measurement cycles
+battery = None
+if pyexp is not None and batteryMonitor and (boardType == Pycoproc.PYSENSE or boardType == Pycoproc.PYSCAN):
+  battery = BatteryMonitor(pyexp, samples=batterySamples, interval_s=batteryInterval, clock=dutyCycle.clock)
+  if deepSleep:
+    battery.load()
+
+# Measurements waiting to be sent (created with the first measurement)
+batcher = None
+# ms from the boot to the first uplink
+firstUplink = None
+
+# Measurement, transmit and downlink tasks run concurrently: transmissions wait
+# for the duty cycle without blocking and downlinks (class C) are read at any time
+node = runtime.Node(LoRaTransport(s), produceMessage, fixedTime, randomTime, dataRate, random=Random,
+                    scheduler=dutyCycle, on_sent=messageSent, on_downlink=downlinkReceived, stats_every=statsEvery,
+                    periodic=periodic)
+log.flush()
+if deepSleep:
+  # One measurement and uplink, then the receive windows
+  node.counter = checkpoint.counter
+  # Uplinks of the previous boots, so statistics go out every statsEvery uplinks
+  node.sent = checkpoint.sent
+  runtime.run(node.run(node.counter + 1, linger_ms=deepsleep.RX_WINDOWS_MS))
+  checkpoint.save(node.counter, periodic, dutyCycle, node.sent)
+  if battery is not None:
+    battery.save()
+  lora.nvram_save()
+  # Until the next deadline, or later if the duty cycle would not allow the next uplink yet
+  sleepTime = max(periodic.remaining_ms(), int(dutyCycle.delay(node.last_toa)*1000))
+  log.info("Deep sleep for {:d} ms", sleepTime)
+  log.flush()
+  checkpoint.sleep(sleepTime, pyexp)
+else:
+  runtime.run(node.run())
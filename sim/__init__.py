@@ -0,0 +1,208 @@
+"""Host-side simulation of a Pycom node.
+
+install() builds a simulated world (virtual clock, I2C bus with device
+models) and registers stand-ins for the MicroPython modules, so the code in
+lib/ runs unmodified under CPython (asyncio loops run on the virtual clock
+too, see sim.aio):
+
+    import sim
+    world = sim.install()
+    world.bus.attach(MPL3115A2Model(world.clock, world.random))
+    MPL3115A2 = sim.load('MPL3115A2')
+
+run_main() runs main.py itself on a world with an expansion board attached
+(see sim.node for the command line), boot after boot when it deep-sleeps.
+"""
+
+import ast
+import asyncio
+import builtins
+import importlib
+import os
+import random
+import sys
+import types
+
+from sim import aio
+from sim.clock import Deadline, DeepSleep, VirtualClock
+from sim.i2c import Bus
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIB_DIR = os.path.join(ROOT_DIR, 'lib')
+MAIN = os.path.join(ROOT_DIR, 'main.py')
+
+# DevEUI of PYCOM01 in the devices_list of main.py
+DEFAULT_DEV_EUI = '70B3D54994DE968F'
+# start-up of the firmware before main.py runs, at every boot
+BOOT_US = 1000000
+
+world = None
+
+
+class World:
+
+    def __init__(self, baudrate=100000, overhead_us=50, seed=0, dev_eui=DEFAULT_DEV_EUI):
+        self.clock = VirtualClock()
+        self.time = self.clock.module()
+        self.bus = Bus(self.clock, baudrate, overhead_us)
+        self.random = random.Random(seed)
+        self.dev_eui = bytes.fromhex(dev_eui)
+        self.unique_id = bytes([0x24, 0x0A, 0xC4]) + self.dev_eui[-3:]
+        # pycom.nvs_* storage and the LoRa nvram, both survive a deep sleep
+        self.nvs = {}
+        self.nvram = {}
+        # network.LoRa and the AF_LORA socket created by the code under test
+        self.lora = None
+        self.lora_socket = None
+        # boots of main.py (see run_main) and the cause of the last one: 'power' or
+        # 'deepsleep' (wake-up of the ESP32 deep sleep), see machine.reset_cause()
+        self.boots = 0
+        self.reset_cause = 'power'
+        # OTAA joins, last uplink frame counter accepted and uplinks rejected by the network server
+        self.joins = 0
+        self.server_fcnt = -1
+        self.rejected = 0
+        self.pic = None
+
+    def attach_board(self, board='pysense'):
+        """ attaches the PIC and the sensor models of an expansion board
+            ('pysense', 'pytrack', 'pyscan'; None for the universal board) """
+        from sim import devices
+        if board is None:
+            return
+        self.pic = self.bus.attach(devices.PycoprocModel(self.clock, board, random=self.random))
+        if board in ('pysense', 'pyscan'):
+            self.bus.attach(devices.LTR329ALS01Model(self.clock))
+        if board == 'pysense':
+            self.bus.attach(devices.MPL3115A2Model(self.clock, self.random))
+            self.bus.attach(devices.SI7006A20Model(self.clock))
+        self.bus.attach(devices.LIS2HH12Model(self.clock, self.random))
+
+    def wake(self, reason):
+        """ state after a deep sleep ended by reason ('esp32' or 'pic'): the module is reset,
+            NVS, LoRa nvram and the devices on the bus keep their state """
+        self.reset_cause = 'deepsleep' if reason == 'esp32' else 'power'
+        if self.pic is not None:
+            self.pic.wake()
+        self.lora = None
+
+
+def _const(value):
+    return value
+
+
+def install(**kwargs):
+    """ creates a new simulated world and makes it the target of the stand-in modules """
+    global world
+    world = World(**kwargs)
+
+    builtins.const = _const
+    micropython = types.ModuleType('micropython')
+    micropython.const = _const
+    sys.modules['micropython'] = micropython
+
+    from sim import crypto, machine, network, pycom, ubinascii
+    sys.modules['machine'] = machine
+    sys.modules['network'] = network
+    sys.modules['pycom'] = pycom
+    sys.modules['crypto'] = crypto
+    sys.modules['ubinascii'] = ubinascii
+    sys.modules['utime'] = world.time
+    # asyncio (imported above, bound to the real time module) runs on the virtual clock
+    asyncio.set_event_loop_policy(aio.Policy(world.clock))
+
+    if LIB_DIR not in sys.path:
+        sys.path.insert(0, LIB_DIR)
+    # modules from lib/ imported for a previous world are bound to its clock
+    _unload()
+    return world
+
+
+def _unload():
+    for name, module in list(sys.modules.items()):
+        if getattr(module, '__file__', None) and os.path.dirname(os.path.abspath(module.__file__)) == LIB_DIR:
+            del sys.modules[name]
+
+
+def _hoist_consts(module):
+    # MicroPython inlines const() names declared in a class body, so the
+    # drivers use them as globals: make them module attributes for CPython
+    for value in list(vars(module).values()):
+        if isinstance(value, type) and value.__module__ == module.__name__:
+            for name, attr in vars(value).items():
+                if name.lstrip('_')[:1].isupper() and isinstance(attr, int) and not hasattr(module, name):
+                    setattr(module, name, attr)
+
+
+class _Swapped:
+    """ the virtual clock as ``time`` and the LoRa-capable stand-in as ``socket``, only while
+        the code under test is imported: the host modules stay in place for everything else """
+
+    def __enter__(self):
+        from sim import lora
+        self.saved = {name: sys.modules.get(name) for name in ('time', 'socket')}
+        sys.modules['time'] = world.time
+        sys.modules['socket'] = lora.socket_module()
+
+    def __exit__(self, *exc):
+        for name, module in self.saved.items():
+            sys.modules[name] = module
+
+
+def load(name):
+    """ imports the lib/ module name with the virtual clock as its time module """
+    with _Swapped():
+        module = importlib.import_module(name)
+    _hoist_consts(module)
+    return module
+
+
+def _override(tree, params):
+    # replaces the value of top-level assignments `name = ...` for the names in params
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            name = node.targets[0].id
+            if name in params:
+                node.value = ast.copy_location(ast.Constant(params[name]), node.value)
+    return tree
+
+
+def run_main(path=MAIN, params=None):
+    """ runs main.py unmodified (apart from the top-level parameters in params) until it
+        returns or the clock reaches clock.deadline_us; returns the globals of main.py.
+        When main.py powers the node down (DeepSleep), it runs again after the sleep,
+        from a reset, on the same world """
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    code = compile(_override(tree, params or {}), path, 'exec')
+    # lib/ modules imported by main.py, loaded first so their class constants are hoisted
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names.append(node.module)
+    while True:
+        world.boots += 1
+        world.clock.boot_us = world.clock.now_us
+        for name in names:
+            if os.path.exists(os.path.join(LIB_DIR, name + '.py')):
+                load(name)
+        scope = {'__name__': '__main__', '__file__': path}
+        sleep = None
+        with _Swapped():
+            try:
+                world.clock.advance_us(BOOT_US)
+                exec(code, scope)
+            except Deadline:
+                pass
+            except DeepSleep as e:
+                sleep = e
+        if sleep is None:
+            return scope
+        try:
+            world.clock.deep_sleep_us(sleep.us)
+        except Deadline:
+            return scope
+        world.wake(sleep.reason)
+        _unload()
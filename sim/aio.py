@@ -0,0 +1,63 @@
+"""asyncio event loop running on the virtual clock.
+
+When every task is waiting, the loop jumps the virtual clock to the next
+timer instead of blocking, so coroutines that sleep (asyncio.sleep, the
+uasyncio sleep_ms stand-in) take simulated time only.
+
+    world = sim.install()    # installs Policy(world.clock)
+    results = acquire.run(acquire.measure_all(sensors))
+"""
+
+import asyncio
+import math
+import selectors
+
+
+class _Selector(selectors.DefaultSelector):
+
+    def __init__(self, clock):
+        selectors.DefaultSelector.__init__(self)
+        self.clock = clock
+
+    def select(self, timeout=None):
+        # the only real file descriptor is the loop's self-pipe
+        events = selectors.DefaultSelector.select(self, 0)
+        if not events and timeout:
+            self.clock.sleep_us(math.ceil(timeout * 1000000))
+        return events
+
+
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+
+    def __init__(self, clock):
+        asyncio.SelectorEventLoop.__init__(self, _Selector(clock))
+        self.clock = clock
+        # timers are due as soon as the clock reaches them
+        self._clock_resolution = 1e-6
+
+    def time(self):
+        return self.clock.now_us / 1000000
+
+
+def new_event_loop(clock):
+    return VirtualTimeLoop(clock)
+
+
+class Policy(asyncio.DefaultEventLoopPolicy):
+    """ makes asyncio.run() (and so acquire.run()) use the virtual time loop """
+
+    def __init__(self, clock):
+        asyncio.DefaultEventLoopPolicy.__init__(self)
+        self.clock = clock
+
+    def new_event_loop(self):
+        return VirtualTimeLoop(self.clock)
+
+
+def run(clock, coro):
+    """ asyncio.run on a virtual time loop """
+    loop = new_event_loop(clock)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
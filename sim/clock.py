@@ -0,0 +1,127 @@
+"""Virtual clock for the host-side simulation.
+
+Time only advances when the code under test sleeps or when the simulated
+I2C bus accounts the duration of a transaction, so results do not depend
+on the speed of the host. module() returns a stand-in for the MicroPython
+``time``/``utime`` module bound to the clock.
+"""
+
+import time as _time
+import types
+
+TICKS_PERIOD = 1 << 30
+TICKS_MAX = TICKS_PERIOD - 1
+TICKS_HALFPERIOD = TICKS_PERIOD // 2
+
+
+class Deadline(Exception):
+    """ raised when the clock reaches VirtualClock.deadline_us, ends a simulation """
+
+
+class DeepSleep(Exception):
+    """ raised by the stand-ins when the node powers down for us microseconds (machine.deepsleep,
+        or the PIC cutting the power after Pycoproc.go_to_sleep): ends a boot of sim.run_main """
+
+    def __init__(self, us, reason):
+        Exception.__init__(self, us, reason)
+        self.us = us
+        # 'esp32' or 'pic'
+        self.reason = reason
+
+
+class VirtualClock:
+
+    def __init__(self, start_us=0, epoch=0):
+        self.now_us = start_us
+        # RTC seconds (and microseconds) since the Epoch at time 0
+        self.epoch = epoch
+        self.epoch_us = 0
+        # total time spent in sleep() calls
+        self.slept_us = 0
+        # total time powered down (deep sleep), see deep_sleep_us()
+        self.deep_slept_us = 0
+        # time of the last boot: the tick counters start from 0 at every boot
+        self.boot_us = 0
+        # Deadline is raised when the clock gets there (not None)
+        self.deadline_us = None
+
+    def _check_deadline(self):
+        if self.deadline_us is not None and self.now_us >= self.deadline_us:
+            self.now_us = self.deadline_us
+            # only once, what runs while the simulation unwinds is not limited
+            self.deadline_us = None
+            raise Deadline()
+
+    def advance_us(self, us):
+        self.now_us += int(us)
+        self._check_deadline()
+
+    def _until_deadline(self, us):
+        us = int(us)
+        if self.deadline_us is not None:
+            us = min(us, max(0, self.deadline_us - self.now_us))
+        return us
+
+    def sleep_us(self, us):
+        if us > 0:
+            self.slept_us += self._until_deadline(us)
+            self.now_us += int(us)
+            self._check_deadline()
+
+    def deep_sleep_us(self, us):
+        """ time powered down: it only counts in deep_slept_us, not in slept_us """
+        if us > 0:
+            self.deep_slept_us += self._until_deadline(us)
+            self.now_us += int(us)
+            self._check_deadline()
+
+    def sleep_ms(self, ms):
+        self.sleep_us(ms * 1000)
+
+    def sleep(self, s):
+        self.sleep_us(s * 1000000)
+
+    def ticks_us(self):
+        return (self.now_us - self.boot_us) & TICKS_MAX
+
+    def ticks_ms(self):
+        return ((self.now_us - self.boot_us) // 1000) & TICKS_MAX
+
+    def ticks_cpu(self):
+        return self.ticks_us()
+
+    @staticmethod
+    def ticks_add(ticks, delta):
+        return (ticks + delta) & TICKS_MAX
+
+    @staticmethod
+    def ticks_diff(end, start):
+        return ((end - start + TICKS_HALFPERIOD) & TICKS_MAX) - TICKS_HALFPERIOD
+
+    def rtc_us(self):
+        """ RTC time in microseconds since the Epoch """
+        return self.epoch * 1000000 + self.epoch_us + self.now_us
+
+    def time(self):
+        return self.rtc_us() // 1000000
+
+    def localtime(self, secs=None):
+        if secs is None:
+            secs = self.time()
+        return tuple(_time.gmtime(secs))[:8]
+
+    gmtime = localtime
+
+    def monotonic(self):
+        return self.now_us / 1000000
+
+    def perf_counter_ns(self):
+        return self.now_us * 1000
+
+    def module(self):
+        """ a time module whose functions use this clock """
+        m = types.ModuleType('time')
+        for name in ('sleep', 'sleep_ms', 'sleep_us', 'ticks_us', 'ticks_ms', 'ticks_cpu',
+                     'ticks_add', 'ticks_diff', 'time', 'localtime', 'gmtime', 'monotonic', 'perf_counter_ns'):
+            setattr(m, name, getattr(self, name))
+        return m
@@ -0,0 +1,8 @@
+"""Stand-in for the Pycom ``crypto`` module, seeded from the simulated world."""
+
+import sim
+
+
+def getrandbits(bits):
+    """ bytes with bits random bits (rounded up to whole bytes), like the Pycom firmware """
+    return bytes(sim.world.random.getrandbits(8) for _ in range((bits + 7) // 8))
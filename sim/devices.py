@@ -0,0 +1,461 @@
+"""Register-map models of the sensors of the Pycom expansion boards."""
+
+import math
+
+from sim.i2c import Device, RegisterDevice
+
+
+class MPL3115A2Model(RegisterDevice):
+    """ barometer/altimeter: one-shot (OST) and active modes, oversampling timing,
+        noise decreasing with the square root of the oversampling ratio """
+
+    address = 0x60
+
+    STATUS = 0x00
+    OUT_P_MSB = 0x01
+    OUT_P_LSB = 0x03
+    OUT_T_LSB = 0x05
+    DR_STATUS = 0x06
+    WHO_AM_I = 0x0C
+    CTRL_REG1 = 0x26
+
+    # OS bits -> time per conversion (us), as in the datasheet
+    CONVERSION_US = (6000, 10000, 18000, 34000, 66000, 130000, 258000, 512000)
+
+    def __init__(self, clock, rng, pressure=101325.0, temperature=21.5, noise_pa=12.0):
+        RegisterDevice.__init__(self, clock)
+        self.rng = rng
+        self.pressure = pressure
+        self.temperature = temperature
+        self.noise_pa = noise_pa
+        self.regs[self.WHO_AM_I] = 0xC4
+        self._oneshot_done = None
+        self._next_sample = None
+
+    def _conversion_us(self):
+        return self.CONVERSION_US[(self.regs[self.CTRL_REG1] >> 3) & 0x07]
+
+    def _sample(self):
+        ctrl = self.regs[self.CTRL_REG1]
+        oversampling = 1 << ((ctrl >> 3) & 0x07)
+        pres = self.pressure + self.rng.gauss(0, self.noise_pa / math.sqrt(oversampling))
+        if ctrl & 0x80:
+            # altitude, Q16.4 signed meters
+            alt = 44330.77 * (1 - pow(pres / 101326.0, 0.1902632))
+            raw = int(round(alt * 16)) & 0xFFFFF
+        else:
+            # pressure, Q18.2 Pa
+            raw = int(round(pres * 4)) & 0xFFFFF
+        self.regs[self.OUT_P_MSB] = (raw >> 12) & 0xFF
+        self.regs[self.OUT_P_MSB + 1] = (raw >> 4) & 0xFF
+        self.regs[self.OUT_P_LSB] = (raw & 0x0F) << 4
+        temp = int(round(self.temperature * 16)) & 0xFFF
+        self.regs[self.OUT_T_LSB - 1] = (temp >> 4) & 0xFF
+        self.regs[self.OUT_T_LSB] = (temp & 0x0F) << 4
+        # PTDR, PDR, TDR
+        self.regs[self.DR_STATUS] = 0x0E
+        self.regs[self.STATUS] = 0x0E
+
+    def update(self):
+        now = self.clock.now_us
+        if self._oneshot_done is not None and now >= self._oneshot_done:
+            self._sample()
+            self._oneshot_done = None
+            self.regs[self.CTRL_REG1] &= ~0x02
+        if self._next_sample is not None:
+            while now >= self._next_sample:
+                self._sample()
+                self._next_sample += self._conversion_us()
+
+    def write_reg(self, reg, value):
+        if reg != self.CTRL_REG1:
+            self.regs[reg] = value
+            return
+        if value & 0x04:
+            # software reset
+            self.regs[self.CTRL_REG1] = 0
+            self._oneshot_done = None
+            self._next_sample = None
+            return
+        self.regs[reg] = value
+        if value & 0x01:
+            if self._next_sample is None:
+                self._next_sample = self.clock.now_us + self._conversion_us()
+        else:
+            self._next_sample = None
+            if value & 0x02 and self._oneshot_done is None:
+                self._oneshot_done = self.clock.now_us + self._conversion_us()
+
+    def read_reg(self, reg):
+        value = self.regs[reg]
+        if reg == self.OUT_P_LSB:
+            self.regs[self.STATUS] &= ~0x0C
+        elif reg == self.OUT_T_LSB:
+            self.regs[self.STATUS] &= ~0x0A
+        self.regs[self.DR_STATUS] = self.regs[self.STATUS]
+        return value
+
+
+class LTR329ALS01Model(RegisterDevice):
+    """ ambient light sensor: counts proportional to lux x gain x integration,
+        saturating at 65535, new data once per measurement period """
+
+    address = 0x29
+
+    CONTR = 0x80
+    MEAS_RATE = 0x85
+    PART_ID = 0x86
+    MANUFAC_ID = 0x87
+    DATA_CH1_LOW = 0x88
+    DATA_CH0_HIGH = 0x8B
+    STATUS = 0x8C
+
+    GAINS = {0: 1, 1: 2, 2: 4, 3: 8, 6: 48, 7: 96}
+    INTEGRATION_MS = {0: 100, 1: 50, 2: 200, 3: 400, 4: 150, 5: 250, 6: 300, 7: 350}
+    RATE_MS = {0: 50, 1: 100, 2: 200, 3: 500, 4: 1000, 5: 2000, 6: 2000, 7: 2000}
+
+    # channel 1 (infrared) / channel 0 of the simulated light source
+    IR_RATIO = 0.3
+
+    def __init__(self, clock, lux=100.0):
+        RegisterDevice.__init__(self, clock)
+        self.lux = lux
+        self.regs[self.MEAS_RATE] = 0x03
+        self.regs[self.PART_ID] = 0xA0
+        self.regs[self.MANUFAC_ID] = 0x05
+        # invalid data until the first measurement
+        self.regs[self.STATUS] = 0x80
+        self._next_sample = None
+
+    def _period_us(self):
+        rate = self.regs[self.MEAS_RATE]
+        return 1000 * max(self.INTEGRATION_MS[(rate >> 3) & 0x07], self.RATE_MS[rate & 0x07])
+
+    def _sample(self):
+        gain_bits = (self.regs[self.CONTR] >> 2) & 0x07
+        gain = self.GAINS.get(gain_bits, 1)
+        integration = self.INTEGRATION_MS[(self.regs[self.MEAS_RATE] >> 3) & 0x07] / 100
+        # inverse of the datasheet lux formula for ratio < 0.45
+        ch0 = self.lux * gain * integration / (1.7743 + 1.1059 * self.IR_RATIO)
+        ch0 = min(int(ch0), 0xFFFF)
+        ch1 = min(int(ch0 * self.IR_RATIO), 0xFFFF)
+        self.regs[self.DATA_CH1_LOW] = ch1 & 0xFF
+        self.regs[self.DATA_CH1_LOW + 1] = ch1 >> 8
+        self.regs[self.DATA_CH1_LOW + 2] = ch0 & 0xFF
+        self.regs[self.DATA_CH0_HIGH] = ch0 >> 8
+        self.regs[self.STATUS] = (gain_bits << 4) | 0x04
+
+    def update(self):
+        if self._next_sample is None:
+            return
+        while self.clock.now_us >= self._next_sample:
+            self._sample()
+            self._next_sample += self._period_us()
+
+    def write_reg(self, reg, value):
+        self.regs[reg] = value
+        if reg == self.CONTR or reg == self.MEAS_RATE:
+            # a new setting restarts the measurement cycle
+            self._next_sample = self.clock.now_us + self._period_us() if self.regs[self.CONTR] & 0x01 else None
+
+    def read_reg(self, reg):
+        value = self.regs[reg]
+        if reg == self.DATA_CH0_HIGH:
+            self.regs[self.STATUS] &= ~0x04
+        return value
+
+
+class SI7006A20Model(Device):
+    """ humidity/temperature sensor in no-hold-master mode: NACKs its address
+        while a conversion is in progress """
+
+    address = 0x40
+
+    # typical conversion times (us): 14-bit temperature, 12-bit humidity
+    TEMP_CONVERSION_US = 7000
+    HUMD_CONVERSION_US = 10000
+
+    def __init__(self, clock, temperature=22.0, humidity=45.0):
+        Device.__init__(self, clock)
+        self.temperature = temperature
+        self.humidity = humidity
+        self.user_reg = 0x3A
+        self.heater_reg = 0x00
+        self._busy_until = 0
+        self._result = b''
+        self._last_temp = self._raw_temp()
+
+    def _raw_temp(self):
+        return int((self.temperature + 46.85) * 65536 / 175.72) & 0xFFFC
+
+    def _raw_humid(self):
+        return int((self.humidity + 6.0) * 65536 / 125.0) & 0xFFFC
+
+    def ack(self):
+        return self.clock.now_us >= self._busy_until
+
+    def write(self, data):
+        cmd = data[0]
+        now = self.clock.now_us
+        if cmd == 0xF3:
+            self._last_temp = self._raw_temp()
+            self._result = bytes([self._last_temp >> 8, self._last_temp & 0xFF, 0])
+            self._busy_until = now + self.TEMP_CONVERSION_US
+        elif cmd == 0xF5:
+            # a humidity conversion is followed by a temperature conversion
+            raw = self._raw_humid()
+            self._last_temp = self._raw_temp()
+            self._result = bytes([raw >> 8, raw & 0xFF, 0])
+            self._busy_until = now + self.HUMD_CONVERSION_US + self.TEMP_CONVERSION_US
+        elif cmd == 0xE0:
+            self._result = bytes([self._last_temp >> 8, self._last_temp & 0xFF])
+        elif cmd == 0xE7:
+            self._result = bytes([self.user_reg])
+        elif cmd == 0xE6 and len(data) > 1:
+            self.user_reg = data[1]
+        elif cmd == 0x11:
+            self._result = bytes([self.heater_reg])
+        elif cmd == 0x51 and len(data) > 1:
+            self.heater_reg = data[1] & 0x0F
+        elif cmd == 0xFA:
+            self._result = bytes([0x06, 0x00, 0x00, 0x00])
+        elif cmd == 0xFC:
+            self._result = bytes([0x06, 0x00, 0x00, 0x00])
+        elif cmd == 0x84:
+            self._result = bytes([0x20])
+        else:
+            self._result = bytes([0])
+
+    def read(self, nbytes):
+        return (self._result + bytes(nbytes))[:nbytes]
+
+
+class LIS2HH12Model(RegisterDevice):
+    """ accelerometer: output registers, ODR timing and the 32-sample FIFO
+        (bypass, FIFO and stream modes) """
+
+    address = 30
+
+    WHO_AM_I = 0x0F
+    CTRL1 = 0x20
+    CTRL3 = 0x22
+    CTRL4 = 0x23
+    OUT_X_L = 0x28
+    OUT_Z_H = 0x2D
+    FIFO_CTRL = 0x2E
+    FIFO_SRC = 0x2F
+
+    ODR_HZ = (0, 10, 50, 100, 200, 400, 800, 0)
+    # full scale bits -> mg per full range as in the driver (SCALES)
+    SCALES = {0: 4000, 2: 8000, 3: 16000}
+
+    def __init__(self, clock, rng, acceleration=(0.0, 0.0, 1.0), noise_g=0.002):
+        RegisterDevice.__init__(self, clock)
+        self.rng = rng
+        self.acceleration = acceleration
+        self.noise_g = noise_g
+        self.regs[self.WHO_AM_I] = 0x41
+        self.regs[self.CTRL1] = 0x07
+        self.regs[self.CTRL4] = 0x04
+        self.fifo = []
+        self.overrun = False
+        self._next_sample = None
+
+    def _odr(self):
+        return self.ODR_HZ[(self.regs[self.CTRL1] >> 4) & 0x07]
+
+    def _sample(self):
+        scale = self.SCALES.get((self.regs[self.CTRL4] >> 4) & 0x03, 4000)
+        out = []
+        for g in self.acceleration:
+            raw = int(round((g + self.rng.gauss(0, self.noise_g)) * 1000 * 65536 / scale))
+            out.append(max(-32768, min(32767, raw)))
+        return out
+
+    def _latch(self, sample):
+        for i in range(3):
+            v = sample[i] & 0xFFFF
+            self.regs[self.OUT_X_L + 2 * i] = v & 0xFF
+            self.regs[self.OUT_X_L + 2 * i + 1] = v >> 8
+
+    def _fifo_mode(self):
+        if not self.regs[self.CTRL3] & 0x80:
+            return 0
+        return self.regs[self.FIFO_CTRL] >> 5
+
+    def update(self):
+        odr = self._odr()
+        if odr == 0:
+            self._next_sample = None
+            return
+        period = 1000000 // odr
+        now = self.clock.now_us
+        if self._next_sample is None:
+            self._next_sample = now + period
+        mode = self._fifo_mode()
+        while now >= self._next_sample:
+            sample = self._sample()
+            if mode == 0:
+                self._latch(sample)
+            elif len(self.fifo) < 32:
+                self.fifo.append(sample)
+            else:
+                self.overrun = True
+                if mode == 2:
+                    # stream mode: the oldest sample is discarded
+                    self.fifo.pop(0)
+                    self.fifo.append(sample)
+            self._next_sample += period
+
+    def next_pointer(self, reg):
+        # with the FIFO enabled the auto-increment wraps from OUT_Z_H to OUT_X_L
+        if reg == self.OUT_Z_H and self._fifo_mode() != 0 and self.regs[self.CTRL4] & 0x04:
+            return self.OUT_X_L
+        if not self.regs[self.CTRL4] & 0x04:
+            return reg
+        return RegisterDevice.next_pointer(self, reg)
+
+    def read_reg(self, reg):
+        if reg == self.OUT_X_L and self._fifo_mode() != 0 and self.fifo:
+            self._latch(self.fifo.pop(0))
+            self.overrun = False
+        if reg == self.FIFO_SRC:
+            level = len(self.fifo)
+            watermark = self.regs[self.FIFO_CTRL] & 0x1F
+            return ((0x80 if level >= watermark and watermark else 0) | (0x40 if self.overrun else 0) |
+                    (0x20 if level == 0 else 0) | (level & 0x1F))
+        return self.regs[reg]
+
+    def write_reg(self, reg, value):
+        self.regs[reg] = value
+        if reg == self.FIFO_CTRL and value >> 5 == 0:
+            # bypass mode empties the FIFO
+            self.fifo = []
+            self.overrun = False
+
+
+class PycoprocModel(Device):
+    """ PIC coprocessor of the Pysense/Pytrack/Pyscan boards: command protocol, data
+        memory (PEEK/POKE/MAGIC), the battery ADC and the RTC calibration pulses. A
+        command keeps the PIC busy for COMMAND_US (or latency_us[command]); reads return
+        0xFF first once done """
+
+    address = 8
+
+    PRODUCT_IDS = {'pysense': 61458, 'pytrack': 61459, 'pyscan': 61240}
+
+    CMD_PEEK = 0x00
+    CMD_POKE = 0x01
+    CMD_MAGIC = 0x02
+    CMD_HW_VER = 0x10
+    CMD_FW_VER = 0x11
+    CMD_PROD_ID = 0x12
+    CMD_SETUP_SLEEP = 0x20
+    CMD_GO_SLEEP = 0x21
+    CMD_CALIBRATE = 0x22
+    CMD_RESET = 0x40
+
+    ADCON0 = 0x9D
+    ADRESL = 0x9B
+    ADRESH = 0x9C
+    PORTA = 0x00C
+    WAKE_REASON = 0x064C
+
+    COMMAND_US = 200
+    ADC_CONVERSION_US = 20
+    # nominal period of the calibration pulse (us), see Pycoproc.calibrate_rtc
+    RTC_PERIOD_US = 6836
+
+    def __init__(self, clock, board='pysense', hw_version=3, fw_version=14, battery=4.1, random=None):
+        Device.__init__(self, clock)
+        self.product_id = self.PRODUCT_IDS[board]
+        self.hw_version = hw_version
+        self.fw_version = fw_version
+        self.battery = battery
+        # standard deviation (V) of the noise of a battery conversion (needs random)
+        self.battery_noise = 0.0
+        self.random = random
+        # period of the PIC low-frequency oscillator relative to its nominal value
+        self.clock_error = 1.0
+        self.memory = bytearray(0x1000)
+        # RA3 pull-up: push button released
+        self.memory[self.PORTA] = 1 << 3
+        self.sleep_time_s = None
+        self.sleeping = False
+        self.commands = {}
+        # busy time per command byte, COMMAND_US for the others
+        self.latency_us = {}
+        self._busy_until = 0
+        self._adc_done = None
+        self._result = b''
+
+    def _word(self, value):
+        return bytes([value & 0xFF, (value >> 8) & 0xFF])
+
+    def _adc(self):
+        volts = self.battery
+        if self.battery_noise and self.random is not None:
+            volts += self.random.gauss(0, self.battery_noise)
+        adc = int(round((volts - 0.01) * 180 * 1023 / (3.3 * 280)))
+        adc = max(0, min(1023, adc))
+        self.memory[self.ADRESH] = adc >> 2
+        self.memory[self.ADRESL] = (adc & 0x03) << 6
+
+    def _update(self):
+        if self._adc_done is not None and self.clock.now_us >= self._adc_done:
+            self._adc()
+            self.memory[self.ADCON0] &= ~0x02 & 0xFF
+            self._adc_done = None
+
+    def write(self, data):
+        self._update()
+        cmd = data[0]
+        self.commands[cmd] = self.commands.get(cmd, 0) + 1
+        self._busy_until = self.clock.now_us + self.latency_us.get(cmd, self.COMMAND_US)
+        addr = (data[1] | (data[2] << 8)) if len(data) >= 3 else 0
+        if cmd == self.CMD_HW_VER:
+            self._result = self._word(self.hw_version)
+        elif cmd == self.CMD_FW_VER:
+            self._result = self._word(self.fw_version)
+        elif cmd == self.CMD_PROD_ID:
+            self._result = self._word(self.product_id)
+        elif cmd == self.CMD_PEEK:
+            self._result = bytes([self.memory[addr]])
+        elif cmd == self.CMD_POKE:
+            self.memory[addr] = data[3]
+            self._result = b''
+        elif cmd == self.CMD_MAGIC:
+            value = ((self.memory[addr] & data[3]) | data[4]) ^ data[5]
+            self.memory[addr] = value
+            if addr == self.ADCON0 and value & 0x02:
+                # GO/nDONE starts a battery conversion
+                self._adc_done = self.clock.now_us + self.COMMAND_US + self.ADC_CONVERSION_US
+            self._result = bytes([value])
+        elif cmd == self.CMD_SETUP_SLEEP:
+            self.sleep_time_s = data[1] | (data[2] << 8) | (data[3] << 16)
+        elif cmd == self.CMD_GO_SLEEP:
+            self.sleeping = True
+        else:
+            self._result = b''
+
+    def read(self, nbytes):
+        self._update()
+        status = 0xFF if self.clock.now_us >= self._busy_until else 0x00
+        return (bytes([status]) + self._result + bytes(nbytes))[:nbytes]
+
+    def sleep_us(self):
+        """ duration of the sleep programmed with CMD_SETUP_SLEEP, in counts of the low-frequency
+            oscillator (so longer or shorter than nominal with clock_error) """
+        return int((self.sleep_time_s or 0) * self.clock_error * 1000000)
+
+    def wake(self):
+        """ end of the sleep on its timer """
+        if self.sleeping:
+            self.sleeping = False
+            self.memory[self.WAKE_REASON] = 4
+            self.memory[self.WAKE_REASON + 1:self.WAKE_REASON + 4] = bytes(3)
+
+    def pulses(self, count=100):
+        """ (level, time us) pairs as returned by pycom.pulses_get() after CMD_CALIBRATE """
+        period = int(round(self.RTC_PERIOD_US * self.clock_error))
+        return [(1, 500), (0, 500 + period)][:count]
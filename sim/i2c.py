@@ -0,0 +1,156 @@
+"""Simulated I2C bus with per-transaction timing.
+
+Device models attach to a Bus by address. Every transaction advances the
+virtual clock by the time it takes on the wire (9 bits per byte including
+the address bytes, start/stop conditions and a fixed driver overhead) and is
+accounted per device address: transactions, bytes, bus time and NACKs.
+"""
+
+ENODEV = 19
+
+
+class Stats:
+
+    def __init__(self):
+        self.transactions = 0
+        self.bytes = 0
+        self.time_us = 0
+        self.nacks = 0
+
+    def as_dict(self):
+        return {'transactions': self.transactions, 'bytes': self.bytes,
+                'time_us': self.time_us, 'nacks': self.nacks}
+
+
+class Bus:
+
+    def __init__(self, clock, baudrate=100000, overhead_us=50):
+        self.clock = clock
+        self.baudrate = baudrate
+        self.overhead_us = overhead_us
+        self.devices = {}
+        self.stats = {}
+        # list of (start time us, address, operation, bytes, duration us) when not None
+        self.trace = None
+
+    def attach(self, device):
+        self.devices[device.address] = device
+        device.bus = self
+        return device
+
+    def reset_stats(self):
+        self.stats = {}
+
+    def totals(self):
+        total = Stats()
+        for s in self.stats.values():
+            total.transactions += s.transactions
+            total.bytes += s.bytes
+            total.time_us += s.time_us
+            total.nacks += s.nacks
+        return total
+
+    def _account(self, addr, op, nbytes, nack=False):
+        # start + bytes (9 bits each, with ACK) + stop, repeated start counted as a byte
+        duration = self.overhead_us + ((nbytes * 9 + 2) * 1000000) // self.baudrate
+        if self.trace is not None:
+            self.trace.append((self.clock.now_us, addr, op, nbytes, duration))
+        self.clock.advance_us(duration)
+        s = self.stats.get(addr)
+        if s is None:
+            s = self.stats[addr] = Stats()
+        s.transactions += 1
+        s.bytes += nbytes
+        s.time_us += duration
+        if nack:
+            s.nacks += 1
+
+    def _device(self, addr, op):
+        dev = self.devices.get(addr)
+        if dev is None or not dev.ack():
+            # only the address byte goes on the wire
+            self._account(addr, op, 1, nack=True)
+            raise OSError(ENODEV)
+        return dev
+
+    def writeto(self, addr, data):
+        data = bytes(data)
+        dev = self._device(addr, 'write')
+        self._account(addr, 'write', 1 + len(data))
+        dev.write(data)
+        return len(data)
+
+    def readfrom(self, addr, nbytes):
+        dev = self._device(addr, 'read')
+        self._account(addr, 'read', 1 + nbytes)
+        return bytes(dev.read(nbytes))
+
+    def writeto_mem(self, addr, memaddr, data):
+        if isinstance(data, int):
+            data = bytes([data])
+        data = bytes(data)
+        dev = self._device(addr, 'write_mem')
+        self._account(addr, 'write_mem', 2 + len(data))
+        dev.write(bytes([memaddr]) + data)
+
+    def readfrom_mem(self, addr, memaddr, nbytes):
+        dev = self._device(addr, 'read_mem')
+        self._account(addr, 'read_mem', 3 + nbytes)
+        dev.write(bytes([memaddr]))
+        return bytes(dev.read(nbytes))
+
+
+class Device:
+    """ base device model, NACKs when ack() returns False """
+
+    address = None
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.bus = None
+
+    def ack(self):
+        return True
+
+    def write(self, data):
+        pass
+
+    def read(self, nbytes):
+        return bytes(nbytes)
+
+
+class RegisterDevice(Device):
+    """ device with a register pointer set by the first written byte and auto-increment """
+
+    def __init__(self, clock, size=256):
+        Device.__init__(self, clock)
+        self.regs = bytearray(size)
+        self.pointer = 0
+
+    def update(self):
+        """ brings the model up to the current time (conversions finishing, etc.) """
+        pass
+
+    def next_pointer(self, reg):
+        return (reg + 1) % len(self.regs)
+
+    def write(self, data):
+        self.update()
+        self.pointer = data[0]
+        for b in data[1:]:
+            self.write_reg(self.pointer, b)
+            self.pointer = self.next_pointer(self.pointer)
+
+    def read(self, nbytes):
+        self.update()
+        out = bytearray(nbytes)
+        for i in range(nbytes):
+            out[i] = self.read_reg(self.pointer)
+            self.pointer = self.next_pointer(self.pointer)
+        return out
+
+    def read_reg(self, reg):
+        return self.regs[reg]
+
+    def write_reg(self, reg, value):
+        self.regs[reg] = value
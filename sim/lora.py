@@ -0,0 +1,125 @@
+"""Fake LoRaWAN socket for the host-side simulation.
+
+An uplink keeps the radio busy for its time on air (lib/airtime.py) plus the
+receive windows: a blocking send() advances the virtual clock until then, a
+non-blocking send() raises OSError(EAGAIN) while the radio is busy, like the
+Pycom LoRa stack. Downlinks queued with downlink() are returned by
+recv()/recvfrom() once their time has come.
+
+    sock = LoRaSocket(world.clock, dr=5)
+    sock.downlink(b'\\x01', port=2, at_s=30.0)
+"""
+
+import types
+
+import sim
+
+EAGAIN = 11
+
+AF_LORA = 160
+SOL_LORA = 0x10000
+SO_CONFIRMED = 1
+SO_DR = 2
+
+# RX1 opens 1 s and RX2 2 s after the end of the uplink
+RX_WINDOWS_S = 2.0
+
+
+class LoRaSocket:
+
+    def __init__(self, clock, dr=5, rx_windows_s=RX_WINDOWS_S):
+        self.clock = clock
+        self.airtime = sim.load('airtime')
+        self.dr = dr
+        self.rx_windows_s = rx_windows_s
+        self.blocking = True
+        self.confirmed = False
+        self.port = 2
+        self.busy_until_us = 0
+        # (time us, payload, data rate, time on air s) of every uplink
+        self.uplinks = []
+        self.airtime_s = 0.0
+        self.busy_errors = 0
+        self._downlinks = []
+
+    def setblocking(self, flag):
+        self.blocking = bool(flag)
+
+    def settimeout(self, value):
+        self.blocking = value is None or value > 0
+
+    def setsockopt(self, level, option, value):
+        if option == SO_DR:
+            self.dr = value
+        elif option == SO_CONFIRMED:
+            self.confirmed = bool(value)
+
+    def bind(self, port):
+        self.port = port
+
+    def busy(self):
+        return self.clock.now_us < self.busy_until_us
+
+    def send(self, data):
+        data = bytes(data, 'utf-8') if isinstance(data, str) else bytes(data)
+        if self.busy():
+            if not self.blocking:
+                self.busy_errors += 1
+                raise OSError(EAGAIN)
+            self.clock.advance_us(self.busy_until_us - self.clock.now_us)
+        toa = self.airtime.uplink_time_on_air(len(data), self.dr)
+        if sim.world.lora is not None:
+            sim.world.lora._uplink()
+        self.uplinks.append((self.clock.now_us, data, self.dr, toa))
+        self.airtime_s += toa
+        self.busy_until_us = self.clock.now_us + int((toa + self.rx_windows_s) * 1000000)
+        if self.blocking:
+            self.clock.advance_us(self.busy_until_us - self.clock.now_us)
+        return len(data)
+
+    def downlink(self, data, port=1, at_s=None):
+        """ queues a downlink, available from at_s seconds of virtual time (now by default) """
+        at_us = self.clock.now_us if at_s is None else int(at_s * 1000000)
+        self._downlinks.append((at_us, bytes(data), port))
+        self._downlinks.sort(key=lambda d: d[0])
+
+    def recvfrom(self, bufsize):
+        if self._downlinks and self._downlinks[0][0] <= self.clock.now_us:
+            _, data, port = self._downlinks.pop(0)
+            return (data[:bufsize], port)
+        if self.blocking and self._downlinks:
+            self.clock.advance_us(self._downlinks[0][0] - self.clock.now_us)
+            return self.recvfrom(bufsize)
+        return (b'', None)
+
+    def recv(self, bufsize):
+        return self.recvfrom(bufsize)[0]
+
+
+def socket_module():
+    """ stand-in for the Pycom ``socket`` module: the host socket module plus AF_LORA
+        sockets, which are LoRaSocket objects on the world clock """
+    import socket as host
+
+    module = types.ModuleType('socket')
+    module.__dict__.update((k, v) for k, v in vars(host).items() if not k.startswith('__'))
+    module.AF_LORA = AF_LORA
+    module.SOCK_RAW = host.SOCK_RAW
+    module.SOL_LORA = SOL_LORA
+    module.SO_CONFIRMED = SO_CONFIRMED
+    module.SO_DR = SO_DR
+
+    def socket(family=host.AF_INET, type=host.SOCK_STREAM, proto=0):
+        if family != AF_LORA:
+            return host.socket(family, type, proto)
+        sock = LoRaSocket(sim.world.clock)
+        previous = sim.world.lora_socket
+        if previous is not None:
+            # socket of a previous boot: one history of uplinks for the whole simulation
+            sock.uplinks = previous.uplinks
+            sock.airtime_s = previous.airtime_s
+        sim.world.lora_socket = sock
+        return sock
+
+    module.socket = socket
+    return module
@@ -0,0 +1,139 @@
+"""Stand-in for the Pycom ``machine`` module, backed by the simulated world."""
+
+import calendar
+import time
+
+import sim
+from sim.clock import DeepSleep
+
+
+class I2C:
+    MASTER = 0
+    SLAVE = 1
+
+    def __init__(self, bus=0, mode=MASTER, pins=None, baudrate=100000):
+        self._bus = sim.world.bus
+        self._enabled = False
+        self.init(mode, baudrate=baudrate, pins=pins)
+
+    def init(self, mode=MASTER, baudrate=100000, pins=None):
+        self._bus.baudrate = baudrate
+        self._enabled = True
+
+    def deinit(self):
+        self._enabled = False
+
+    def _check(self):
+        if not self._enabled:
+            raise OSError("I2C bus not initialized")
+
+    def scan(self):
+        self._check()
+        return sorted(self._bus.devices)
+
+    def writeto(self, addr, buf, stop=True):
+        self._check()
+        return self._bus.writeto(addr, buf)
+
+    def readfrom(self, addr, nbytes, stop=True):
+        self._check()
+        return self._bus.readfrom(addr, nbytes)
+
+    def readfrom_into(self, addr, buf, stop=True):
+        self._check()
+        buf[:] = self._bus.readfrom(addr, len(buf))
+
+    def writeto_mem(self, addr, memaddr, buf, addrsize=8):
+        self._check()
+        self._bus.writeto_mem(addr, memaddr, buf)
+
+    def readfrom_mem(self, addr, memaddr, nbytes, addrsize=8):
+        self._check()
+        return self._bus.readfrom_mem(addr, memaddr, nbytes)
+
+    def readfrom_mem_into(self, addr, memaddr, buf, addrsize=8):
+        self._check()
+        buf[:] = self._bus.readfrom_mem(addr, memaddr, len(buf))
+
+
+class Pin:
+    IN = 1
+    OUT = 2
+    OPEN_DRAIN = 3
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 1
+    IRQ_RISING = 2
+
+    def __init__(self, id, mode=IN, pull=None, value=None):
+        self.id = id
+        self.mode = mode
+        self._value = 0 if value is None else value
+        self._handler = None
+        pic = sim.world.pic
+        if id == 'P3' and mode == Pin.OUT and value == 0 and pic is not None and pic.sleeping:
+            # RUN pin low after Pycoproc.go_to_sleep(): the PIC cuts the power of the module
+            raise DeepSleep(pic.sleep_us(), 'pic')
+
+    def __call__(self, value=None):
+        return self.value(value)
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._value = value
+
+    def callback(self, trigger, handler=None, arg=None):
+        self._handler = handler
+
+
+class RTC:
+    """ real-time clock on the virtual clock: clock.epoch is the RTC time (s) at virtual time 0 """
+
+    def __init__(self, id=0, datetime=None):
+        self._clock = sim.world.clock
+        if datetime is not None:
+            self.init(datetime)
+
+    def init(self, datetime):
+        datetime = tuple(datetime) + (0,) * (8 - len(datetime))
+        seconds = calendar.timegm(datetime[:6] + (0, 0, 0))
+        self._clock.epoch = seconds - self._clock.now_us // 1000000
+        self._clock.epoch_us = datetime[6] - self._clock.now_us % 1000000
+
+    def now(self):
+        us = self._clock.rtc_us()
+        t = time.gmtime(us // 1000000)
+        return (t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec, us % 1000000, None)
+
+    def synced(self):
+        return True
+
+
+PWRON_RESET = 0
+HARD_RESET = 1
+WDT_RESET = 2
+DEEPSLEEP_RESET = 3
+SOFT_RESET = 4
+BROWN_OUT_RESET = 5
+
+
+def reset_cause():
+    return DEEPSLEEP_RESET if sim.world.reset_cause == 'deepsleep' else PWRON_RESET
+
+
+def deepsleep(time_ms=None):
+    # without a time, only an external wake-up (not simulated) ends it
+    raise DeepSleep(365 * 86400 * 1000000 if time_ms is None else time_ms * 1000, 'esp32')
+
+
+def unique_id():
+    return sim.world.unique_id
+
+
+def idle():
+    pass
+
+
+def freq():
+    return 160000000
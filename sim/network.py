@@ -0,0 +1,136 @@
+"""Stand-in for the Pycom ``network`` module: LoRa (LoRaWAN stack state) and WLAN.
+
+The network server side of the session is kept in the world: the uplink
+frame counter it expects (an uplink with a lower one, e.g. after a reset
+that lost the session, is rejected) and the number of joins.
+"""
+
+import sim
+
+# OTAA join: join request, join accept in RX1/RX2
+JOIN_TIME_S = 6.0
+
+
+class LoRa:
+    LORA = 0
+    LORAWAN = 1
+
+    AS923 = 0
+    AU915 = 1
+    EU868 = 5
+    US915 = 8
+
+    CLASS_A = 0
+    CLASS_C = 2
+
+    OTAA = 0
+    ABP = 1
+
+    RX_PACKET_EVENT = 1
+    TX_PACKET_EVENT = 2
+    TX_FAILED_EVENT = 4
+
+    def __init__(self, mode=LORAWAN, region=EU868, public=True, tx_retries=2, device_class=CLASS_A, adr=False, **kwargs):
+        self._clock = sim.world.clock
+        self.mode = mode
+        self.region = region
+        self.device_class = device_class
+        self.adr = adr
+        self.activation = None
+        self.auth = None
+        self._joined_at_us = None
+        self._handler = None
+        self._trigger = 0
+        # uplink frame counter of the session
+        self.fcnt = 0
+        sim.world.lora = self
+
+    def mac(self):
+        return sim.world.dev_eui
+
+    def join(self, activation, auth, timeout=None, dr=None):
+        self.activation = activation
+        self.auth = auth
+        self.fcnt = 0
+        delay = 0
+        if activation == LoRa.OTAA:
+            # new session on the network server
+            delay = int(JOIN_TIME_S * 1000000)
+            sim.world.joins += 1
+            sim.world.server_fcnt = -1
+        self._joined_at_us = self._clock.now_us + delay
+
+    def _uplink(self):
+        """ frame counter check of the network server, False if the uplink is rejected """
+        fcnt = self.fcnt
+        self.fcnt += 1
+        if fcnt <= sim.world.server_fcnt:
+            sim.world.rejected += 1
+            return False
+        sim.world.server_fcnt = fcnt
+        return True
+
+    def has_joined(self):
+        return self._joined_at_us is not None and self._clock.now_us >= self._joined_at_us
+
+    def nvram_save(self):
+        sim.world.nvram['lora'] = {'activation': self.activation, 'auth': self.auth, 'joined': self.has_joined(),
+                                   'fcnt': self.fcnt}
+
+    def nvram_restore(self):
+        state = sim.world.nvram.get('lora')
+        if state is None:
+            return
+        self.activation = state['activation']
+        self.auth = state['auth']
+        self.fcnt = state['fcnt']
+        if state['joined']:
+            self._joined_at_us = self._clock.now_us
+
+    def nvram_erase(self):
+        sim.world.nvram.pop('lora', None)
+
+    def callback(self, trigger, handler=None, arg=None):
+        self._trigger = trigger
+        self._handler = handler
+
+    def events(self):
+        return 0
+
+    def stats(self):
+        sock = sim.world.lora_socket
+        return Stats(sock)
+
+
+class Stats:
+    """ the fields of LoRa.stats() the simulation can provide """
+
+    def __init__(self, sock):
+        last = sock.uplinks[-1] if sock is not None and sock.uplinks else None
+        self.rx_timestamp = 0
+        self.rssi = 0
+        self.snr = 0.0
+        self.sftx = None if last is None else 12 - last[2]
+        self.tx_trials = 1
+        self.tx_power = 14
+        self.tx_time_on_air = 0 if last is None else int(last[3] * 1000)
+        self.tx_counter = 0 if sock is None else len(sock.uplinks)
+        self.tx_frequency = 868100000
+
+
+class WLAN:
+    STA = 1
+    AP = 2
+
+    def __init__(self, mode=None, **kwargs):
+        self.mode = mode
+
+    def mac(self):
+        base = sim.world.unique_id
+        return (base, base[:5] + bytes([(base[5] + 1) & 0xFF]))
+
+    def isconnected(self):
+        return False
+
+    def deinit(self):
+        pass
@@ -0,0 +1,94 @@
+"""Runs main.py unmodified on the simulated node and reports what it did.
+
+    python -m sim.node --duration 600 --set bTakeMeasurements=True --set debug=1
+
+Prints the output of main.py followed by a summary: boots, uplinks and time
+on air from the fake LoRa socket (with the joins and the uplinks rejected by
+the network server), time spent sleeping and powered down, an estimate of
+the charge used, and the I2C transactions, bytes, bus time and NACKs of
+every device (and the instrumentation statistics when main.py enables
+them).
+"""
+
+import argparse
+import ast
+import sys
+
+import sim
+
+DEVICE_NAMES = {8: 'Pycoproc', 0x29: 'LTR329ALS01', 0x60: 'MPL3115A2', 0x40: 'SI7006A20', 30: 'LIS2HH12'}
+
+# Supply current (mA) of a LoPy4 on a Pysense: awake (Wi-Fi off), extra while
+# transmitting at 14 dBm, and powered down by the PIC or in ESP32 deep sleep
+AWAKE_MA = 40.0
+TX_EXTRA_MA = 80.0
+DEEP_SLEEP_MA = 0.02
+
+
+def _param(text):
+    name, _, value = text.partition('=')
+    try:
+        value = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        pass
+    return name, value
+
+
+def simulate(duration_s=600, board='pysense', params=None, seed=0):
+    """ runs main.py for duration_s seconds of virtual time, returns the world """
+    world = sim.install(seed=seed)
+    world.attach_board(board)
+    world.clock.deadline_us = int(duration_s * 1000000)
+    world.scope = sim.run_main(params=params)
+    return world
+
+
+def charge_mah(world):
+    """ estimate of the charge used (mAh), from the time awake, on air and powered down """
+    clock = world.clock
+    airtime_s = world.lora_socket.airtime_s if world.lora_socket is not None else 0.0
+    awake_s = (clock.now_us - clock.deep_slept_us) / 1000000
+    return (awake_s * AWAKE_MA + airtime_s * TX_EXTRA_MA + clock.deep_slept_us / 1000000 * DEEP_SLEEP_MA) / 3600
+
+
+def summary(world):
+    clock = world.clock
+    sock = world.lora_socket
+    lines = ['--- simulated {:.1f} s, {:.1f} s sleeping, {:.1f} s powered down, {:d} boots ---'.format(
+        clock.now_us / 1000000, clock.slept_us / 1000000, clock.deep_slept_us / 1000000, world.boots)]
+    if sock is not None:
+        uplinks = len(sock.uplinks)
+        lines.append('LoRa: {:d} uplinks, {:d} bytes, {:.3f} s on air, {:d} joins, {:d} rejected'.format(
+            uplinks, sum(len(u[1]) for u in sock.uplinks), sock.airtime_s, world.joins, world.rejected))
+        charge = charge_mah(world)
+        lines.append('Charge: {:.4f} mAh, {:.2f} uAh per uplink'.format(charge, charge * 1000 / uplinks if uplinks else 0))
+    instrument = sys.modules.get('instrument')
+    if instrument is not None and instrument.enabled:
+        instrument.dump(lines.append)
+    lines.append('{:<12} {:>12} {:>8} {:>12} {:>6}'.format('I2C device', 'transactions', 'bytes', 'bus time ms', 'NACKs'))
+    for addr in sorted(world.bus.stats):
+        s = world.bus.stats[addr]
+        lines.append('{:<12} {:>12d} {:>8d} {:>12.1f} {:>6d}'.format(
+            DEVICE_NAMES.get(addr, hex(addr)), s.transactions, s.bytes, s.time_us / 1000, s.nacks))
+    total = world.bus.totals()
+    lines.append('{:<12} {:>12d} {:>8d} {:>12.1f} {:>6d}'.format(
+        'total', total.transactions, total.bytes, total.time_us / 1000, total.nacks))
+    return '\n'.join(lines)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python -m sim.node', description='Run main.py on a simulated node')
+    parser.add_argument('--duration', type=float, default=600, help='virtual seconds to run (default 600)')
+    parser.add_argument('--board', default='pysense', choices=('pysense', 'pytrack', 'pyscan', 'none'))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                        help='overrides a top-level parameter of main.py, e.g. bTakeMeasurements=True')
+    args = parser.parse_args(argv[1:])
+    params = dict(_param(p) for p in args.set)
+    board = None if args.board == 'none' else args.board
+    world = simulate(args.duration, board, params, args.seed)
+    print(summary(world))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
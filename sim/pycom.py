@@ -0,0 +1,57 @@
+"""Stand-in for the Pycom ``pycom`` module: LED, non-volatile storage and pulses."""
+
+import sim
+
+_led = {'heartbeat': True, 'rgb': 0}
+
+
+def heartbeat(enable=None):
+    if enable is None:
+        return _led['heartbeat']
+    _led['heartbeat'] = bool(enable)
+
+
+def rgbled(color):
+    _led['rgb'] = color
+
+
+def nvs_set(key, value):
+    # the NVS of the device holds uint32 values
+    value = int(value)
+    if not 0 <= value <= 0xFFFFFFFF:
+        raise ValueError("NVS value out of uint32 range: {}".format(value))
+    sim.world.nvs[key] = value
+
+
+def nvs_get(key, default=None):
+    value = sim.world.nvs.get(key, default)
+    if value is None:
+        raise ValueError("No such key")
+    return value
+
+
+def nvs_erase(key):
+    if key not in sim.world.nvs:
+        raise KeyError(key)
+    del sim.world.nvs[key]
+
+
+def nvs_erase_all():
+    sim.world.nvs.clear()
+
+
+def pulses_get(pin, timeout):
+    """ the pulses of the PIC calibration; takes their duration and then timeout ms
+        without a transition """
+    pic = sim.world.bus.devices.get(8)
+    pulses = pic.pulses() if pin == 'P21' and pic is not None else []
+    sim.world.clock.advance_us(sum(us for _, us in pulses) + timeout * 1000)
+    return pulses
+
+
+def wifi_on_boot(enable=None):
+    return False
+
+
+def lte_modem_en_on_boot(enable=None):
+    return False
@@ -0,0 +1,3 @@
+"""Stand-in for the MicroPython ``ubinascii`` module."""
+
+from binascii import a2b_base64, b2a_base64, crc32, hexlify, unhexlify
@@ -0,0 +1,114 @@
+"""lib/airtime.py on the host: time on air and the duty-cycle scheduler on an injected clock.
+
+    python -m pytest -q tests
+"""
+
+import pytest
+
+import sim
+
+
+class Clock:
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def airtime():
+    sim.install()
+    return sim.load('airtime')
+
+
+@pytest.mark.parametrize('payload_len, sf, bw, ms', [
+    # Semtech LoRa calculator (CR 4/5, 8 symbols of preamble, explicit header, CRC)
+    (13, 7, 125000, 46.336),
+    (24, 7, 125000, 61.696),
+    (13, 9, 125000, 164.864),
+    # low data rate optimization from SF11 at 125 kHz
+    (13, 12, 125000, 1155.072),
+    (64, 12, 125000, 2793.472),
+    (13, 7, 250000, 23.168),
+])
+def test_time_on_air(airtime, payload_len, sf, bw, ms):
+    assert airtime.time_on_air(payload_len, sf, bw) * 1000 == pytest.approx(ms, abs=1e-6)
+
+
+def test_uplink_time_on_air(airtime):
+    # 13 bytes of LoRaWAN overhead: the 51 bytes allowed at DR0 take 2.8 s
+    assert airtime.uplink_time_on_air(51, 0) == airtime.time_on_air(64, 12)
+    assert airtime.uplink_time_on_air(11, 5) == airtime.time_on_air(24, 7)
+
+
+def test_sliding_window_edges(airtime):
+    clock = Clock()
+    scheduler = airtime.DutyCycleScheduler(clock=clock)
+    # 1 % of 3600 s in the default sub-band
+    assert scheduler.budget() == 36.0
+    scheduler.record(30.0)
+    clock.now = 100.0
+    scheduler.record(5.0)
+    assert scheduler.used() == 35.0
+    assert scheduler.delay(1.0) == 0
+    # over the budget until the first uplink leaves the window
+    clock.now = 200.0
+    assert scheduler.earliest(2.0) == 3600.0
+    assert scheduler.delay(2.0) == 3400.0
+    clock.now = 3599.999
+    assert scheduler.delay(2.0) == pytest.approx(0.001)
+    clock.now = 3600.0
+    assert scheduler.delay(2.0) == 0
+    assert scheduler.used() == 5.0
+    # both have to leave the window for a full budget
+    assert scheduler.earliest(36.0) == 3700.0
+    assert scheduler.earliest(1.0, not_before=3650.0) == 3650.0
+    with pytest.raises(ValueError):
+        scheduler.delay(36.5)
+
+
+def test_subbands(airtime):
+    clock = Clock()
+    scheduler = airtime.DutyCycleScheduler(clock=clock)
+    scheduler.record(36.0)
+    # another sub-band has a budget of its own
+    assert scheduler.delay(3.0, 863500000) == 0
+    assert scheduler.budget(869500000) == 360.0
+    with pytest.raises(ValueError):
+        scheduler.subband(870500000)
+
+
+def test_float_residue(airtime):
+    # the airtime released one entry at a time does not come back to exactly 0
+    clock = Clock()
+    scheduler = airtime.DutyCycleScheduler(clock=clock)
+    for i, toa in enumerate((8.083, 6.114, 6.223, 8.272, 9.77)):
+        scheduler.record(toa, start=float(i))
+    clock.now = 10.0
+    assert scheduler.earliest(36.0) == 3604.0
+
+
+def test_checkpoint_round_trip(airtime):
+    clock = Clock(1000.0)
+    scheduler = airtime.DutyCycleScheduler(clock=clock)
+    for start, toa in ((1000.0, 2.0), (1500.0, 3.0), (2900.0, 4.0)):
+        clock.now = start
+        scheduler.record(toa)
+    clock.now = 3000.0
+    current, used = scheduler.checkpoint(8)
+    # slices of 450 s: 3000 s is in slice 6, the uplinks in slices 2, 3 and 6
+    assert current == 6
+    assert used == {2: [4.0, 0.0, 0.0, 3.0, 2.0, 0.0, 0.0, 0.0]}
+    restored = airtime.DutyCycleScheduler(clock=clock)
+    restored.restore(current, used)
+    assert restored.used() == 9.0
+    assert restored.checkpoint(8) == (current, used)
+    # released at the end of its slice (1350 s) at the latest, never earlier than the original
+    clock.now = 4650.0
+    assert scheduler.used() == 7.0
+    assert restored.used() == 9.0
+    clock.now = 4950.0
+    assert scheduler.used() == 7.0
+    assert restored.used() == 7.0
@@ -0,0 +1,77 @@
+"""deepsleep.Checkpoint saved to and loaded from the simulated NVS.
+
+    python -m pytest -q tests
+"""
+
+import sys
+
+import pytest
+
+import sim
+
+
+@pytest.fixture
+def world():
+    return sim.install()
+
+
+def _save(world, counter=41):
+    deepsleep = sim.load('deepsleep')
+    airtime = sim.load('airtime')
+    schedule = sim.load('schedule')
+    checkpoint = deepsleep.Checkpoint()
+    scheduler = airtime.DutyCycleScheduler(clock=checkpoint.clock)
+    scheduler.record(1.5)
+    periodic = schedule.Periodic(30000)
+    world.clock.sleep_ms(12000)
+    checkpoint.save(counter, periodic, scheduler, counter + 3)
+    return deepsleep, scheduler
+
+
+def test_round_trip(world):
+    deepsleep, scheduler = _save(world)
+    checkpoint = deepsleep.Checkpoint()
+    assert checkpoint.load(60000)
+    assert (checkpoint.counter, checkpoint.sent) == (41, 44)
+    # 12 s before the save and 60 s slept, plus ticks_ms (the count since the boot,
+    # which the simulation did not reset)
+    assert checkpoint.now_ms() == 72000 + world.time.ticks_ms()
+    restored = sim.load('airtime').DutyCycleScheduler(clock=checkpoint.clock)
+    checkpoint.restore(restored)
+    assert restored.checkpoint(deepsleep.SLICES)[1] == scheduler.checkpoint(deepsleep.SLICES)[1]
+
+
+def test_missing_key(world):
+    deepsleep, _ = _save(world)
+    # power lost in the middle of a save
+    del world.nvs['ds_time_ms']
+    checkpoint = deepsleep.Checkpoint()
+    assert not checkpoint.load(60000)
+    assert (checkpoint.counter, checkpoint.restored) == (0, False)
+    del world.nvs['ds_counter']
+    assert not checkpoint.load(60000)
+
+
+def test_missing_airtime(world):
+    deepsleep, _ = _save(world)
+    del world.nvs[[key for key in world.nvs if key.startswith('ds_air')][0]]
+    assert not deepsleep.Checkpoint().load(60000)
+
+
+def test_counter_written_last(world):
+    deepsleep, _ = _save(world)
+    pycom = sys.modules['pycom']
+    nvs_set = pycom.nvs_set
+    present = []
+
+    def record(key, value):
+        present.append('ds_counter' in world.nvs)
+        nvs_set(key, value)
+    pycom.nvs_set = record
+    try:
+        _save(world, 42)
+    finally:
+        pycom.nvs_set = nvs_set
+    # no counter while the other keys are written, the counter is the last one
+    assert not any(present)
+    assert world.nvs['ds_counter'] == 42
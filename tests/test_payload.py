@@ -0,0 +1,117 @@
+"""Round trips of lib/payload.py and lib/batch.py on the host.
+
+    python -m pytest -q tests
+"""
+
+import pytest
+
+import sim
+
+
+@pytest.fixture
+def payload():
+    sim.install()
+    return sim.load('payload')
+
+
+@pytest.fixture
+def batch():
+    sim.install()
+    return sim.load('batch')
+
+
+def test_round_trip(payload):
+    data = payload.encode(payload.SCHEMA_PYSENSE, (123.45, 21.3, 45.67, 94210.25))
+    assert len(data) == payload.size(payload.SCHEMA_PYSENSE) == 11
+    schema_id, values = payload.decode(data)
+    assert schema_id == payload.SCHEMA_PYSENSE
+    assert values == {'lux': 123.45, 'temperature': 21.3, 'humidity': 45.67, 'pressure': 94210.25}
+
+
+def test_negative_and_rounding(payload):
+    _, values = payload.decode(payload.encode(payload.SCHEMA_PYSENSE, (0.004, -12.336, 0.006, 0.1)))
+    assert values['lux'] == 0
+    assert values['temperature'] == -12.34
+    assert values['humidity'] == 0.01
+    assert values['pressure'] == 0
+
+
+def test_saturation(payload):
+    # the maximum raw value is reserved for a missing reading: readings stop one step below
+    _, values = payload.decode(payload.encode(payload.SCHEMA_PYSENSE, (1e9, 1000, -5, 1e9)))
+    assert values['lux'] == (0xFFFFFF - 1) / 100
+    assert values['temperature'] == 0x7FFE / 100
+    assert values['humidity'] == 0
+    assert values['pressure'] == (0xFFFFFF - 1) / 4
+    _, values = payload.decode(payload.encode(payload.SCHEMA_PYSENSE, (0, -1000, 1e9, 0)))
+    assert values['temperature'] == -0x8000 / 100
+    assert values['humidity'] == 0xFFFE / 100
+
+
+def test_missing(payload):
+    data = payload.encode(payload.SCHEMA_PYSENSE_BATTERY, (None, 21.3, None, 94210.25, None))
+    assert len(data) == 12
+    _, values = payload.decode(data)
+    assert values == {'lux': None, 'temperature': 21.3, 'humidity': None, 'pressure': 94210.25, 'battery': None}
+    # the raw value on the wire
+    assert data[1:4] == b'\xff\xff\xff'
+    assert data[6:8] == b'\xff\xff'
+
+
+def test_u24_packing(payload):
+    buf = bytearray(4)
+    assert payload.pack_raw(buf, 1, 'u24', 0x123456) == 4
+    assert buf == b'\x00\x12\x34\x56'
+    assert payload.unpack_raw(buf, 1, 'u24') == (0x123456, 4)
+
+
+def test_size_checks(payload):
+    with pytest.raises(payload.PayloadError):
+        payload.encode(payload.SCHEMA_PYSENSE, (1, 2, 3))
+    data = payload.encode(payload.SCHEMA_LIGHT, (10,))
+    with pytest.raises(payload.PayloadError):
+        payload.decode(data + b'\x00')
+    with pytest.raises(payload.PayloadError):
+        payload.decode(data[:-1])
+    with pytest.raises(payload.PayloadError):
+        payload.decode(b'')
+    with pytest.raises(payload.PayloadError):
+        payload.decode(b'\x55\x00')
+
+
+def test_batch_round_trip(payload, batch):
+    samples = [(100 + i, 20 + i * 0.25, 50 - i, 94000 + i * 8) for i in range(4)]
+    samples[2] = (None, 20.5, None, 94016)
+    now = [1000.0]
+    b = batch.Batcher(payload.SCHEMA_PYSENSE, max_samples=4, clock=lambda: now[0])
+    frames = []
+    for s in samples:
+        frames.append(b.add(s))
+        now[0] += 30.4
+    assert frames[:3] == [None, None, None]
+    schema_id, decoded = batch.decode(frames[3])
+    assert schema_id == payload.SCHEMA_PYSENSE
+    assert [(d['lux'], d['temperature'], d['humidity'], d['pressure']) for d in decoded] == samples
+    # rounded from the first sample: 30.4 s steps do not lose a second every 3 samples
+    assert [d['t'] for d in decoded] == [0, 30, 61, 91]
+
+
+def test_batch_times(payload, batch):
+    now = [0.0]
+    b = batch.Batcher(payload.SCHEMA_LIGHT, max_samples=8, max_bytes=12, clock=lambda: now[0])
+    frames = []
+    for t in (0, 200, 150, 400, 650):
+        now[0] = t
+        frames.append(b.add((10,)))
+    # 2 + 3 bytes, then a byte for the lux and one or two (above 127 s) for the time:
+    # the fourth sample does not fit in 12 bytes
+    assert frames == [None, None, None, frames[3], None]
+    assert len(frames[3]) == 10
+    _, decoded = batch.decode(frames[3])
+    # a clock that went back does not make a negative time
+    assert [d['t'] for d in decoded] == [0, 200, 200]
+    # the sample that did not fit starts the next frame at its own time
+    _, decoded = batch.decode(b.flush())
+    assert [d['t'] for d in decoded] == [0, 250]
+    _, decoded = batch.decode(payload.encode(payload.SCHEMA_LIGHT, (10,)))
+    assert decoded == [{'lux': 10, 't': 0}]
@@ -0,0 +1,105 @@
+"""pycoproc.RegisterBatch: the merged operations leave the PIC registers as one command
+per operation does, from random initial memory.
+
+    python -m pytest -q tests
+"""
+
+import random
+
+import pytest
+
+import sim
+from sim.clock import DeepSleep
+
+SEEDS = range(8)
+
+
+class _Memory:
+    """ the memory commands of a Pycoproc, applied to a dict """
+
+    def __init__(self, memory):
+        self.memory = memory
+
+    def poke_memory(self, addr, value):
+        self.memory[addr] = value & 0xFF
+
+    def magic_write(self, addr, _and=0xFF, _or=0, _xor=0):
+        self.memory[addr] = ((self.memory[addr] & _and) | _or) ^ _xor
+
+    def magic_write_read(self, addr, _and=0xFF, _or=0, _xor=0):
+        self.magic_write(addr, _and, _or, _xor)
+        return self.memory[addr]
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_merge_algebra(seed):
+    sim.install()
+    pycoproc = sim.load('pycoproc')
+    rnd = random.Random(seed)
+    initial = dict((addr, rnd.randrange(256)) for addr in range(3))
+    ops = [(rnd.choice(('poke', 'set_bits', 'mask_bits', 'toggle_bits')), rnd.randrange(3), rnd.randrange(256))
+           for _ in range(rnd.randint(1, 8))]
+    results = []
+    for merge in (False, True):
+        pic = _Memory(dict(initial))
+        batch = pycoproc.RegisterBatch(pic, merge)
+        for name, addr, value in ops:
+            getattr(batch, name)(addr, value)
+        sent = batch.commit()
+        results.append((pic.memory, sent))
+    (direct, direct_sent), (merged, merged_sent) = results
+    assert merged == direct
+    # at most one command per address
+    assert merged_sent <= len(set(addr for _, addr, _ in ops))
+    assert direct_sent == len(ops)
+
+
+def _pycoproc(merge):
+    cls = sim.load('pycoproc').Pycoproc
+
+    class Pycoproc(cls):
+        def batch(self, _merge=True):
+            return cls.batch(self, merge)
+    return Pycoproc
+
+
+def _sleep(p, gps, int_pin):
+    if int_pin is not None:
+        p.setup_int_pin_wake_up(int_pin)
+    try:
+        p.go_to_sleep(gps)
+    except DeepSleep:
+        pass
+
+
+# every wake-up configuration: (rising, falling) accelerometer interrupt, GPS backup
+# power, INT pin (None: not used, True: rising edge, False: falling edge)
+CASES = [('sleep', rising, falling, gps, int_pin)
+         for rising in (False, True) for falling in (False, True) for gps in (False, True)
+         for int_pin in (None, True, False)]
+CASES += [('power', name, enabled) for name in ('gps_standby', 'sensor_power', 'sd_power') for enabled in (False, True)]
+
+
+def _run(case, merge, seed):
+    world = sim.install()
+    world.attach_board('pysense')
+    rnd = random.Random(seed)
+    world.pic.memory[:] = bytes(rnd.randrange(256) for _ in range(len(world.pic.memory)))
+    p = _pycoproc(merge)()
+    if case[0] == 'sleep':
+        _, rising, falling, gps, int_pin = case
+        p.setup_int_wake_up(rising, falling)
+        _sleep(p, gps, int_pin)
+    else:
+        _, name, enabled = case
+        getattr(p, name)(enabled)
+    return bytes(world.pic.memory), sum(world.pic.commands.values())
+
+
+@pytest.mark.parametrize('case', CASES)
+def test_register_values(case):
+    for seed in SEEDS:
+        direct, direct_commands = _run(case, False, seed)
+        merged, merged_commands = _run(case, True, seed)
+        assert merged == direct
+        assert merged_commands < direct_commands
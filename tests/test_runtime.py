@@ -0,0 +1,106 @@
+"""runtime.Node against the fake LoRa socket of the simulation, on the virtual clock.
+
+    python -m pytest -q tests
+"""
+
+import pytest
+
+import sim
+from sim.lora import LoRaSocket
+
+EIO = 5
+MESSAGE = bytes(11)
+
+
+@pytest.fixture
+def world():
+    world = sim.install()
+    log = sim.load('log')
+    log.configure(log.NONE)
+    return world
+
+
+class _Failing:
+    """ transport raising OSError(EIO) on the first send_failures sends and recv_failures polls """
+
+    def __init__(self, transport, send_failures=0, recv_failures=0):
+        self.transport = transport
+        self.send_failures = send_failures
+        self.recv_failures = recv_failures
+
+    def send(self, data):
+        if self.send_failures:
+            self.send_failures -= 1
+            raise OSError(EIO)
+        return self.transport.send(data)
+
+    def recv(self):
+        if self.recv_failures:
+            self.recv_failures -= 1
+            raise OSError(EIO)
+        return self.transport.recv()
+
+
+def _node(world, sock, transport=None, **kwargs):
+    runtime = sim.load('runtime')
+    if transport is None:
+        transport = sim.load('transport').LoRaTransport(sock)
+    received = []
+
+    async def produce(counter):
+        await runtime.sleep_ms(25)
+        return bytes([counter]) + MESSAGE
+
+    node = runtime.Node(transport, produce, 10.0, 0, 5, on_downlink=lambda data, port: received.append((data, port)),
+                        **kwargs)
+    return runtime, node, received
+
+
+def test_sends_and_receives(world):
+    sock = LoRaSocket(world.clock, 5)
+    sock.downlink(b'\x01', port=3, at_s=25)
+    runtime, node, received = _node(world, sock)
+    runtime.run(node.run(cycles=6, linger_ms=2000))
+    assert [data[0] for _, data, _, _ in sock.uplinks] == list(range(6))
+    assert (node.sent, node.dropped, node.throttled, node.send_errors) == (6, 0, 0, 0)
+    # one uplink per period (to the ms, the event loop adds a few us), the radio was never busy
+    starts = [t_us for t_us, _, _, _ in sock.uplinks]
+    assert [(b - a) // 1000 for a, b in zip(starts, starts[1:])] == [10000] * 5
+    assert sock.busy_errors == 0
+    assert received == [(b'\x01', 3)]
+    assert node.idle()
+
+
+def test_busy_radio(world):
+    sock = LoRaSocket(world.clock, 5, rx_windows_s=12.0)
+    runtime, node, _ = _node(world, sock)
+    runtime.run(node.run(cycles=3))
+    # each uplink waits for the receive windows of the previous one (EAGAIN)
+    assert node.sent == 3
+    assert node.busy_retries > 0
+    assert sock.busy_errors == node.busy_retries
+
+
+def test_radio_errors_are_retried(world):
+    sock = LoRaSocket(world.clock, 5)
+    sock.downlink(b'\x02', port=1, at_s=5)
+    failing = _Failing(sim.load('transport').LoRaTransport(sock), send_failures=3, recv_failures=2)
+    runtime, node, received = _node(world, sock, failing)
+    runtime.run(node.run(cycles=4, linger_ms=2000))
+    # nothing lost: the failed message was sent after the backoff (1 + 2 + 4 s)
+    assert [data[0] for _, data, _, _ in sock.uplinks] == list(range(4))
+    assert (node.send_errors, node.recv_errors) == (3, 2)
+    assert sock.uplinks[0][0] >= 7000000
+    assert received == [(b'\x02', 1)]
+
+
+def test_full_queue_holds_measurements(world):
+    sock = LoRaSocket(world.clock, 5)
+    failing = _Failing(sim.load('transport').LoRaTransport(sock), send_failures=8)
+    runtime, node, _ = _node(world, sock, failing)
+    # the radio fails for 1 + 2 + ... + 60 s: the queue fills up, measure waits and
+    # resumes once the messages go out, nothing is dropped
+    runtime.run(node.run(cycles=20))
+    assert [data[0] for _, data, _, _ in sock.uplinks] == list(range(20))
+    assert node.dropped == 0
+    assert node.throttled > 0
@@ -0,0 +1,110 @@
+"""schedule.Periodic over several days on the virtual clock, across midnight and
+the wrap of ticks_ms.
+
+    python -m pytest -q tests
+"""
+
+import sys
+
+import sim
+from sim.clock import TICKS_PERIOD
+
+DAYS = 3
+PERIOD_MS = 30000
+WORK_MS = 600
+# the node starts at 23:00, ticks_ms wraps 5 h later
+START = (2026, 3, 14, 23, 0, 0, 0, 0)
+WRAP_AFTER_MS = 5 * 3600 * 1000
+CYCLES = DAYS * 86400 * 1000 // PERIOD_MS
+
+
+def _setup():
+    world = sim.install()
+    world.clock.now_us = (TICKS_PERIOD - WRAP_AFTER_MS) * 1000
+    sys.modules['machine'].RTC().init(START)
+    return world, sim.load('schedule')
+
+
+def _run(world, periodic, work_ms, cycles=CYCLES):
+    """ the loop of runtime.Node.measure, returns the virtual time (us) each cycle started
+        and the lateness tick() returned """
+    clock = world.clock
+    starts = []
+    lateness = []
+    for counter in range(cycles):
+        wait = periodic.remaining_ms()
+        if wait > 0:
+            clock.sleep_ms(wait)
+        starts.append(clock.now_us)
+        lateness.append(periodic.tick())
+        clock.sleep_ms(work_ms(counter))
+    return starts, lateness
+
+
+def test_no_drift_across_midnight_and_wrap():
+    world, schedule = _setup()
+    start_us = world.clock.now_us
+    start_ticks = world.time.ticks_ms()
+    periodic = schedule.Periodic(PERIOD_MS)
+    starts, lateness = _run(world, periodic, lambda counter: WORK_MS)
+    # every cycle on the grid of the first deadline, none late or skipped
+    assert starts == [start_us + i * PERIOD_MS * 1000 for i in range(CYCLES)]
+    assert lateness == [0] * CYCLES
+    assert (periodic.count, periodic.late, periodic.skipped) == (CYCLES, 0, 0)
+    # both the midnights and the wrap of the tick counter were crossed
+    assert world.time.ticks_ms() < start_ticks
+    assert sys.modules['machine'].RTC().now()[2] == START[2] + DAYS
+    assert periodic.deadline == (start_ticks + CYCLES * PERIOD_MS) % TICKS_PERIOD
+
+
+def test_late_within_a_period():
+    world, schedule = _setup()
+    start_us = world.clock.now_us
+    periodic = schedule.Periodic(PERIOD_MS)
+    clock = world.clock
+    starts = []
+    for _ in range(CYCLES):
+        # the wake-up comes 250 ms after the deadline
+        clock.sleep_ms(periodic.remaining_ms() + 250)
+        starts.append(clock.now_us)
+        assert periodic.tick() == 250
+        clock.sleep_ms(WORK_MS)
+    # the lateness does not accumulate
+    assert starts[-1] == start_us + ((CYCLES - 1) * PERIOD_MS + 250) * 1000
+    assert (periodic.late, periodic.late_max_ms, periodic.skipped) == (CYCLES, 250, 0)
+    assert periodic.late_mean_ms() == 250
+
+
+def test_slow_cycles_skip_whole_periods():
+    world, schedule = _setup()
+    start_us = world.clock.now_us
+    periodic = schedule.Periodic(PERIOD_MS)
+    # every 100th cycle takes 75 s: the next one starts 45 s late, the deadline it
+    # missed by a whole period is skipped and the one after is back on the grid
+    slow = 100
+    cycles = 1000
+    starts, lateness = _run(world, periodic, lambda counter: 75000 if counter % slow == slow - 1 else WORK_MS,
+                            cycles=cycles)
+    after_slow = [k for k in range(1, cycles) if k % slow == 0]
+    assert (periodic.skipped, periodic.late, periodic.late_max_ms) == (len(after_slow), len(after_slow), 45000)
+    assert [k for k in range(cycles) if lateness[k]] == after_slow
+    assert set(lateness[k] for k in after_slow) == {45000}
+    period_us = PERIOD_MS * 1000
+    for k in range(1, cycles):
+        if k in after_slow:
+            assert starts[k] - starts[k - 1] == 75000 * 1000
+            assert (starts[k] - start_us) % period_us == 15000 * 1000
+        else:
+            assert (starts[k] - start_us) % period_us == 0
+            assert starts[k] - starts[k - 1] == (15000 * 1000 if k - 1 in after_slow else period_us)
+    # on the grid at the end, one period further per slow cycle (the one skipped)
+    assert starts[-1] == start_us + (cycles - 1 + len(after_slow)) * period_us
+
+
+def test_random_part_of_the_period():
+    world, schedule = _setup()
+    start_us = world.clock.now_us
+    periodic = schedule.Periodic(PERIOD_MS, jitter_ms=10000, random=lambda: 0.5)
+    starts, lateness = _run(world, periodic, lambda counter: WORK_MS, cycles=1000)
+    assert starts == [start_us + i * (PERIOD_MS + 5000) * 1000 for i in range(1000)]
+    assert periodic.late == 0